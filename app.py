@@ -1,10 +1,17 @@
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from routers import user, authentication, event, location, manager, group, identity_image, checkin
+from routers import user, authentication, event, location, manager, group, identity_image, checkin, system
+from utils.db_executor import db_executor, db_writer, run_in_db
+from utils import password_hasher, image_processor, face_match, upload_jobs
+from utils.job_queue import job_queue
+from utils.revocation import revocation_list
+from utils.http_cache import CachedStaticFiles
+from utils.embedding_store import identity_embeddings, checkin_embeddings
+import config
 
 
 app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# avatar file names are unique per upload, so browsers may cache them for good
+app.mount("/static", CachedStaticFiles(directory="static", immutable_dirs=(config.AVATAR_DIR,)), name="static")
 app.include_router(user.user_router)
 app.include_router(event.event_router)
 app.include_router(location.location_router)
@@ -13,3 +20,24 @@ app.include_router(checkin.checkin_router)
 app.include_router(group.group_router)
 app.include_router(manager.manager_router)
 app.include_router(authentication.authentication_router)
+app.include_router(system.system_router)
+
+
+@app.on_event("startup")
+async def startup():
+    await run_in_db(revocation_list.load)
+    face_match.face_matcher.start()
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    # stop the background work before the database threads it writes through
+    job_queue.stop()
+    face_match.shutdown()
+    db_writer.shutdown()
+    db_executor.shutdown()
+    password_hasher.shutdown()
+    image_processor.shutdown()
+    identity_embeddings.close()
+    checkin_embeddings.close()
@@ -0,0 +1,37 @@
+"""
+Per-request cost of the allow_* dependencies: every request verifying its token again,
+against the same token served from the verified-token cache.
+"""
+import asyncio
+from common import measure, report
+
+REQUESTS = 20000
+
+
+def main():
+    from models.User import User
+    from utils.auth_util import allow_student, create_access_token, token_cache
+    from utils.token_cache import TokenCache
+
+    user = User(ID=1, fullname="Student")
+    token = create_access_token(user)
+    digest = TokenCache.digest(token)
+    loop = asyncio.new_event_loop()
+
+    def uncached():
+        # what every request paid before the cache: decode and validate the token again
+        token_cache.discard(digest)
+        loop.run_until_complete(allow_student(token))
+
+    def cached():
+        loop.run_until_complete(allow_student(token))
+
+    report("allow_student, token verified every request", measure(uncached, REQUESTS))
+    loop.run_until_complete(allow_student(token))
+    report("allow_student, verified token cached", measure(cached, REQUESTS))
+    print(token_cache.stats())
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
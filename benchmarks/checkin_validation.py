@@ -0,0 +1,83 @@
+"""
+Per-attempt cost of the check-in validation run on every upload: the registration lookup, count and loop
+over the check-in rows used before, against the single aggregate query of CheckinImage.valid_to_checkin.
+Usage: python benchmarks/checkin_validation.py [number of students]
+"""
+import sys
+from datetime import datetime
+from common import fresh_database, measure, report
+
+STUDENTS = 2000
+# previous check-ins of a student: none, rejected ones, one waiting for a manager, one accepted
+HISTORIES = [[], [False], [False, False], [None], [False, True]]
+
+
+def seed(count: int) -> tuple:
+    from database_connection import db
+    from models.Event import CheckinImage, Event, RegisterEvent
+    from models.User import User
+
+    now = datetime.now()
+    with db.atomic():
+        event = Event.create(title="Event", place="H", start_at=now, stop_at=now)
+        User.insert_many([{
+            "fullname": f"Student {index}",
+            "date_of_birth": datetime(2001, 1, 1),
+            "student_id": f"{102190000 + index:09d}",
+            "phone": f"09{index:08d}",
+            "username": f"{102190000 + index:09d}",
+            "password": "x",
+        } for index in range(count)]).execute()
+        user_ids = [user.ID for user in User.select(User.ID).order_by(User.ID)]
+        RegisterEvent.insert_many([
+            {"user": user_id, "event": event.ID, "created_at": now} for user_id in user_ids
+        ]).execute()
+        CheckinImage.insert_many([
+            {"path": "c.jpg", "user": user_id, "event": event.ID, "accept": accept, "uploaded_at": now}
+            for index, user_id in enumerate(user_ids)
+            for accept in HISTORIES[index % len(HISTORIES)]
+        ]).execute()
+    return event.ID, user_ids
+
+
+def previous_valid_to_checkin(user_id: int, event_id: int) -> tuple:
+    """CheckinImage.valid_to_checkin before the aggregate query, less its print of every row"""
+    from config import LIMIT_CHECKIN
+    from models.Event import CheckinImage, RegisterEvent
+
+    register = RegisterEvent.get_or_none(user=user_id, event=event_id)
+    if register is None:
+        return False, "Bạn không thể điểm danh khi chưa đăng ký sự kiện"
+    if register.block:
+        return False, "Bạn đã bị chặn khỏi sự kiện này"
+    checkins = CheckinImage.select().where((CheckinImage.event == event_id) & (CheckinImage.user == user_id))
+    if checkins.count() >= LIMIT_CHECKIN:
+        return False, "Đã vượt quá số lần điểm danh cho phép"
+    for checkin in checkins:
+        if checkin.accept is None:
+            return False, "Bạn đang có một lượt điểm danh chưa được đánh giá"
+        if checkin.accept is True:
+            return False, "Bạn đã điểm danh thành công cho sự kiên này từ trước"
+    return True, ""
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else STUDENTS
+    fresh_database()
+    event_id, user_ids = seed(count)
+    from models.Event import CheckinImage
+
+    # both give the same answer to every student
+    for user_id in user_ids:
+        assert previous_valid_to_checkin(user_id, event_id) == CheckinImage.valid_to_checkin(user_id, event_id)
+
+    def validate_all(validate):
+        return lambda: [validate(user_id, event_id) for user_id in user_ids]
+
+    print(f"{count} students, each attempt once")
+    report("lookup, count and loop per attempt", measure(validate_all(previous_valid_to_checkin), 3) / count)
+    report("aggregate query per attempt", measure(validate_all(CheckinImage.valid_to_checkin), 3) / count)
+
+
+if __name__ == "__main__":
+    main()
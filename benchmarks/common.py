@@ -0,0 +1,43 @@
+"""
+Shared setup of the benchmarks: run them from the repository root, e.g. python benchmarks/auth_cache.py.
+They use the settings of the test suite (tests/config.py), so every file they write goes to a temporary directory.
+"""
+import os
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "tests"))
+
+import config  # noqa: E402
+
+os.chdir(config.TEST_DIR)
+
+
+def fresh_database():
+    """An empty database with every table, index and trigger of the app, in the temporary directory"""
+    import database_script
+    from database_connection import db
+    db.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists("database.db" + suffix):
+            os.remove("database.db" + suffix)
+    db.connect()
+    # the data is thrown away, skip the fsync of every commit while seeding
+    db.execute_sql("PRAGMA synchronous = OFF")
+    database_script.init_table(db)
+    return db
+
+
+def measure(function, repeat: int) -> float:
+    """Seconds per call of function, over repeat calls"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def report(name: str, seconds: float):
+    print(f"{name:<48} {seconds * 1e6:>12.1f} µs")
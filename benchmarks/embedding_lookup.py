@@ -0,0 +1,59 @@
+"""
+Lookup latency of the identity embedding store, warm and right after reopening the files,
+against computing the embeddings from the identity JPEGs of the student on every check-in.
+Usage: python benchmarks/embedding_lookup.py [number of students]
+"""
+import os
+import random
+import sys
+import numpy as np
+from PIL import Image
+from common import measure, report
+
+STUDENTS = 20000
+IMAGES_PER_STUDENT = 3
+LOOKUPS = 20000
+
+
+def main():
+    import config
+    from utils.embedding_store import EmbeddingStore
+    from utils.face_embedding import EMBEDDING_DIM, FACE_EMBEDDING_ENABLED, embed_image, load_face
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else STUDENTS
+    directory = os.path.join(config.TEST_DIR, "benchmark-embeddings")
+    generator = np.random.default_rng(0)
+    store = EmbeddingStore(directory)
+    image_id = 0
+    for user_id in range(1, count + 1):
+        for _ in range(IMAGES_PER_STUDENT):
+            image_id += 1
+            store.put(image_id, user_id, generator.standard_normal(EMBEDDING_DIM, dtype=np.float32), approved=True)
+    store.close()
+    print(f"{count} students, {image_id} identity images, {store.stats()['file_bytes'] / 2 ** 20:.1f} MiB of files")
+
+    users = random.Random(0).choices(range(1, count + 1), k=LOOKUPS)
+    # a new store maps the files again, its first lookups fault the pages in
+    reopened = EmbeddingStore(directory)
+    remaining = iter(users)
+    report("lookup, files just opened", measure(lambda: reopened.lookup(next(remaining)), LOOKUPS))
+    remaining = iter(users)
+    report("lookup, warm", measure(lambda: reopened.lookup(next(remaining)), LOOKUPS))
+    print(reopened.stats()["lookup_time"])
+
+    # what every check-in paid without the store: decoding and embedding each identity image of the student
+    paths = []
+    for index in range(IMAGES_PER_STUDENT):
+        path = os.path.join(config.TEST_DIR, f"identity-{index}.jpg")
+        pixels = generator.integers(0, 256, size=(480, 360, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(path, quality=90)
+        paths.append(path)
+    report("decode the identity JPEGs of a student", measure(lambda: [load_face(path) for path in paths], 50))
+    if FACE_EMBEDDING_ENABLED:
+        report("embed the identity JPEGs of a student", measure(lambda: [embed_image(path) for path in paths], 50))
+    else:
+        print("no FACE_EMBEDDING_MODEL configured, the model run is not measured")
+
+
+if __name__ == "__main__":
+    main()
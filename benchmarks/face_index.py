@@ -0,0 +1,54 @@
+"""
+Duplicate-face search at 100k identity images: the exact FaceIndex against the IVF one,
+build time, time per check-in photo and how often IVF finds the same best match.
+Usage: python benchmarks/face_index.py [number of identity images]
+"""
+import sys
+import time
+import numpy as np
+from common import report
+
+IMAGES = 100000
+IMAGES_PER_STUDENT = 3
+PROBES = 1000
+K = 5
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    from utils.face_embedding import EMBEDDING_DIM
+    from utils.face_index import FaceIndex
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else IMAGES
+    generator = np.random.default_rng(0)
+    # every student has a face, each of their photos is that face with some noise
+    students = count // IMAGES_PER_STUDENT
+    faces = normalized(generator.standard_normal((students, EMBEDDING_DIM), dtype=np.float32))
+    user_ids = np.repeat(np.arange(1, students + 1), IMAGES_PER_STUDENT)
+    noise = generator.standard_normal((len(user_ids), EMBEDDING_DIM), dtype=np.float32)
+    vectors = normalized(faces[user_ids - 1] + 0.5 * normalized(noise))
+    labels = np.arange(1, len(user_ids) + 1)
+    probe_users = generator.integers(1, students + 1, size=PROBES)
+    probe_noise = generator.standard_normal((PROBES, EMBEDDING_DIM), dtype=np.float32)
+    probes = normalized(faces[probe_users - 1] + 0.5 * normalized(probe_noise))
+    print(f"{len(vectors)} identity images of {students} students, {PROBES} check-in photos, k={K}")
+
+    best_users = {}
+    for mode in ("exact", "ivf"):
+        started = time.perf_counter()
+        index = FaceIndex(vectors, user_ids, labels, mode=mode)
+        print(f"{mode}: build {time.perf_counter() - started:.2f} s")
+        started = time.perf_counter()
+        _, positions = index.search(probes, K)
+        report(f"{mode}: search per photo", (time.perf_counter() - started) / PROBES)
+        best_users[mode] = index.user_ids[positions[:, 0]]
+        print(f"{mode}: best match is the student of the photo for "
+              f"{np.mean(best_users[mode] == probe_users):.1%} of photos")
+    print(f"ivf agrees with exact on the best match for {np.mean(best_users['ivf'] == best_users['exact']):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+A registration burst: every student of the school tries to register for one capped event limited to a few groups.
+Compares the per-group eligibility checks used before with the single eligibility query, and with the
+in-memory seat counter the route puts in front of it. Usage: python benchmarks/registration.py [number of students]
+"""
+import sys
+import time
+from datetime import datetime
+from common import fresh_database
+
+STUDENTS = 2000
+GROUPS = 20
+LIMIT_GROUPS = 10
+
+
+def seed(count: int) -> tuple:
+    from database_connection import db
+    from models.Event import Event, LimitGroup
+    from models.Group import Group, JoinGroup
+    from models.User import User
+
+    now = datetime.now()
+    with db.atomic():
+        groups = [Group.create(name=f"Group {index}", require_approve=False) for index in range(GROUPS)]
+        User.insert_many([{
+            "fullname": f"Student {index}",
+            "date_of_birth": datetime(2001, 1, 1),
+            "student_id": f"{102190000 + index:09d}",
+            "phone": f"09{index:08d}",
+            "username": f"{102190000 + index:09d}",
+            "password": "x",
+        } for index in range(count)]).execute()
+        user_ids = [user.ID for user in User.select(User.ID).order_by(User.ID)]
+        JoinGroup.insert_many([
+            {"group": groups[index % GROUPS].ID, "user": user_id, "approve": True, "joined_at": now}
+            for index, user_id in enumerate(user_ids)
+        ]).execute()
+        # half of the school may register, and only half of them find a seat
+        event = Event.create(title="Event", place="H", start_at=now, stop_at=now, maximum_participant=count // 4)
+        for group in groups[:LIMIT_GROUPS]:
+            LimitGroup.create(group=group, event=event)
+    return event.ID, user_ids
+
+
+def previous_valid_to_register(event, user_id: int) -> tuple:
+    """Event.valid_to_register before the single eligibility query, a query per limit group"""
+    from models.Event import LimitGroup, RegisterEvent
+    from models.Group import JoinGroup
+
+    registered = RegisterEvent.get_or_none(event=event, user=user_id)
+    if registered:
+        if registered.block:
+            return False, "Bạn đã bị chặn khỏi sự kiện này"
+        return False, "Sự kiện đã được đăng ký từ trước"
+    if event.maximum_participant is not None:
+        num_participants = RegisterEvent.select()\
+            .where((RegisterEvent.event == event) & (RegisterEvent.block == False))\
+            .count()
+        if num_participants >= event.maximum_participant:
+            return False, "Đã vượt quá số người cho phép"
+    limit_groups = LimitGroup.select().where(LimitGroup.event == event)
+    if limit_groups.exists():
+        for limit_group in limit_groups:
+            if JoinGroup.select().where(
+                    (JoinGroup.user == user_id) & (JoinGroup.group == limit_group.group_id) & (JoinGroup.approve == True)
+            ).exists():
+                return True, ""
+        return False, "Bạn không thuộc nhóm được phép đăng ký"
+    return True, ""
+
+
+def previous_register_event(event_id: int, user_id: int):
+    from models.Event import Event
+    event = Event.get_or_none(ID=event_id)
+    valid, error = previous_valid_to_register(event, user_id)
+    if not valid:
+        raise ValueError(error)
+    if not event.add_participant(user=user_id):
+        raise ValueError("full")
+
+
+def burst(name: str, register, event_id: int, user_ids: list, seat_counter: bool = False):
+    """Every student registers once, like the writer thread would serve the burst"""
+    from database_connection import db
+    from models.Event import RegisterEvent
+    from utils.event_capacity import EventCapacity
+
+    RegisterEvent.delete().where(RegisterEvent.event == event_id).execute()
+    capacity = EventCapacity()
+    if seat_counter:
+        capacity.load(event_id)
+    accepted = rejected = 0
+    started = time.perf_counter()
+    for user_id in user_ids:
+        generation = capacity.reserve(event_id) if seat_counter else 0
+        if generation is None:
+            rejected += 1
+            continue
+        try:
+            with db.atomic():
+                register(event_id, user_id)
+            accepted += 1
+        except ValueError:
+            # the route gives the seat back when the insert is refused
+            if seat_counter:
+                capacity.release(event_id, generation)
+            rejected += 1
+    elapsed = time.perf_counter() - started
+    print(f"{name:<48} {elapsed * 1e6 / len(user_ids):>10.1f} µs/attempt  "
+          f"{accepted} registered, {rejected} rejected")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else STUDENTS
+    fresh_database()
+    event_id, user_ids = seed(count)
+    from controllers.EventController import EventController
+
+    def register(event_id, user_id):
+        EventController.register_event(event_id=event_id, user_id=user_id)
+
+    print(f"{count} students, {LIMIT_GROUPS} of {GROUPS} groups allowed")
+    burst("query per limit group", previous_register_event, event_id, user_ids)
+    burst("single eligibility query", register, event_id, user_ids)
+    burst("seat counter, then single eligibility query", register, event_id, user_ids, seat_counter=True)
+
+
+if __name__ == "__main__":
+    main()
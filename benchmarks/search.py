@@ -0,0 +1,63 @@
+"""
+Admin search box over 200k synthetic students: the full-text index against the LIKE '%keyword%' scan
+the controllers used before. Usage: python benchmarks/search.py [number of students]
+"""
+import random
+import sys
+from datetime import datetime
+from common import fresh_database, measure, report
+
+STUDENTS = 200000
+REPEAT = 50
+FAMILY_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ"]
+MIDDLE_NAMES = ["Văn", "Thị", "Hữu", "Minh", "Ngọc", "Thanh", "Quốc", "Đức", "Gia", "Bảo"]
+GIVEN_NAMES = ["An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Khánh", "Linh", "Long", "Nam", "Phúc",
+               "Quân", "Sơn", "Tâm", "Thảo", "Trang", "Tuấn", "Uyên", "Vy"]
+# what managers type, one keystroke after another
+KEYWORDS = ["ng", "nguyen", "nguyen van", "nguyen van nam", "thao", "1021900"]
+
+
+def seed(count: int):
+    from database_connection import db
+    from models.User import User
+
+    generator = random.Random(0)
+    rows = []
+    for index in range(count):
+        fullname = " ".join([generator.choice(FAMILY_NAMES), generator.choice(MIDDLE_NAMES),
+                             generator.choice(GIVEN_NAMES)])
+        rows.append(User.normalize({
+            "fullname": fullname,
+            "date_of_birth": datetime(2001, 1, 1),
+            "student_id": f"{102190000 + index:09d}",
+            "phone": f"09{index:08d}",
+            "username": f"{102190000 + index:09d}",
+            "password": "x",
+        }))
+    with db.atomic():
+        for start in range(0, len(rows), 5000):
+            User.insert_many(rows[start:start + 5000]).execute()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else STUDENTS
+    fresh_database()
+    seed(count)
+    from controllers.UserController import UserController
+    from models.User import User
+
+    print(f"{count} students, first page of 20 results")
+    for keyword in KEYWORDS:
+        # on the folded column, so both find the same students
+        field = User.student_id if keyword.isdigit() else User.fullname_normalized
+        scan = lambda: list(User.select().where(field.contains(keyword)).limit(20))
+        report(f"LIKE, unranked  '{keyword}'", measure(scan, REPEAT))
+        if keyword.isdigit():
+            search = lambda: UserController.search(student_id=keyword, limit=20)
+        else:
+            search = lambda: UserController.search(fullname=keyword, limit=20)
+        report(f"full-text index '{keyword}'", measure(search, REPEAT))
+
+
+if __name__ == "__main__":
+    main()
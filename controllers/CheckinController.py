@@ -1,52 +1,151 @@
+from peewee import fn, JOIN
 from models.Event import CheckinImage, Event
-from datetime import datetime
-from config import CHECKIN_IMAGE_DIR
-import uuid
-import os
-from utils import file_handle
+from models.Location import Location
+from models.User import User, IdentityImages
+from controllers.JobController import JobController, CHECKIN_IMAGE_JOB, CHECKIN_IMAGE_PRIORITY
+from utils import pagination
+from utils.geofence import check_fence
 
 
 class CheckinController:
     @staticmethod
-    def get_checkins(user_id: int = None, event_id: int = None, page: int = None, num_in_page: int = 10):
-        search_results = CheckinImage.select().where(
-            ((user_id is None) | (CheckinImage.user == user_id))
-            & ((event_id is None) | (CheckinImage.event == event_id))
-        )
-        if page:
-            return list(search_results.paginate(page, num_in_page))
-        else:
-            return list(search_results)
+    def get_checkins(user_id: int = None, event_id: int = None,
+                     page: int = None, after: str = None, num_in_page: int = None):
+        search_results = CheckinImage.select(CheckinImage, User, Event)\
+            .join(User, on=CheckinImage.user).switch(CheckinImage).join(Event)
+        # only the filters given end up in the SQL, "? IS NULL OR ..." would keep SQLite off the indexes
+        if user_id is not None:
+            search_results = search_results.where(CheckinImage.user == user_id)
+        if event_id is not None:
+            search_results = search_results.where(CheckinImage.event == event_id)
+        return pagination.paginate(search_results, CheckinImage.ID, page=page, after=after, limit=num_in_page)
+
+    @staticmethod
+    def get_image_path(checkin_id: int, user_id: int = None) -> str:
+        checkin = CheckinImage.get_or_none(checkin_id)
+        if checkin is None:
+            return None
+        if user_id is not None and checkin.user_id != user_id:
+            raise ValueError("Bạn không có quyền truy cập ảnh này")
+        return None if checkin.image_failed else checkin.path
 
     @staticmethod
-    def checkin(user_id: int, event_id: int, image_data: str) -> CheckinImage:
-        # check event_id
-        if Event.get_or_none(event_id) is None:
+    def mark_image_failed(checkin_id: int) -> str:
+        """The photo could not be normalized, returns its path so the upload can be deleted"""
+        checkin = CheckinImage.get_or_none(checkin_id)
+        if checkin is None:
+            return None
+        checkin.image_failed = True
+        checkin.save()
+        return checkin.path
+
+    @staticmethod
+    def get_suspicious(event_id: int, after: str = None, limit: int = None):
+        """Check-ins of an event whose photo matches another user's face best"""
+        SuspectUser = User.alias()
+        search_results = CheckinImage\
+            .select(CheckinImage, User, SuspectUser)\
+            .join(User, on=CheckinImage.user)\
+            .switch(CheckinImage)\
+            .join(SuspectUser, on=(CheckinImage.suspect_user == SuspectUser.ID), attr="suspect_user")\
+            .where((CheckinImage.event == event_id) & CheckinImage.suspect_user.is_null(False))
+        return pagination.paginate(search_results, CheckinImage.ID, after=after, limit=limit)
+
+    @staticmethod
+    def validate_checkin(user_id: int, event_id: int, latitude: float = None, longitude: float = None) -> tuple:
+        """Raise ValueError if the user cannot check in, returns (distance, outside_fence) of the device"""
+        # check event_id, with its location for the geofence
+        fence = Event\
+            .select(Location.latitude, Location.longitude, Location.radius)\
+            .join(Location, JOIN.LEFT_OUTER)\
+            .where(Event.ID == event_id)\
+            .tuples()\
+            .first()
+        if fence is None:
             raise ValueError("Sự kiện không còn tồn tại")
+        # cheapest check first, it needs no further query
+        distance, outside_fence = check_fence(fence, latitude, longitude)
         # validate
         valid, error = CheckinImage.valid_to_checkin(user_id, event_id)
-        print(valid, error)
         if not valid:
             raise ValueError(error)
-        # prepare
-        now = datetime.now().strftime("%Y-%m-%d.%H-%M-%S")
-        filename = f"student_{user_id}.event_{event_id}.{uuid.uuid4()}.{now}.jpg"
-        save_dir = os.path.join(CHECKIN_IMAGE_DIR, str(user_id))
-        os.makedirs(save_dir, exist_ok=True)
-        filepath = os.path.join(save_dir, filename)
-        # upload image
-        try:
-            file_handle.save_file(image_data, filepath)
-        except Exception as err:
-            print("Error when save file " + filepath)
-            print(err)
-            return None
-        # update in db
-        try:
-            created = CheckinImage(path=filepath, user=user_id, event=event_id)
-            created.save(force_insert=True)
-        except Exception as err:
-            file_handle.delete_file(filepath)
-            return None
-        return created
+        return distance, outside_fence
 
+    @staticmethod
+    def checkin(user_id: int, event_id: int, image_key: str, latitude: float = None,
+                longitude: float = None) -> CheckinImage:
+        # image_key is the uploaded image, already in checkin_storage and normalized by a job
+        distance, outside_fence = CheckinController.validate_checkin(user_id, event_id, latitude, longitude)
+        checkin = CheckinImage.create(
+            path=image_key, user=user_id, event=event_id, distance=distance, outside_fence=outside_fence)
+        JobController.enqueue(CHECKIN_IMAGE_JOB, {"checkin_id": checkin.ID}, CHECKIN_IMAGE_PRIORITY)
+        return checkin
+
+    @staticmethod
+    def get_unscored(limit: int) -> list:
+        """Oldest check-ins waiting for a face-match score whose user has an approved identity image"""
+        has_identity = IdentityImages\
+            .select(IdentityImages.ID)\
+            .where((IdentityImages.user == CheckinImage.user) & (IdentityImages.approve == True))
+        return list(
+            CheckinImage
+            .select(CheckinImage.ID, CheckinImage.path, CheckinImage.user)
+            .where(CheckinImage.accept.is_null() & CheckinImage.score.is_null() & (CheckinImage.image_failed == False)
+                   & fn.EXISTS(has_identity))
+            .order_by(CheckinImage.ID)
+            .limit(limit)
+            .tuples()
+        )
+
+    @staticmethod
+    def apply_scores(scores: dict, accept_score: float = None, reject_score: float = None,
+                     suspects: dict = None) -> dict:
+        """
+        Write face-match scores {checkin_id: score}, approving or rejecting past the thresholds.
+        A None score could not be computed: it is stored as 0 and left for a manager.
+        suspects {checkin_id: (user_id, score)} are photos matching another user best, never approved here,
+        neither are check-ins flagged outside the geofence.
+        Check-ins a manager decided meanwhile are left alone. Returns how many were approved/rejected/scored.
+        """
+        suspects = suspects or {}
+        result = {"approved": 0, "rejected": 0, "scored": 0}
+        checkins = CheckinImage.select().where(CheckinImage.ID.in_(list(scores)) & CheckinImage.accept.is_null())
+        for checkin in checkins:
+            score = scores[checkin.ID]
+            if checkin.ID in suspects:
+                checkin.suspect_user, checkin.suspect_score = suspects[checkin.ID]
+            if score is None:
+                checkin.score = 0
+                result["scored"] += 1
+            elif accept_score is not None and score >= accept_score and checkin.ID not in suspects \
+                    and not checkin.outside_fence:
+                checkin.approve_checkin(score)
+                result["approved"] += 1
+            elif reject_score is not None and score < reject_score:
+                checkin.reject_checkin(score)
+                result["rejected"] += 1
+            else:
+                checkin.score = score
+                result["scored"] += 1
+            checkin.save()
+        return result
+
+    @staticmethod
+    def reset_scores() -> int:
+        """
+        Forget the face-match scores and suspects of every check-in, when they came from another model.
+        Decisions are kept, pending check-ins are scored again. Returns how many check-ins had one.
+        """
+        return CheckinImage.update(score=None, suspect_user=None, suspect_score=None)\
+            .where(CheckinImage.score.is_null(False) | CheckinImage.suspect_user.is_null(False))\
+            .execute()
+
+    @staticmethod
+    def get_all_for_embedding() -> list:
+        """(checkin_id, user_id, path, True) of every check-in"""
+        return [
+            (checkin_id, user_id, path, True)
+            for checkin_id, user_id, path in CheckinImage
+            .select(CheckinImage.ID, CheckinImage.user, CheckinImage.path)
+            .tuples()
+        ]
@@ -1,50 +1,73 @@
 from datetime import datetime
-from models.Event import Event, EventDetail, RegisterEvent, LimitGroup
-from config import USER_IN_PAGE
+from models.Event import Event, EventDetail, EventCounter, RegisterEvent, LimitGroup
+from models.Search import EventSearch
+from models.User import User
+from models.Manager import Manager
+from models.Location import Location
+from models.Group import Group
 from typing import List
 from peewee import fn, JOIN
+from utils import search_index, pagination, error_messages
+from utils.event_capacity import event_capacity
 
 
 class EventController:
     @staticmethod
     def get_by_id(event_id: int) -> Event:
         result = Event\
-            .select(Event, fn.COUNT(RegisterEvent.user).alias('num_participant'))\
+            .select(Event, fn.COALESCE(EventCounter.registered, 0).alias('num_participant'))\
+            .join(EventCounter, JOIN.LEFT_OUTER)\
             .where(Event.ID == event_id)\
-            .join(RegisterEvent,
-                  JOIN.LEFT_OUTER,
-                  on=((Event.ID == RegisterEvent.event) & (RegisterEvent.block == False)))\
-            .group_by(Event.ID)\
             .first()
         return result
 
     @staticmethod
-    def search(keyword: str = "", page: int = None) -> list:
+    def get_detail(event_id: int) -> Event:
+        """Load an event with its counters, location, detail, managers and limit groups in two queries."""
+        created_by = Manager.alias()
+        leader = Manager.alias()
+        event = Event\
+            .select(Event, fn.COALESCE(EventCounter.registered, 0).alias('num_participant'),
+                    EventCounter, Location, EventDetail, created_by, leader)\
+            .join(EventCounter, JOIN.LEFT_OUTER, attr='counters').switch(Event)\
+            .join(Location, JOIN.LEFT_OUTER).switch(Event)\
+            .join(EventDetail, JOIN.LEFT_OUTER, on=(EventDetail.event == Event.ID), attr='detail')\
+            .join(created_by, JOIN.LEFT_OUTER, on=(EventDetail.created_by == created_by.ID), attr='created_by')\
+            .switch(EventDetail)\
+            .join(leader, JOIN.LEFT_OUTER, on=(EventDetail.leader == leader.ID), attr='leader')\
+            .where(Event.ID == event_id)\
+            .first()
+        if event is None:
+            return None
+        event.limit_group = list(Group.select().join(LimitGroup).where(LimitGroup.event == event.ID))
+        return event
+
+    @staticmethod
+    def search(keyword: str = "", page: int = None, after: str = None, limit: int = None) -> list:
         search_results = Event\
-            .select(Event, fn.COUNT(RegisterEvent.user).alias('num_participant'))\
-            .where((Event.title.contains(keyword)) | (Event.place.contains(keyword)))\
-            .join(
-                RegisterEvent,
-                JOIN.LEFT_OUTER,
-                on=((Event.ID == RegisterEvent.event) & (RegisterEvent.block == False)))\
-            .group_by(Event.ID)
-        if page:
-            return list(search_results.paginate(page, USER_IN_PAGE))
-        else:
-            return list(search_results)
+            .select(Event, fn.COALESCE(EventCounter.registered, 0).alias('num_participant'))\
+            .join(EventCounter, JOIN.LEFT_OUTER)
+        search_results = search_index.apply_search(
+            search_results,
+            EventSearch,
+            search_index.prefix_query(keyword, ["title_normalized", "place_normalized"])
+        )
+        return pagination.paginate(search_results, Event.ID, page=page, after=after, limit=limit)
 
     @staticmethod
     def update(event_id: int, event_dict: dict, detail_dict: dict) -> Event:
         event_dict["updated_at"] = datetime.now()
         # update event
         if event_dict:
-            Event.update(**event_dict).where(Event.ID == event_id).execute()
+            Event.update(**Event.normalize(event_dict)).where(Event.ID == event_id).execute()
         # update detail
         if detail_dict:
             if EventDetail.get_or_none(EventDetail.event == event_id) is None:
                 EventDetail.create(event=event_id, **detail_dict)
             else:
                 EventDetail.update(**detail_dict).where(EventDetail.event == event_id).execute()
+        if "maximum_participant" in event_dict:
+            event_capacity.invalidate(event_id)
         return Event.get_or_none(event_id)
 
     @staticmethod
@@ -67,6 +90,7 @@ class EventController:
     @staticmethod
     def delete(event_id: int):
         Event.delete().where(Event.ID == event_id).execute()
+        event_capacity.invalidate(event_id)
 
     @staticmethod
     def register_event(event_id: int, user_id: int, add_by: int = None, note: str = None):
@@ -76,7 +100,8 @@ class EventController:
         valid, error = event.valid_to_register(user_id)
         if not valid:
             raise ValueError(error)
-        event.add_participant(user=user_id, add_by=add_by, note=note)
+        if not event.add_participant(user=user_id, add_by=add_by, note=note):
+            raise ValueError(error_messages.EVENT_FULL)
 
     @staticmethod
     def unregister_event(event_id: int, user_id: int):
@@ -88,15 +113,23 @@ class EventController:
         register.delete_instance()
 
     @staticmethod
-    def get_participants(event_id: int) -> List[RegisterEvent]:
-        return list(RegisterEvent.select().where(RegisterEvent.event == event_id))
+    def get_participants(event_id: int, after: str = None, limit: int = None) -> List[RegisterEvent]:
+        participants = RegisterEvent.select(RegisterEvent, User, Manager)\
+            .join(User).switch(RegisterEvent)\
+            .join(Manager, JOIN.LEFT_OUTER)\
+            .where(RegisterEvent.event == event_id)
+        return pagination.paginate(participants, RegisterEvent.user, after=after, limit=limit)
 
     @staticmethod
-    def get_event_of_user(user_id: int, event_id: int = None) -> List[RegisterEvent]:
-        return list(
-            RegisterEvent.select()
-            .where((RegisterEvent.user == user_id) & ((event_id is None) | (RegisterEvent.event == event_id)))
-        )
+    def get_event_of_user(user_id: int, event_id: int = None,
+                          after: str = None, limit: int = None) -> List[RegisterEvent]:
+        registers = RegisterEvent.select(RegisterEvent, Event, Manager)\
+            .join(Event).switch(RegisterEvent)\
+            .join(Manager, JOIN.LEFT_OUTER)\
+            .where(RegisterEvent.user == user_id)
+        if event_id is not None:
+            registers = registers.where(RegisterEvent.event == event_id)
+        return pagination.paginate(registers, RegisterEvent.event, after=after, limit=limit)
 
     @staticmethod
     def feedback(user_id: int, event_id: int, content: str):
@@ -115,6 +148,7 @@ class EventController:
             registered = RegisterEvent.create(event=event_id, user=user_id)
         registered.block = True
         registered.save()
+        event_capacity.invalidate(event_id)
 
     @staticmethod
     def add_limit_group(event_id: int, group_id: int):
@@ -1,6 +1,10 @@
-from config import USER_IN_PAGE
 from models.Group import Group, JoinGroup
+from models.Search import GroupSearch
+from models.User import User
+from models.Manager import Manager
+from utils import search_index, pagination
 from typing import List
+from peewee import JOIN
 
 
 class GroupController:
@@ -9,18 +13,17 @@ class GroupController:
         return Group.get_or_none(ID=group_id)
 
     @staticmethod
-    def search(keyword: str = "", page: int = None) -> list:
-        search_results = Group.select().where(
-            (Group.name.contains(keyword))
+    def search(keyword: str = "", page: int = None, after: str = None, limit: int = None) -> list:
+        search_results = search_index.apply_search(
+            Group.select(),
+            GroupSearch,
+            search_index.prefix_query(keyword, ["name_normalized"])
         )
-        if page:
-            return list(search_results.paginate(page, USER_IN_PAGE))
-        else:
-            return list(search_results)
+        return pagination.paginate(search_results, Group.ID, page=page, after=after, limit=limit)
 
     @staticmethod
     def update(group_id: int, detail: dict) -> Group:
-        Group.update(**detail).where(Group.ID == group_id).execute()
+        Group.update(**Group.normalize(detail)).where(Group.ID == group_id).execute()
         return Group.get_or_none(group_id)
 
     @staticmethod
@@ -33,12 +36,20 @@ class GroupController:
         Group.delete().where(Group.ID == group_id).execute()
 
     @staticmethod
-    def get_member_in_group(group_id: int) -> List[JoinGroup]:
-        return list(JoinGroup.select().where(JoinGroup.group == group_id))
+    def get_member_in_group(group_id: int, after: str = None, limit: int = None) -> List[JoinGroup]:
+        members = JoinGroup.select(JoinGroup, User, Manager)\
+            .join(User).switch(JoinGroup)\
+            .join(Manager, JOIN.LEFT_OUTER)\
+            .where(JoinGroup.group == group_id)
+        return pagination.paginate(members, JoinGroup.user, after=after, limit=limit)
 
     @staticmethod
-    def get_group_of_user(user_id: int) -> List[JoinGroup]:
-        return list(JoinGroup.select().where(JoinGroup.user == user_id))
+    def get_group_of_user(user_id: int, after: str = None, limit: int = None) -> List[JoinGroup]:
+        groups = JoinGroup.select(JoinGroup, Group, Manager)\
+            .join(Group).switch(JoinGroup)\
+            .join(Manager, JOIN.LEFT_OUTER)\
+            .where(JoinGroup.user == user_id)
+        return pagination.paginate(groups, JoinGroup.group, after=after, limit=limit)
 
     @staticmethod
     def add_member(user_id: int, group_id: int, added_by: int, approve: bool = True):
@@ -65,7 +76,3 @@ class GroupController:
         group = Group.get_or_none(ID=group_id)
         if group:
             group.reject_member(user_id)
-
-
-
-
@@ -1,76 +1,92 @@
 from models.User import User, IdentityImages
 from datetime import datetime
-import os
-from utils import file_handle
-from config import IDENTITY_IMAGE_DIR, USER_IN_PAGE
-import uuid
+from controllers.JobController import JobController, IDENTITY_IMAGE_JOB, IDENTITY_IMAGE_PRIORITY
+from utils import pagination
 
 
 class IdentityImageController:
     @staticmethod
-    def get_identity_images(user_id: int = None, from_date: datetime = None, to_date: datetime = None, page: int = None):
-        search_results = IdentityImages.select().where(
-            ((user_id is None) | (IdentityImages.user == user_id))
-            & ((from_date is None) | (IdentityImages.uploaded_at >= from_date))
-            & ((to_date is None) | (IdentityImages.uploaded_at <= to_date))
-        )
-        if page:
-            return list(search_results.paginate(page, USER_IN_PAGE))
-        else:
-            return list(search_results)
+    def get_identity_images(user_id: int = None, from_date: datetime = None, to_date: datetime = None,
+                            page: int = None, after: str = None, limit: int = None):
+        # only the filters given end up in the SQL, "? IS NULL OR ..." would keep SQLite off the indexes
+        search_results = IdentityImages.select()
+        if user_id is not None:
+            search_results = search_results.where(IdentityImages.user == user_id)
+        if from_date is not None:
+            search_results = search_results.where(IdentityImages.uploaded_at >= from_date)
+        if to_date is not None:
+            search_results = search_results.where(IdentityImages.uploaded_at <= to_date)
+        return pagination.paginate(search_results, IdentityImages.ID, page=page, after=after, limit=limit)
 
     @staticmethod
     def get_image_path(image_id: int, user_id: int = None) -> str:
         image = IdentityImages.get_or_none(image_id)
         if image is None:
             return None
-        if user_id is not None and image.user.ID != user_id:
+        if user_id is not None and image.user_id != user_id:
             raise ValueError("Bạn không có quyền truy cập ảnh này")
+        return None if image.image_failed else image.path
+
+    @staticmethod
+    def mark_image_failed(image_id: int) -> str:
+        """The image could not be normalized, returns its path so the upload can be deleted"""
+        image = IdentityImages.get_or_none(image_id)
+        if image is None:
+            return None
+        image.image_failed = True
+        image.save()
         return image.path
 
     @staticmethod
-    def add_identity_image(user_id: int, image_data: str) -> IdentityImages:
+    def get_identity_image(image_id: int) -> IdentityImages:
+        return IdentityImages.get_or_none(image_id)
+
+    @staticmethod
+    def get_approved_paths(user_ids: list) -> list:
+        """(image_id, user_id, path) of the approved identity images of the given users"""
+        return list(
+            IdentityImages
+            .select(IdentityImages.ID, IdentityImages.user, IdentityImages.path)
+            .where(IdentityImages.user.in_(user_ids) & (IdentityImages.approve == True))
+            .tuples()
+        )
+
+    @staticmethod
+    def add_identity_image(user_id: int, image_key: str) -> IdentityImages:
+        # image_key is the uploaded image, already in identity_storage and normalized by a job
         # check user_id
         user = User.get_or_none(ID=user_id)
         if not user:
             raise ValueError("Tài khoản không tồn tại")
-        # prepare
-        now = datetime.now().strftime("%Y-%m-%d.%H-%M-%S")
-        filename = f"student_{user_id}.{uuid.uuid4()}.{now}.jpg"
-        save_dir = os.path.join(IDENTITY_IMAGE_DIR, str(user_id))
-        os.makedirs(save_dir, exist_ok=True)
-        filepath = os.path.join(save_dir, filename)
-        # upload image
-        try:
-            file_handle.save_file(image_data, filepath)
-        except Exception as err:
-            print("Error when save file " + filepath)
-            print(err)
-            return None
-        # update in db
-        try:
-            created = IdentityImages(path=filepath, user=user_id)
-            created.save(force_insert=True)
-        except Exception as err:
-            file_handle.delete_file(filepath)
-            return None
-        return created
+        image = IdentityImages.create(path=image_key, user=user_id)
+        JobController.enqueue(IDENTITY_IMAGE_JOB, {"image_id": image.ID}, IDENTITY_IMAGE_PRIORITY)
+        return image
 
     @staticmethod
-    def remove_identity_image(image_id: int, user_id: int = None):
+    def remove_identity_image(image_id: int, user_id: int = None) -> str:
         image = IdentityImages.get_or_none(image_id)
         if image is None:
             raise ValueError("Ảnh không tồn tại")
         if user_id is not None and image.user.ID != user_id:
             raise ValueError("Bạn không có quyền xóa ảnh này")
-        path = image.path
         image.delete_instance()
-        # todo: Delete identity image
+        # the caller deletes the stored image
+        return image.path
 
     @staticmethod
-    def approve_image(image_id: int):
+    def approve_image(image_id: int) -> IdentityImages:
         IdentityImages.update({"approve": True}).where(IdentityImages.ID == image_id).execute()
+        return IdentityImages.get_or_none(image_id)
 
     @staticmethod
     def reject_image(image_id: int):
         IdentityImages.update({"approve": False}).where(IdentityImages.ID == image_id).execute()
+
+    @staticmethod
+    def get_all_for_embedding() -> list:
+        """(image_id, user_id, path, approve) of every identity image"""
+        return list(
+            IdentityImages
+            .select(IdentityImages.ID, IdentityImages.user, IdentityImages.path, IdentityImages.approve)
+            .tuples()
+        )
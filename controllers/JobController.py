@@ -0,0 +1,75 @@
+import json
+from datetime import datetime, timedelta
+from peewee import fn
+from models.Job import Job
+
+# kinds of jobs, their handlers are registered in utils/upload_jobs.py
+CHECKIN_IMAGE_JOB = "checkin_image"
+IDENTITY_IMAGE_JOB = "identity_image"
+# students wait at the door for their check-in, identity images can wait
+CHECKIN_IMAGE_PRIORITY = 10
+IDENTITY_IMAGE_PRIORITY = 0
+
+
+class JobController:
+    @staticmethod
+    def enqueue(kind: str, payload: dict, priority: int = 0, max_attempts: int = 5) -> Job:
+        # called inside the write that creates what the job works on, so both are committed together
+        return Job.create(kind=kind, payload=json.dumps(payload), priority=priority, max_attempts=max_attempts)
+
+    @staticmethod
+    def is_pending(kind: str, payload: dict) -> bool:
+        """Whether a job of kind with this payload is still queued or running"""
+        return Job\
+            .select()\
+            .where((Job.kind == kind) & (Job.payload == json.dumps(payload)) & Job.status.in_(["queued", "running"]))\
+            .exists()
+
+    @staticmethod
+    def claim() -> Job:
+        """Mark the next due job of the highest priority as running and return it, None if there is none"""
+        now = datetime.now()
+        job = Job\
+            .select()\
+            .where((Job.status == "queued") & (Job.run_after <= now))\
+            .order_by(Job.priority.desc(), Job.run_after, Job.ID)\
+            .first()
+        if job is None:
+            return None
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = now
+        job.save()
+        return job
+
+    @staticmethod
+    def finish(job_id: int):
+        Job.update({"status": "done", "finished_at": datetime.now(), "last_error": None})\
+            .where(Job.ID == job_id)\
+            .execute()
+
+    @staticmethod
+    def fail(job_id: int, error: str, retry_in: float = None):
+        """Queue the job again after retry_in seconds, or give up on it when retry_in is None"""
+        if retry_in is None:
+            detail = {"status": "failed", "finished_at": datetime.now()}
+        else:
+            detail = {"status": "queued", "run_after": datetime.now() + timedelta(seconds=retry_in)}
+        Job.update({**detail, "last_error": error}).where(Job.ID == job_id).execute()
+
+    @staticmethod
+    def requeue_running() -> int:
+        """Jobs left running by a stopped process are queued again, returns how many"""
+        return Job.update({"status": "queued"}).where(Job.status == "running").execute()
+
+    @staticmethod
+    def purge(finished_before: datetime) -> int:
+        """Delete done jobs finished before the given time, failed ones are kept for inspection"""
+        return Job.delete().where((Job.status == "done") & (Job.finished_at < finished_before)).execute()
+
+    @staticmethod
+    def count_by_status() -> dict:
+        return {
+            status: count
+            for status, count in Job.select(Job.status, fn.COUNT(Job.ID)).group_by(Job.status).tuples()
+        }
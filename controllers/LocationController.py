@@ -1,5 +1,6 @@
-from config import USER_IN_PAGE
 from models.Location import Location
+from models.Search import LocationSearch
+from utils import search_index, pagination
 
 
 class LocationController:
@@ -8,18 +9,17 @@ class LocationController:
         return Location.get_or_none(ID=location_id)
 
     @staticmethod
-    def search(keyword: str = "", page: int = None) -> list:
-        search_results = Location.select().where(
-            (Location.name.contains(keyword))
+    def search(keyword: str = "", page: int = None, after: str = None, limit: int = None) -> list:
+        search_results = search_index.apply_search(
+            Location.select(),
+            LocationSearch,
+            search_index.prefix_query(keyword, ["name_normalized"])
         )
-        if page:
-            return list(search_results.paginate(page, USER_IN_PAGE))
-        else:
-            return list(search_results)
+        return pagination.paginate(search_results, Location.ID, page=page, after=after, limit=limit)
 
     @staticmethod
     def update(location_id: int, detail: dict) -> Location:
-        Location.update(**detail).where(Location.ID == location_id).execute()
+        Location.update(**Location.normalize(detail)).where(Location.ID == location_id).execute()
         return Location.get_or_none(location_id)
 
     @staticmethod
@@ -1,9 +1,7 @@
 from datetime import datetime
 from models.Manager import Manager
-from config import USER_IN_PAGE, AVATAR_DIR, AVATAR_BASE_URL
-from utils import file_handle
-import os
-import uuid
+from models.Search import ManagerSearch
+from utils import search_index, pagination
 
 
 class ManagerController:
@@ -12,80 +10,57 @@ class ManagerController:
         return Manager.get_or_none(ID=user_id)
 
     @staticmethod
-    def search(fullname: str = None, phone: str = "", username: str = "", page: int = None) -> list:
-        search_results = Manager.select().where(
-            (Manager.fullname.contains(fullname))
-            & (((Manager.phone.is_null()) & (phone == "")) | (Manager.phone.contains(phone)))
-            & (Manager.username.contains(username))
+    def search(fullname: str = None, phone: str = "", username: str = "",
+               page: int = None, after: str = None, limit: int = None) -> list:
+        search_results = search_index.apply_search(
+            Manager.select(),
+            ManagerSearch,
+            search_index.prefix_query(fullname, ["fullname_normalized"]),
+            search_index.prefix_query(phone, ["phone"]),
+            search_index.prefix_query(username, ["username"])
         )
-        if page:
-            return list(search_results.paginate(page, USER_IN_PAGE))
-        else:
-            return list(search_results)
+        return pagination.paginate(search_results, Manager.ID, page=page, after=after, limit=limit)
 
     @staticmethod
     def update(user_id: int, detail: dict) -> Manager:
         detail["updated_at"] = datetime.now()
-        Manager.update(**detail).where(Manager.ID == user_id).execute()
+        Manager.update(**Manager.normalize(detail)).where(Manager.ID == user_id).execute()
         return Manager.get_or_none(ID=user_id)
 
     @staticmethod
     def create(detail) -> Manager:
-        user = Manager(**detail)
-        user.update_password(detail["password"])  # include save method
-        return user
+        # detail["password"] is already hashed
+        return Manager.create(**detail)
 
     @staticmethod
-    def change_password(user_id: int, old_password: str, new_password: str):
-        user = Manager.get_or_none(ID=user_id)
+    def get_password_hash(user_id: int) -> str:
+        user = Manager.select(Manager.password).where(Manager.ID == user_id).first()
         if user is None:
             raise ValueError("Tài khoản không tồn tại")
-        if not user.compare_password(old_password):
-            raise ValueError("Mật khẩu cũ không chính xác")
-        user.update_password(new_password)
+        return user.password
 
     @staticmethod
-    def force_change_password(user_id: int, new_password: str):
-        user = Manager.get_or_none(ID=user_id)
-        if user:
-            user.update_password(new_password)
+    def replace_password(user_id: int, old_hash: str, new_hash: str) -> bool:
+        # only if nobody changed the password since old_hash was read
+        return Manager.update(password=new_hash)\
+            .where((Manager.ID == user_id) & (Manager.password == old_hash))\
+            .execute() > 0
+
+    @staticmethod
+    def force_change_password(user_id: int, password_hash: str):
+        Manager.update(password=password_hash).where(Manager.ID == user_id).execute()
 
     @staticmethod
-    def update_avatar(user_id: int, image_data: str) -> str:
+    def update_avatar(user_id: int, avatar_url: str) -> str:
+        # avatar_url points to the uploaded image, already in avatar_storage; returns the replaced one
         # check user_id
         user = Manager.get_or_none(ID=user_id)
         if not user:
             raise ValueError("Tài khoản không tồn tại")
-        # prepare
-        now = datetime.now().strftime("%Y-%m-%d.%H-%M-%S")
-        filename = f"manager_{user_id}.{uuid.uuid4()}.{now}.jpg"
-        filepath = os.path.join(AVATAR_DIR, filename)
-        avatar_url = AVATAR_BASE_URL + "/" + filename
         old_avatar = user.avatar_image
-        # upload image
-        try:
-            file_handle.save_file(image_data, filepath)
-        except Exception as err:
-            print("Error when save file " + filepath)
-            print(err)
-            return ""
-        # update in db
-        try:
-            user.avatar_image = avatar_url
-            user.save()
-        except Exception as err:
-            file_handle.delete_file(filepath)
-            return ""
-        # delete old file
-        if old_avatar:
-            old_filename = old_avatar.split("/")[-1]
-            old_filepath = os.path.join(AVATAR_DIR, old_filename)
-            try:
-                file_handle.delete_file(old_filepath)
-            except Exception as err:
-                print(">> Error when delete old avatar " + old_filepath)
-                print(err)
-        return avatar_url
+        user.avatar_image = avatar_url
+        user.save()
+        return old_avatar
 
 
 
@@ -1,3 +1,25 @@
 from peewee import SqliteDatabase
+import config
 
-db = SqliteDatabase("database.db", pragmas={'foreign_keys': 1})
+DATABASE_MODE = getattr(config, "DATABASE_MODE", "development")
+DATABASE_BUSY_TIMEOUT = getattr(config, "DATABASE_BUSY_TIMEOUT", 5)
+
+DEVELOPMENT_PRAGMAS = {
+    'foreign_keys': 1,
+}
+PRODUCTION_PRAGMAS = {
+    'foreign_keys': 1,
+    # readers keep going while the writer commits
+    'journal_mode': 'wal',
+    # with WAL, NORMAL only fsyncs at checkpoints
+    'synchronous': 'normal',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+db = SqliteDatabase(
+    "database.db",
+    pragmas=PRODUCTION_PRAGMAS if DATABASE_MODE == "production" else DEVELOPMENT_PRAGMAS,
+    timeout=DATABASE_BUSY_TIMEOUT
+)
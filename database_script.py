@@ -4,14 +4,58 @@ from models.Event import *
 from models.User import *
 from models.Location import *
 from models.Manager import *
+from models.RevokedToken import *
+from models.Job import Job
+from models.Search import SEARCH_MODELS
+from utils.search_index import create_search_index
+from utils.event_counter import create_counter_triggers, repair_counters
+from utils.embedding_store import rebuild_embeddings, identity_embeddings, checkin_embeddings
+from utils.storage import identity_storage, checkin_storage
+from utils import face_embedding
+from controllers.IdentityImageController import IdentityImageController
+from controllers.CheckinController import CheckinController
+from playhouse.migrate import SqliteMigrator, migrate
+from peewee import sort_models
 from datetime import datetime
+import sys
+
+
+MODELS = [User, Manager, IdentityImages, Group, JoinGroup,
+          Location, Event, CheckinImage, LimitGroup, RegisterEvent, EventDetail, RevokedToken, Job]
+
+
+def add_missing_columns(database: SqliteDatabase, model) -> list:
+    existing = {column.name for column in database.get_columns(model._meta.table_name)}
+    missing = [field for field in model._meta.sorted_fields if field.column_name not in existing]
+    if missing:
+        migrator = SqliteMigrator(database)
+        migrate(*[migrator.add_column(model._meta.table_name, field.column_name, field) for field in missing])
+    return [field.name for field in missing]
+
+
+def fill_normalized_fields(model):
+    for row in model.select():
+        model.update(**model.normalize({source: getattr(row, source) for source in model.normalized_fields}))\
+            .where(model._meta.primary_key == row.get_id())\
+            .execute()
 
 
 def init_table(database: SqliteDatabase):
-    database.create_tables(
-        [User, Manager, IdentityImages, Group, JoinGroup,
-         Location, Event, CheckinImage, LimitGroup, RegisterEvent, EventDetail]
-    )
+    # tables first and indexes last: an index over a column an existing table does not have yet
+    # would be accepted by SQLite (the unknown name is read as a string) and break add_column
+    for model in sort_models(MODELS):
+        model._schema.create_table(safe=True)
+    # bring tables of existing databases up to date with the models
+    for model in MODELS:
+        added = add_missing_columns(database, model)
+        if any(field in added for field in model.normalized_fields.values()):
+            with database.atomic():
+                fill_normalized_fields(model)
+    for model in MODELS:
+        model._schema.create_indexes(safe=True)
+    for search_model in SEARCH_MODELS:
+        create_search_index(database, search_model)
+    create_counter_triggers(database)
 
 
 def seed_data():
@@ -95,7 +139,25 @@ def seed_data():
 if __name__ == "__main__":
     # create db
     init_table(db)
-    # seed data
-    seed_data()
+    if sys.argv[1:] == ["repair-counters"]:
+        # recompute the event counters, in case rows were changed with the triggers missing
+        print(f"Repaired {repair_counters(db)} event counters")
+    elif sys.argv[1:] == ["reset-face-scores"]:
+        # the scores of check-ins were computed by another face embedding model
+        print(f"Reset the scores of {CheckinController.reset_scores()} check ins")
+    elif sys.argv[1:] == ["rebuild-embeddings"] and not face_embedding.FACE_EMBEDDING_ENABLED:
+        print("No face embedding model is configured (FACE_EMBEDDING_MODEL)")
+    elif sys.argv[1:] == ["rebuild-embeddings"]:
+        # recompute the embedding stores from the identity and check-in images, with the app stopped
+        stored = rebuild_embeddings(
+            identity_storage, IdentityImageController.get_all_for_embedding(), identity_embeddings.directory)
+        print(f"Stored {stored} identity embeddings")
+        stored = rebuild_embeddings(
+            checkin_storage, CheckinController.get_all_for_embedding(), checkin_embeddings.directory)
+        print(f"Stored {stored} check-in embeddings")
+        face_embedding.shutdown()
+    else:
+        # seed data
+        seed_data()
     # end
     db.close()
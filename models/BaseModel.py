@@ -1,7 +1,24 @@
 from peewee import Model
 from database_connection import db
+from utils.text_normalizer import fold_text
 
 
 class BaseModel(Model):
+    # source field -> shadow field holding its accent folded text, used by search
+    normalized_fields = {}
+
+    def save(self, *args, **kwargs):
+        for source, target in self.normalized_fields.items():
+            setattr(self, target, fold_text(getattr(self, source)))
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def normalize(cls, detail: dict) -> dict:
+        """Add the shadow fields to a dict of values passed to Model.update"""
+        for source, target in cls.normalized_fields.items():
+            if source in detail:
+                detail[target] = fold_text(detail[source])
+        return detail
+
     class Meta:
         database = db
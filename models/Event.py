@@ -4,7 +4,7 @@ from models.BaseModel import BaseModel
 from models.Location import Location
 from models.Manager import Manager
 from models.User import User
-from models.Group import Group
+from models.Group import Group, JoinGroup
 from config import LIMIT_CHECKIN
 
 class Event(BaseModel):
@@ -12,7 +12,9 @@ class Event(BaseModel):
     ID = PrimaryKeyField()
     # Info
     title = CharField()
+    title_normalized = CharField(null=True)
     place = TextField()
+    place_normalized = TextField(null=True)
     maximum_participant = IntegerField(null=True, constraints=[SQL("UNSIGNED")])
     # FK
     location = ForeignKeyField(Location, null=True, backref="has_events", on_delete="SET NULL")
@@ -30,6 +32,8 @@ class Event(BaseModel):
     soon_checkout_time = IntegerField(null=True, constraints=[SQL("UNSIGNED")])
     late_checkout_time = IntegerField(null=True, constraints=[SQL("UNSIGNED")])
 
+    normalized_fields = {"title": "title_normalized", "place": "place_normalized"}
+
     def add_group(self, group: Group):
         return LimitGroup.get_or_create(group=group, event=self)
 
@@ -37,30 +41,49 @@ class Event(BaseModel):
         LimitGroup.delete().where((LimitGroup.group == group) & (LimitGroup.event == self))
 
     def valid_to_register(self, user: User):
-        # Check if registerd
-        registered = RegisterEvent.get_or_none(event=self, user=user)
-        if registered:
-            if registered.block:
+        # Registration status, capacity and group membership in one round-trip
+        register_block = RegisterEvent\
+            .select(RegisterEvent.block)\
+            .where((RegisterEvent.event == Event.ID) & (RegisterEvent.user == user))
+        num_participant = EventCounter.select(EventCounter.registered).where(EventCounter.event == Event.ID)
+        has_limit = LimitGroup.select().where(LimitGroup.event == Event.ID)
+        in_limit_group = LimitGroup\
+            .select()\
+            .join(JoinGroup, on=(JoinGroup.group == LimitGroup.group))\
+            .where((LimitGroup.event == Event.ID) & (JoinGroup.user == user) & (JoinGroup.approve == True))
+        status = Event\
+            .select(register_block.alias("register_block"),
+                    fn.COALESCE(num_participant, 0).alias("num_participant"),
+                    fn.EXISTS(has_limit).alias("has_limit"),
+                    fn.EXISTS(in_limit_group).alias("in_limit_group"))\
+            .where(Event.ID == self.ID)\
+            .dicts()\
+            .get()
+        if status["register_block"] is not None:
+            if status["register_block"]:
                 return False, "Bạn đã bị chặn khỏi sự kiện này"
             return False, "Sự kiện đã được đăng ký từ trước"
         # check if enough member
-        if self.maximum_participant is not None:
-            num_participants = RegisterEvent.select()\
-                .where((RegisterEvent.event == self) & (RegisterEvent.block == False))\
-                .count()
-            if num_participants >= self.maximum_participant:
-                return False, "Đã vượt quá số người cho phép"
+        if self.maximum_participant is not None and status["num_participant"] >= self.maximum_participant:
+            return False, "Đã vượt quá số người cho phép"
         # Check if not in group
-        limit_groups = LimitGroup.select().where(LimitGroup.event == self)
-        if limit_groups.exists():
-            for group in limit_groups:
-                if group.has_member(user):
-                    return True, ""
+        if status["has_limit"] and not status["in_limit_group"]:
             return False, "Bạn không thuộc nhóm được phép đăng ký"
         return True, ""
 
-    def add_participant(self, user: User, add_by: Manager = None, note: str = None):
-        return RegisterEvent.get_or_create(user=user, event=self, block=False, added_by=add_by, note=note)
+    def add_participant(self, user: User, add_by: Manager = None, note: str = None) -> bool:
+        # Conditional insert: the seat check and the insert are one statement,
+        # so concurrent registrations can never push the event past maximum_participant
+        num_participant = EventCounter.select(EventCounter.registered).where(EventCounter.event == Event.ID)
+        has_seat = Event.maximum_participant.is_null() | (fn.COALESCE(num_participant, 0) < Event.maximum_participant)
+        row = Event\
+            .select(Value(user), Event.ID, Value(add_by), Value(False), Value(note), Value(datetime.now()))\
+            .where((Event.ID == self.ID) & has_seat)
+        inserted = RegisterEvent.insert_from(row, [
+            RegisterEvent.user, RegisterEvent.event, RegisterEvent.added_by,
+            RegisterEvent.block, RegisterEvent.note, RegisterEvent.created_at
+        ]).execute()
+        return inserted > 0
 
     def check_in_with_image(self, user: User, image_path: str, accept: bool = None, score: float = None):
         return CheckinImage.create(path=image_path, user=user, event=self, accept=accept, score=score)
@@ -84,6 +107,15 @@ class EventDetail(BaseModel):
     leader = ForeignKeyField(Manager, null=True, backref="lead_events", on_delete="SET NULL")
 
 
+class EventCounter(BaseModel):
+    # Maintained by triggers on RegisterEvent and CheckinImage (see utils/event_counter.py)
+    event = ForeignKeyField(Event, primary_key=True, backref="counter", on_delete="CASCADE")
+    registered = IntegerField(default=0)
+    blocked = IntegerField(default=0)
+    checked_in = IntegerField(default=0)
+    pending_review = IntegerField(default=0)
+
+
 class CheckinImage(BaseModel):
     # PK
     ID = PrimaryKeyField()
@@ -93,9 +125,26 @@ class CheckinImage(BaseModel):
     accept = BooleanField(default=None, null=True)
     accepted_at = DateTimeField(null=True)
     score = DoubleField(null=True, constraints=[Check("score IS NULL OR (score >= 0 AND score <= 1)")])
+    # another user whose face this photo matches best, see utils/duplicate_faces.py
+    suspect_score = DoubleField(null=True)
+    # metres from the location of the event to the device, see utils/geofence.py
+    distance = DoubleField(null=True)
+    # with no distance: the event has a location but the device sent no position
+    outside_fence = BooleanField(default=False)
+    # the photo could not be normalized, the upload was deleted, see utils/upload_jobs.py
+    image_failed = BooleanField(default=False)
     # FK
     user = ForeignKeyField(User, backref="checkin_images", on_delete="CASCADE")
     event = ForeignKeyField(Event, backref="checkin_image", on_delete="CASCADE")
+    suspect_user = ForeignKeyField(User, null=True, backref="suspected_checkins", on_delete="SET NULL")
+
+    class Meta:
+        indexes = (
+            # valid_to_checkin: covers the accept lookups of one user in one event
+            (('event', 'user', 'accept'), False),
+            # suspicious check-ins of one event
+            (('event', 'suspect_user'), False),
+        )
 
     def approve_checkin(self, score: float = None):
         self.accept = True
@@ -111,20 +160,28 @@ class CheckinImage(BaseModel):
 
     @staticmethod
     def valid_to_checkin(user_id: int, event_id: int):
-        register = RegisterEvent.get_or_none(user=user_id, event=event_id)
-        if register is None:
+        # Registration and the check-in tally of this user in one aggregate query
+        register_block = RegisterEvent\
+            .select(RegisterEvent.block)\
+            .where((RegisterEvent.user == user_id) & (RegisterEvent.event == event_id))
+        status = CheckinImage\
+            .select(register_block.alias("register_block"),
+                    fn.COUNT(CheckinImage.ID).alias("total"),
+                    fn.SUM(Case(None, [(CheckinImage.accept.is_null(), 1)], 0)).alias("pending"),
+                    fn.SUM(Case(None, [(CheckinImage.accept == True, 1)], 0)).alias("accepted"))\
+            .where((CheckinImage.event == event_id) & (CheckinImage.user == user_id))\
+            .dicts()\
+            .get()
+        if status["register_block"] is None:
             return False, "Bạn không thể điểm danh khi chưa đăng ký sự kiện"
-        if register.block:
+        if status["register_block"]:
             return False, "Bạn đã bị chặn khỏi sự kiện này"
-        checkins = CheckinImage.select().where((CheckinImage.event == event_id) & (CheckinImage.user == user_id))
-        if checkins.count() >= LIMIT_CHECKIN:
+        if status["total"] >= LIMIT_CHECKIN:
             return False, "Đã vượt quá số lần điểm danh cho phép"
-        for checkin in checkins:
-            print(checkin.accept)
-            if checkin.accept is None:
-                return False, "Bạn đang có một lượt điểm danh chưa được đánh giá"
-            if checkin.accept is True:
-                return False, "Bạn đã điểm danh thành công cho sự kiên này từ trước"
+        if status["pending"]:
+            return False, "Bạn đang có một lượt điểm danh chưa được đánh giá"
+        if status["accepted"]:
+            return False, "Bạn đã điểm danh thành công cho sự kiên này từ trước"
         return True, ""
 
     def __str__(self):
@@ -161,6 +218,10 @@ class RegisterEvent(BaseModel):
     # PK
     class Meta:
         primary_key = CompositeKey('user', 'event')
+        indexes = (
+            # participant counts and listing of one event
+            (('event', 'block'), False),
+        )
 
     def __str__(self):
         return f"{str(self.user)} register {str(self.group)}"
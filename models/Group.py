@@ -10,10 +10,13 @@ class Group(BaseModel):
     ID = PrimaryKeyField()
     # info
     name = CharField(max_length=255)
+    name_normalized = CharField(max_length=255, null=True)
     description = TextField(null=True)
-    code = CharField(max_length=255, null=True)
+    code = CharField(max_length=255, null=True, index=True)
     require_approve = BooleanField(default=False)
 
+    normalized_fields = {"name": "name_normalized"}
+
     def add_member(self, user: User, add_by: Manager = None, approve: bool = None):
         result = JoinGroup(user=user, group=self, added_by=add_by)
         result.approve = approve if self.require_approve else True
@@ -42,7 +45,7 @@ class Group(BaseModel):
         return JoinGroup.select().where(
             (JoinGroup.user == user)
             & (JoinGroup.group == self)
-            & (JoinGroup.approve is True)
+            & (JoinGroup.approve == True)
         ).exists()
 
     def valid_to_join(self, user_id: int):
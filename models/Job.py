@@ -0,0 +1,34 @@
+from peewee import *
+from models.BaseModel import BaseModel
+from datetime import datetime
+
+
+class Job(BaseModel):
+    # PK
+    ID = PrimaryKeyField()
+    # Info: which handler runs it, with the JSON encoded keyword arguments
+    kind = CharField()
+    payload = TextField()
+    # higher runs first
+    priority = IntegerField(default=0)
+    # queued, running, done or failed
+    status = CharField(default="queued")
+    attempts = IntegerField(default=0)
+    max_attempts = IntegerField(default=5)
+    last_error = TextField(null=True)
+    # Time
+    created_at = DateTimeField(default=datetime.now)
+    run_after = DateTimeField(default=datetime.now)
+    started_at = DateTimeField(null=True)
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        indexes = (
+            # claim: the next due job of the highest priority
+            (('status', 'priority', 'run_after'), False),
+            # is_pending: whether the job of an upload has run yet
+            (('kind', 'payload'), False),
+        )
+
+    def __str__(self):
+        return f"Job {self.ID} {self.kind}: {self.status}"
@@ -7,9 +7,12 @@ class Location(BaseModel):
     ID = PrimaryKeyField()
     # Info
     name = TextField()
+    name_normalized = TextField(null=True)
     longitude = DoubleField()
     latitude = DoubleField()
     radius = DoubleField()
 
+    normalized_fields = {"name": "name_normalized"}
+
     def __str__(self):
         return str(self.name)
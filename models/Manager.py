@@ -1,9 +1,7 @@
 from peewee import *
 from models.BaseModel import BaseModel
 from datetime import datetime
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from utils.password_hasher import hash_password, verify_password
 
 
 class Manager(BaseModel):
@@ -11,6 +9,7 @@ class Manager(BaseModel):
     ID = PrimaryKeyField()
     # info
     fullname = CharField(max_length=255)
+    fullname_normalized = CharField(max_length=255, null=True)
     email = CharField(max_length=255, null=True)
     phone = CharField(max_length=15, null=True)
     is_admin = BooleanField(default=False)
@@ -22,11 +21,13 @@ class Manager(BaseModel):
     username = CharField(max_length=255, unique=True)
     password = CharField(max_length=255)
 
-    def compare_password(self, hash_password):
-        pwd_context.verify(self.password, hash_password)
+    normalized_fields = {"fullname": "fullname_normalized"}
+
+    def compare_password(self, password: str) -> bool:
+        return verify_password(password, self.password)
 
     def update_password(self, password: str):
-        self.password = pwd_context.hash(password)
+        self.password = hash_password(password)
         self.save()
 
     def __str__(self):
@@ -0,0 +1,18 @@
+from peewee import *
+from models.BaseModel import BaseModel
+from datetime import datetime
+
+
+class RevokedToken(BaseModel):
+    # PK: hex SHA-256 of the token
+    digest = CharField(max_length=64, primary_key=True)
+    # time
+    revoked_at = DateTimeField(default=datetime.now)
+    expired_at = DateTimeField(index=True)
+
+    @staticmethod
+    def revoke(digest: str, expired_at: datetime):
+        RevokedToken.insert(digest=digest, expired_at=expired_at).on_conflict_ignore().execute()
+
+    def __str__(self):
+        return f"Token {self.digest} revoked at {str(self.revoked_at)}"
@@ -0,0 +1,60 @@
+from playhouse.sqlite_ext import FTS5Model, SearchField
+from database_connection import db
+from models.User import User
+from models.Manager import Manager
+from models.Event import Event
+from models.Group import Group
+from models.Location import Location
+
+# Full-text indexes over the searchable columns, kept in sync by triggers (see utils/search_index.py).
+# Names and titles are indexed through their accent folded shadow columns.
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+
+class SearchModel(FTS5Model):
+    class Meta:
+        database = db
+
+
+class UserSearch(SearchModel):
+    fullname_normalized = SearchField()
+    student_id = SearchField()
+    phone = SearchField()
+    username = SearchField()
+
+    class Meta:
+        options = {"content": User, "content_rowid": User.ID, "tokenize": TOKENIZER}
+
+
+class ManagerSearch(SearchModel):
+    fullname_normalized = SearchField()
+    phone = SearchField()
+    username = SearchField()
+
+    class Meta:
+        options = {"content": Manager, "content_rowid": Manager.ID, "tokenize": TOKENIZER}
+
+
+class EventSearch(SearchModel):
+    title_normalized = SearchField()
+    place_normalized = SearchField()
+
+    class Meta:
+        options = {"content": Event, "content_rowid": Event.ID, "tokenize": TOKENIZER}
+
+
+class GroupSearch(SearchModel):
+    name_normalized = SearchField()
+
+    class Meta:
+        options = {"content": Group, "content_rowid": Group.ID, "tokenize": TOKENIZER}
+
+
+class LocationSearch(SearchModel):
+    name_normalized = SearchField()
+
+    class Meta:
+        options = {"content": Location, "content_rowid": Location.ID, "tokenize": TOKENIZER}
+
+
+SEARCH_MODELS = [UserSearch, ManagerSearch, EventSearch, GroupSearch, LocationSearch]
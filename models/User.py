@@ -1,9 +1,7 @@
 from peewee import *
 from models.BaseModel import BaseModel
 from datetime import datetime
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from utils.password_hasher import hash_password, verify_password
 
 
 class User(BaseModel):
@@ -11,6 +9,7 @@ class User(BaseModel):
     ID = PrimaryKeyField()
     # info
     fullname = CharField(max_length=255)
+    fullname_normalized = CharField(max_length=255, null=True)
     date_of_birth = DateField()
     student_id = CharField(max_length=9, unique=True)
     email = CharField(max_length=255, null=True)
@@ -27,6 +26,8 @@ class User(BaseModel):
     username = CharField(max_length=255, unique=True)
     password = CharField(max_length=255)
 
+    normalized_fields = {"fullname": "fullname_normalized"}
+
     def add_identity_image(self, path: str):
         IdentityImages.create(path=path, user=self)
 
@@ -36,11 +37,11 @@ class User(BaseModel):
         elif path:
             IdentityImages.delete().where((IdentityImages.path == path) & (IdentityImages.user == self))
 
-    def compare_password(self, hash_password):
-        pwd_context.verify(self.password, hash_password)
+    def compare_password(self, password: str) -> bool:
+        return verify_password(password, self.password)
 
     def update_password(self, password: str):
-        self.password = pwd_context.hash(password)
+        self.password = hash_password(password)
         self.save()
 
     def __str__(self):
@@ -54,8 +55,15 @@ class IdentityImages(BaseModel):
     path = CharField()
     uploaded_at = DateTimeField(default=datetime.now())
     approve = BooleanField(default=False)
+    # the image could not be normalized, the upload was deleted, see utils/upload_jobs.py
+    image_failed = BooleanField(default=False)
     # FK
     user = ForeignKeyField(User, backref="identity_images", on_delete="CASCADE")
 
+    class Meta:
+        indexes = (
+            (('user', 'uploaded_at'), False),
+        )
+
     def __str__(self):
         return f"Image {str(self.ID)} of  {str(self.user)}"
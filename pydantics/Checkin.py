@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from datetime import datetime
 from typing import Optional
+from utils.face_embedding import FACE_EMBEDDING_ENABLED
 from utils.peewee_util import PeeweeGetterDict
 
 
@@ -10,11 +11,19 @@ class CheckinNoUserNoEvent(BaseModel):
     accept: Optional[bool] = None
     accepted_at: Optional[datetime] = None
     score: Optional[float] = None
+    distance: Optional[float] = None
+    outside_fence: bool = False
+    image_failed: bool = False
 
     class Config:
         orm_mode = True
         getter_dict = PeeweeGetterDict
 
+    @validator("score")
+    def hide_score(cls, value):
+        # without the face embedding model it came from, a stored score means nothing
+        return value if FACE_EMBEDDING_ENABLED else None
+
 
 class BriefUser(BaseModel):
     ID: int
@@ -62,3 +71,10 @@ class CheckIn(CheckinNoUserNoEvent):
         getter_dict = PeeweeGetterDict
 
 
+class SuspiciousCheckIn(CheckInNoEvent):
+    suspect_user: BriefUser
+    suspect_score: float
+
+    class Config:
+        orm_mode = True
+        getter_dict = PeeweeGetterDict
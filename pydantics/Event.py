@@ -46,18 +46,32 @@ class EventDetail(BaseModel):
         getter_dict = PeeweeGetterDict
 
 
+class EventCounters(BaseModel):
+    registered: int = 0
+    blocked: int = 0
+    checked_in: int = 0
+    pending_review: int = 0
+
+    class Config:
+        orm_mode = True
+        getter_dict = PeeweeGetterDict
+
+
 class EventOutDetail(EventOut):
     event_detail: Optional[EventDetail] = None
+    counters: Optional[EventCounters] = None
     limit_group: Optional[List[GroupOut]] = []
 
     @staticmethod
     def from_orm_load(event):
-        result = EventOutDetail.from_orm(event)
-        result.event_detail = EventDetail.from_orm(event.event_detail.first())
-        result.limit_group = []
-        for limit in event.limit_groups.select():
-            result.limit_group.append(GroupOut.from_orm(limit.group))
-        return result
+        # event comes from EventController.get_detail, which preloads detail, counters and limit_group;
+        # peewee leaves the joined attribute unset when the outer join found no row
+        return EventOutDetail(
+            **dict(EventOut.from_orm(event)),
+            event_detail=EventDetail.from_orm(getattr(event, "detail", None)),
+            counters=EventCounters.from_orm(getattr(event, "counters", None)),
+            limit_group=[GroupOut.from_orm(group) for group in event.limit_group]
+        )
 
     class Config:
         orm_mode = True
@@ -7,6 +7,7 @@ class IdentityImageNoUser(BaseModel):
     ID: int
     uploaded_at: datetime
     approve: bool
+    image_failed: bool = False
 
     class Config:
         orm_mode = True
@@ -1,24 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from utils.auth_util import authenticate_user, authenticate_manager, create_access_token
+from utils.auth_util import authenticate, create_access_token, revoke_token, forget_token, allow_any_role, \
+    oauth2_scheme, blocked_exception
+from utils.db_executor import run_write
+from utils import error_messages
 from pydantics.Login import LoginForm, LoginMode
+from pydantics.Token import TokenData
+from models.User import User
 
 authentication_router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
 @authentication_router.post("/")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    # login as manager
-    student = authenticate_manager(form_data.username, form_data.password)
-    # login as student
-    manager = authenticate_user(form_data.username, form_data.password)
-    user = student if student else manager
+    # login as manager or student, whichever owns the username
+    user = await authenticate(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Sai tên đăng nhập hoặc mật khẩu",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if isinstance(user, User) and user.block:
+        raise blocked_exception
     access_token = create_access_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
+
+@authentication_router.post("/logout", status_code=status.HTTP_200_OK)
+async def logout(token: str = Depends(oauth2_scheme), current_user: TokenData = Depends(allow_any_role)):
+    """
+        Role:  Student + Manager.
+        Function: Revoke the current access token
+    """
+    try:
+        digest, expire_at = await run_write(revoke_token, token)
+    except Exception as err:
+        print(">> Error when revoke token")
+        print(err)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
+    forget_token(digest, expire_at)
+    return {"success": True}
@@ -1,21 +1,33 @@
 
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
+from config import AVATAR_LIMIT_KB
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form, Response, Request, Query
+from fastapi.responses import FileResponse
 from typing import Optional, List
 from controllers.CheckinController import CheckinController
+from controllers.JobController import JobController, CHECKIN_IMAGE_JOB
 from utils.auth_util import allow_manager, allow_student, allow_any_role
 from pydantics.Token import TokenData
-from pydantics.Checkin import CheckIn, CheckInNoEvent, CheckInNoUser
+from pydantics.Checkin import CheckIn, CheckInNoEvent, CheckInNoUser, SuspiciousCheckIn
 from utils import error_messages
+from utils.pagination import set_next_cursor
+from utils.db_executor import run_in_db, run_write
+from utils.duplicate_faces import FACE_DUPLICATE_ENABLED
+from utils.storage import checkin_storage, new_image_key
+from utils.image_processor import received_image
+from utils.thumbnails import image_response
+from utils.job_queue import job_queue
 
 checkin_router = APIRouter(prefix="/checkin", tags=["checkin"])
 
 
 @checkin_router.get("/", response_model=List[CheckIn], status_code=status.HTTP_200_OK)
 async def get_checkins(
+        response: Response,
         user_id: Optional[int] = None,
         event_id: Optional[int] = None,
-        page: Optional[int] = None,
-        num_in_page: Optional[int] = 10,
+        page: Optional[int] = Query(None, ge=1),
+        num_in_page: Optional[int] = Query(10, ge=1),
+        after: Optional[str] = None,
         current_user: TokenData = Depends(allow_manager)
 ):
     """
@@ -23,19 +35,31 @@ async def get_checkins(
     Function: Get all check in
     """
     try:
-        results = CheckinController.get_checkins(user_id=user_id, event_id=event_id, page=page, num_in_page=num_in_page)
+        results = await run_in_db(
+            CheckinController.get_checkins,
+            user_id=user_id,
+            event_id=event_id,
+            page=page,
+            num_in_page=num_in_page,
+            after=after
+        )
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print("> Error when get checkins")
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, results)
     return results
 
 
 @checkin_router.get("/of-user", response_model=List[CheckInNoUser], status_code=status.HTTP_200_OK)
 async def get_checkins_of_user(
+        response: Response,
         event_id: Optional[int] = None,
-        page: Optional[int] = None,
-        num_in_page: Optional[int] = 10,
+        page: Optional[int] = Query(None, ge=1),
+        num_in_page: Optional[int] = Query(10, ge=1),
+        after: Optional[str] = None,
         current_user: TokenData = Depends(allow_student)
 ):
     """
@@ -43,36 +67,110 @@ async def get_checkins_of_user(
     Function: Get all check in of current user
     """
     try:
-        results = CheckinController.get_checkins(
+        results = await run_in_db(
+            CheckinController.get_checkins,
             user_id=current_user.ID,
             event_id=event_id, page=page,
-            num_in_page=num_in_page
+            num_in_page=num_in_page,
+            after=after
         )
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print("> Error when get checkins of user")
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, results)
     return results
 
 
-@checkin_router.post("/of-event/{event-id}", response_model=CheckInNoUser, status_code=status.HTTP_201_CREATED)
+@checkin_router.get("/of-event/{event_id}/suspicious", response_model=List[SuspiciousCheckIn],
+                    status_code=status.HTTP_200_OK)
+async def get_suspicious_checkins(
+        response: Response,
+        event_id: int,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        current_user: TokenData = Depends(allow_manager)
+):
+    """
+    Role: Manager.
+    Function: Get check ins of an event whose photo looks most like the face of another student
+    """
+    if not FACE_DUPLICATE_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_messages.DUPLICATE_FACES_DISABLED)
+    try:
+        results = await run_in_db(CheckinController.get_suspicious, event_id=event_id, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
+    except Exception as err:
+        print("> Error when get suspicious checkins")
+        print(err)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, results)
+    return results
+
+
+@checkin_router.get("/{checkin_id}/image", response_class=FileResponse, status_code=status.HTTP_200_OK)
+async def get_checkin_image(
+        request: Request,
+        checkin_id: int,
+        size: Optional[str] = None,
+        current_user: TokenData = Depends(allow_any_role)
+):
+    """
+        Role:  Student + Manager.
+        Function: Render a check in image, or its thumbnail when size is given (small, medium)
+    """
+    user_id = current_user.ID if current_user.role == "student" else None
+    try:
+        image_key = await run_in_db(CheckinController.get_image_path, checkin_id=checkin_id, user_id=user_id)
+        # the job rewrites the image itself, thumbnails are normalized when rendered and never rewritten
+        pending = size is None and image_key is not None and await run_in_db(
+            JobController.is_pending, CHECKIN_IMAGE_JOB, {"checkin_id": checkin_id})
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    except Exception as err:
+        print(">> Error when get path of check in image:" + str(err))
+        raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    if image_key is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    try:
+        image = await image_response(checkin_storage, image_key, size, request.headers, pending)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    if image is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return image
+
+
+@checkin_router.post("/of-event/{event_id}", response_model=CheckInNoUser, status_code=status.HTTP_201_CREATED)
 async def check_in(
-        event_id: Optional[int] = None,
+        event_id: int,
         file: UploadFile = File(...),
+        latitude: Optional[float] = Form(None),
+        longitude: Optional[float] = Form(None),
         current_user: TokenData = Depends(allow_student)
 ):
     """
         Role: Student.
-        Function: Student check in an event with face image
+        Function: Student check in an event with face image and the coordinates of the device,
+        checked against the location of the event
     """
-    data = await file.read()
+    image_key = new_image_key(f"student_{current_user.ID}", f"event_{event_id}")
     try:
-        created = CheckinController.checkin(current_user.ID, event_id, data)
+        # reject invalid attempts, outside the geofence too, before spending storage writes on them
+        await run_in_db(CheckinController.validate_checkin, current_user.ID, event_id, latitude, longitude)
+        # the photo is normalized and scored by a job once the check-in is committed
+        async with received_image(checkin_storage, image_key, file, AVATAR_LIMIT_KB):
+            created = await run_write(
+                CheckinController.checkin, current_user.ID, event_id, image_key, latitude, longitude)
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
         print("> Error when check in")
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
+    job_queue.notify()
     return created
 
@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Response, Query
 
 from controllers.EventController import EventController
 from pydantics.Event import EventIn, EventOut, EventOutDetail, EventUpdate, EventDetailUpdate, EventParticipant\
@@ -8,14 +8,20 @@ from pydantics.Event import EventIn, EventOut, EventOutDetail, EventUpdate, Even
 from pydantics.Token import TokenData
 from utils import error_messages
 from utils.auth_util import allow_manager, allow_any_role, allow_student
+from utils.pagination import set_next_cursor
+from utils.db_executor import run_in_db, run_write
+from utils.event_capacity import event_capacity, reserve_seat
 
 event_router = APIRouter(prefix="/events", tags=["events"])
 
 
 @event_router.get("/", response_model=List[EventOut], status_code=status.HTTP_200_OK)
 async def get_events(
+        response: Response,
         keyword: Optional[str] = "",
-        page: Optional[int] = None,
+        page: Optional[int] = Query(None, ge=1),
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
         current_user: TokenData = Depends(allow_any_role)
 ):
     """
@@ -23,42 +29,65 @@ async def get_events(
         Function: Get all event
     """
     try:
-        events = EventController.search(
+        events = await run_in_db(
+            EventController.search,
             keyword=keyword,
-            page=page)
+            page=page,
+            after=after,
+            limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get events:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, events)
     return events
 
 
 @event_router.get("/of-user/{user_id}", response_model=List[EventOfUser], status_code=status.HTTP_200_OK)
-async def get_events_of_user(user_id: int, current_user: TokenData = Depends(allow_manager)):
+async def get_events_of_user(
+        response: Response,
+        user_id: int,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        current_user: TokenData = Depends(allow_manager)
+):
     """
         Role: Manager.
         Function:  Get all event which user registered
     """
     try:
-        events = EventController.get_event_of_user(user_id)
+        events = await run_in_db(EventController.get_event_of_user, user_id, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get event of user")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, events)
     return events
 
 
 @event_router.get("/of-user", response_model=List[EventOfUser], status_code=status.HTTP_200_OK)
-async def get_my_events(current_user: TokenData = Depends(allow_student)):
+async def get_my_events(
+        response: Response,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        current_user: TokenData = Depends(allow_student)
+):
     """
         Role:  Student.
         Function: Get all events which current user registerd
     """
     try:
-        events = EventController.get_event_of_user(current_user.ID)
+        events = await run_in_db(EventController.get_event_of_user, current_user.ID, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get event of user")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, events)
     return events
 
 
@@ -69,14 +98,14 @@ async def get_event(event_id: int, current_user: TokenData = Depends(allow_any_r
         Function: Get detail of event
     """
     try:
-        event = EventController.get_by_id(event_id)
+        event = await run_in_db(EventController.get_detail, event_id)
     except Exception as err:
         print(">> Error when get event")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
     if event is None:
         raise HTTPException(status_code=404)
-    return EventOutDetail.from_orm_load(event)
+    return await run_in_db(EventOutDetail.from_orm_load, event)
 
 
 @event_router.get("/{event_id}/register-status", response_model=EventRegister, status_code=status.HTTP_200_OK)
@@ -87,7 +116,7 @@ async def get_events_of_user(event_id: int, current_user: TokenData = Depends(al
     """
     user_id = current_user.ID
     try:
-        events = EventController.get_event_of_user(user_id, event_id)
+        events = await run_in_db(EventController.get_event_of_user, user_id, event_id)
     except Exception as err:
         print(">> Error when get event of user")
         print(err)
@@ -98,17 +127,26 @@ async def get_events_of_user(event_id: int, current_user: TokenData = Depends(al
 
 
 @event_router.get("/{event_id}/participants", response_model=List[EventParticipant], status_code=status.HTTP_200_OK)
-async def get_participants(event_id: int, current_user: TokenData = Depends(allow_any_role)):
+async def get_participants(
+        response: Response,
+        event_id: int,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        current_user: TokenData = Depends(allow_any_role)
+):
     """
         Role:  Student + Manager.
         Function: Get all student who registered an event
     """
     try:
-        participants = EventController.get_participants(event_id)
+        participants = await run_in_db(EventController.get_participants, event_id, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get participants")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, participants)
     return participants
 
 
@@ -120,7 +158,7 @@ async def create_event(event: EventIn, current_user: TokenData = Depends(allow_m
     """
     event.created_by = current_user.ID
     try:
-        created_event = EventController.create(event.dict())
+        created_event = await run_write(EventController.create, event.dict())
     except Exception as err:
         print(">> Error when create event")
         print(err)
@@ -134,11 +172,16 @@ async def register_event(event_id: int, current_user: TokenData = Depends(allow_
         Role:  Student.
         Function: Register an event for current user
     """
+    generation = await reserve_seat(event_id)
+    if generation is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error_messages.EVENT_FULL)
     try:
-        EventController.register_event(event_id=event_id, user_id=current_user.ID)
+        await run_write(EventController.register_event, event_id=event_id, user_id=current_user.ID)
     except ValueError as err:
+        event_capacity.release(event_id, generation)
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
+        event_capacity.release(event_id, generation)
         print(">> Error when register event")
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
@@ -151,11 +194,16 @@ async def add_participant(event_id: int, user_id: int, current_user: TokenData =
         Role: Manager.
         Function: Register an event for special user
     """
+    generation = await reserve_seat(event_id)
+    if generation is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error_messages.EVENT_FULL)
     try:
-        EventController.register_event(event_id=event_id, user_id=user_id, add_by=current_user.ID)
+        await run_write(EventController.register_event, event_id=event_id, user_id=user_id, add_by=current_user.ID)
     except ValueError as err:
+        event_capacity.release(event_id, generation)
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
+        event_capacity.release(event_id, generation)
         print(">> Error when register event")
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
@@ -177,7 +225,7 @@ async def update_event(
     detail = detail.dict(exclude_unset=True) if detail else {}
     event = event.dict(exclude_unset=True) if event else {}
     try:
-        updated_event = EventController.update(event_id, event, detail)
+        updated_event = await run_write(EventController.update, event_id, event, detail)
     except Exception as err:
         print("Error when update event")
         print(err)
@@ -194,13 +242,14 @@ async def unregister_event_for_user(event_id: int, current_user: TokenData = Dep
         Function: Unregister an event for current event
     """
     try:
-        EventController.unregister_event(event_id=event_id, user_id=current_user.ID)
+        await run_write(EventController.unregister_event, event_id=event_id, user_id=current_user.ID)
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
         print(">> Error when register event")
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
+    event_capacity.release(event_id)
     return {"success": True}
 
 
@@ -211,13 +260,14 @@ async def register_event(event_id: int, user_id: int, current_user: TokenData =
         Function: Unregister an event for special user
     """
     try:
-        EventController.unregister_event(event_id=event_id, user_id=current_user.ID)
+        await run_write(EventController.unregister_event, event_id=event_id, user_id=user_id)
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
         print(">> Error when register event")
         print(err)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_messages.DATABASE_ERROR)
+    event_capacity.release(event_id)
     return {"success": True}
 
 
@@ -228,7 +278,7 @@ async def feedback_event(event_id: int, feedback: Feedback, current_user: TokenD
         Function: Feedback to an event which registered
     """
     try:
-        EventController.feedback(event_id=event_id, user_id=current_user.ID, content=feedback.content)
+        await run_write(EventController.feedback, event_id=event_id, user_id=current_user.ID, content=feedback.content)
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
@@ -250,7 +300,7 @@ async def block_register(
         Function: Block a special user for register an event
     """
     try:
-        EventController.block(event_id=event_id, user_id=user_id, note=feedback.content)
+        await run_write(EventController.block, event_id=event_id, user_id=user_id, note=feedback.content)
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
@@ -270,7 +320,7 @@ async def add_group_to_event(
         Function: add a group whose member can register special event
     """
     try:
-        EventController.add_limit_group(event_id, group_id)
+        await run_write(EventController.add_limit_group, event_id, group_id)
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
@@ -290,7 +340,7 @@ async def add_group_to_event(
         Function: Remove a group whose member can register special event
     """
     try:
-        EventController.remove_limit_group(event_id, group_id)
+        await run_write(EventController.remove_limit_group, event_id, group_id)
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
@@ -307,7 +357,7 @@ async def delete_event(event_id: int, current_user: TokenData = Depends(allow_ma
         Function: Delete an event
     """
     try:
-        EventController.delete(event_id)
+        await run_write(EventController.delete, event_id)
     except Exception as err:
         print("Error when delete event")
         print(err)
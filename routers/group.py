@@ -1,18 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Response, Query
 from utils import error_messages
 from pydantics.Group import GroupIn, GroupOut, GroupUpdate, MemberInGroup, GroupOfMember
 from typing import Optional, List
 from controllers.GroupController import GroupController
 from utils.auth_util import allow_manager, allow_any_role
 from pydantics.Token import TokenData
+from utils.pagination import set_next_cursor
+from utils.db_executor import run_in_db, run_write
 
 group_router = APIRouter(prefix="/groups", tags=["group"])
 
 
 @group_router.get("/", response_model=List[GroupOut], status_code=status.HTTP_200_OK)
 async def get_group(
+        response: Response,
         keyword: Optional[str] = "",
-        page: Optional[int] = None,
+        page: Optional[int] = Query(None, ge=1),
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
         current_user: TokenData = Depends(allow_any_role)
 ):
     """
@@ -20,44 +25,68 @@ async def get_group(
         Function: Get all group
     """
     try:
-        groups = GroupController.search(
+        groups = await run_in_db(
+            GroupController.search,
             keyword=keyword,
-            page=page)
+            page=page,
+            after=after,
+            limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get groups:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, groups)
     return groups
 
 
 @group_router.get("/of-user/{user_id}", response_model=List[GroupOfMember], status_code=status.HTTP_200_OK)
-async def get_group_of_user(user_id: int, current_user: TokenData = Depends(allow_manager)):
+async def get_group_of_user(
+        response: Response,
+        user_id: int,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        current_user: TokenData = Depends(allow_manager)
+):
     """
         Role:  Manager.
         Function: Get all group which user joined
     """
     try:
-        group = GroupController.get_group_of_user(user_id)
+        group = await run_in_db(GroupController.get_group_of_user, user_id, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get group")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
     if group is None:
         raise HTTPException(status_code=404, detail=error_messages.USER_NOT_FOUND)
+    set_next_cursor(response, group)
     return group
 
 
 @group_router.get("/{group_id}/members", response_model=List[MemberInGroup],  status_code=status.HTTP_200_OK)
-async def get_members(group_id: int, current_user: TokenData = Depends(allow_any_role)):
+async def get_members(
+        response: Response,
+        group_id: int,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        current_user: TokenData = Depends(allow_any_role)
+):
     """
         Role:  Student + Manager.
         Function: Get all member of group
     """
     try:
-        members = GroupController.get_member_in_group(group_id)
+        members = await run_in_db(GroupController.get_member_in_group, group_id, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print("Error when get member group")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, members)
     return members
 
 
@@ -68,7 +97,7 @@ async def get_group(group_id: int, current_user: TokenData = Depends(allow_any_r
         Function: Get Group detail
     """
     try:
-        group = GroupController.get_by_id(group_id)
+        group = await run_in_db(GroupController.get_by_id, group_id)
     except Exception as err:
         print(">> Error when get group")
         print(err)
@@ -85,7 +114,7 @@ async def create_group(detail: GroupIn, current_user: TokenData = Depends(allow_
         Function: Create an group
     """
     try:
-        created_group = GroupController.create(detail.dict())
+        created_group = await run_write(GroupController.create, detail.dict())
     except Exception as err:
         print(">> Error when create group")
         print(err)
@@ -100,7 +129,13 @@ async def add_member(group_id: int, user_id: int, current_user: TokenData = Depe
         Function: Add special user to group
     """
     try:
-        GroupController.add_member(user_id=user_id, group_id=group_id, added_by=current_user.ID, approve=True)
+        await run_write(
+            GroupController.add_member,
+            user_id=user_id,
+            group_id=group_id,
+            added_by=current_user.ID,
+            approve=True
+        )
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
@@ -116,7 +151,7 @@ async def approve_member(group_id: int, user_id: int, current_user: TokenData =
         Function: Approve join group request
     """
     try:
-        GroupController.approve_member(group_id, user_id)
+        await run_write(GroupController.approve_member, group_id, user_id)
     except Exception as err:
         print("Error when approve group")
         print(err)
@@ -131,7 +166,7 @@ async def reject_member(group_id: int, user_id: int, current_user: TokenData = D
         Function: Reject an join request
     """
     try:
-        GroupController.reject_member(group_id, user_id)
+        await run_write(GroupController.reject_member, group_id, user_id)
     except Exception as err:
         print("Error when reject group")
         print(err)
@@ -146,7 +181,7 @@ async def remove_member(group_id: int, user_id: int, current_user: TokenData = D
         Function: Remove member from group
     """
     try:
-        GroupController.remove_member(group_id, user_id)
+        await run_write(GroupController.remove_member, group_id, user_id)
     except Exception as err:
         print("Error when remove member")
         print(err)
@@ -163,7 +198,7 @@ async def update_group(group_id: int, detail: GroupUpdate, current_user: TokenDa
     # to dict
     detail = detail.dict(exclude_unset=True)
     try:
-        updated_group = GroupController.update(group_id, detail)
+        updated_group = await run_write(GroupController.update, group_id, detail)
     except Exception as err:
         print("Error when update group")
         print(err)
@@ -180,7 +215,7 @@ async def delete_group(group_id: int, current_user: TokenData = Depends(allow_ma
         Function: Delete a group
     """
     try:
-        GroupController.delete(group_id)
+        await run_write(GroupController.delete, group_id)
     except Exception as err:
         print("Error when delete group")
         print(err)
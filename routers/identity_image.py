@@ -1,13 +1,21 @@
 from datetime import datetime
 from config import AVATAR_LIMIT_KB
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Response, Request, Query
 from fastapi.responses import FileResponse
 from utils import error_messages
 from pydantics.IdentityImage import IdentityImage, IdentityImageNoUser
 from typing import Optional, List
 from controllers.IdentityImageController import IdentityImageController
+from controllers.JobController import JobController, IDENTITY_IMAGE_JOB
 from utils.auth_util import allow_manager, allow_student, allow_any_role
 from pydantics.Token import TokenData
+from utils.pagination import set_next_cursor
+from utils.db_executor import run_in_db, run_write
+from utils.storage import identity_storage, new_image_key
+from utils.image_processor import received_image
+from utils.thumbnails import image_response, discard_image
+from utils.embedding_store import identity_embeddings, update_identity_embedding
+from utils.job_queue import job_queue
 
 
 identity_image_router = APIRouter(prefix="/identity-images", tags=["identity-images"])
@@ -15,10 +23,13 @@ identity_image_router = APIRouter(prefix="/identity-images", tags=["identity-ima
 
 @identity_image_router.get("/", response_model=List[IdentityImage], status_code=status.HTTP_200_OK)
 async def get_identity_images(
+        response: Response,
         user_id: Optional[int] = None,
         from_date: Optional[datetime] = None,
         to_date: Optional[datetime] = None,
-        page: Optional[int] = None,
+        page: Optional[int] = Query(None, ge=1),
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
         current_user: TokenData = Depends(allow_manager)
 ):
     """
@@ -26,19 +37,28 @@ async def get_identity_images(
         Function: Get all identity image
     """
     try:
-        images = IdentityImageController.get_identity_images(
+        images = await run_in_db(
+            IdentityImageController.get_identity_images,
             user_id=user_id,
             from_date=from_date,
             to_date=to_date,
-            page=page)
+            page=page,
+            after=after,
+            limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get identity image:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, images)
     return images
 
 
 @identity_image_router.get("/of-user", response_model=List[IdentityImageNoUser], status_code=status.HTTP_200_OK)
 async def get_identity_images_of_user(
+        response: Response,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
         current_user: TokenData = Depends(allow_student)
 ):
     """
@@ -46,33 +66,48 @@ async def get_identity_images_of_user(
         Function: Get all identity image of current user
     """
     try:
-        images = IdentityImageController.get_identity_images(user_id=current_user.ID)
+        images = await run_in_db(
+            IdentityImageController.get_identity_images, user_id=current_user.ID, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get identity image of user:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, images)
     return images
 
 
 @identity_image_router.get("/{image_id}", response_class=FileResponse, status_code=status.HTTP_200_OK)
 async def get_identity_image(
+        request: Request,
         image_id: int,
+        size: Optional[str] = None,
         current_user: TokenData = Depends(allow_any_role)
 ):
     """
         Role:  Student + Manager.
-        Function: Render an image
+        Function: Render an image, or its thumbnail when size is given (small, medium)
     """
     user_id = current_user.ID if current_user.role == "student" else None
     try:
-        path = IdentityImageController.get_image_path(image_id=image_id, user_id=user_id)
+        image_key = await run_in_db(IdentityImageController.get_image_path, image_id=image_id, user_id=user_id)
+        # the job rewrites the image itself, thumbnails are normalized when rendered and never rewritten
+        pending = size is None and image_key is not None and await run_in_db(
+            JobController.is_pending, IDENTITY_IMAGE_JOB, {"image_id": image_id})
     except ValueError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     except Exception as err:
         print(">> Error when get path identity image of user:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
-    if path is None:
+    if image_key is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    return FileResponse(path)
+    try:
+        image = await image_response(identity_storage, image_key, size, request.headers, pending)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    if image is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return image
 
 
 @identity_image_router.post("/", response_model=IdentityImageNoUser, status_code=status.HTTP_201_CREATED)
@@ -84,21 +119,19 @@ async def add_identity_images(
         Role:  Student.
         Function: Add an identity image for current user
     """
-    data = await file.read()
-    # limit size
-    if len(data) / 1000 > AVATAR_LIMIT_KB:
-        raise HTTPException(status_code=422, detail="Vui lòng chọn ảnh < " + str(AVATAR_LIMIT_KB) + "KB")
-    # upload
+    image_key = new_image_key(f"student_{current_user.ID}")
+    # upload and limit size, a job normalizes it and stores its embedding
     try:
-        result = IdentityImageController.add_identity_image(user_id=current_user.ID, image_data=data)
+        async with received_image(identity_storage, image_key, file, AVATAR_LIMIT_KB):
+            result = await run_write(
+                IdentityImageController.add_identity_image, user_id=current_user.ID, image_key=image_key)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when add identity image")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
-    if not result:
-        raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    job_queue.notify()
     return result
 
 
@@ -113,13 +146,15 @@ async def remove_identity_images(
     """
     user_id = current_user.ID if current_user.role == "student" else None
     try:
-        IdentityImageController.remove_identity_image(image_id=image_id, user_id=user_id)
+        image_key = await run_write(IdentityImageController.remove_identity_image, image_id=image_id, user_id=user_id)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when remove identity image")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    identity_embeddings.remove(image_id)
+    await discard_image(identity_storage, image_key)
     return {"success": True}
 
 
@@ -133,11 +168,13 @@ async def approve_identity_images(
         Function: Approve an identity image
     """
     try:
-        IdentityImageController.approve_image(image_id=image_id)
+        image = await run_write(IdentityImageController.approve_image, image_id=image_id)
     except Exception as err:
         print(">> Error when approve identity image")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    if image is not None:
+        await update_identity_embedding(image.ID, image.user_id, image.path, True)
     return {"success": True}
 
 
@@ -151,11 +188,12 @@ async def reject_identity_images(
         Function: Reject an identity image
     """
     try:
-        IdentityImageController.reject_image(image_id=image_id)
+        await run_write(IdentityImageController.reject_image, image_id=image_id)
     except Exception as err:
         print(">> Error when reject identity image")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    identity_embeddings.set_approved(image_id, False)
     return {"success": True}
 
 
@@ -1,18 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Response, Query
 from utils import error_messages
 from pydantics.Location import LocationOut, LocationIn, LocationUpdate
 from typing import Optional, List
 from controllers.LocationController import LocationController
 from utils.auth_util import allow_manager
 from pydantics.Token import TokenData
+from utils.pagination import set_next_cursor
+from utils.db_executor import run_in_db, run_write
 
 location_router = APIRouter(prefix="/locations", tags=["locations"])
 
 
 @location_router.get("/", response_model=List[LocationOut], status_code=status.HTTP_200_OK)
 async def get_locations(
+        response: Response,
         keyword: Optional[str] = "",
-        page: Optional[int] = None,
+        page: Optional[int] = Query(None, ge=1),
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
         current_user: TokenData = Depends(allow_manager)
 ):
     """
@@ -20,12 +25,18 @@ async def get_locations(
         Function: Get all location
     """
     try:
-        locations = LocationController.search(
+        locations = await run_in_db(
+            LocationController.search,
             keyword=keyword,
-            page=page)
+            page=page,
+            after=after,
+            limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get location:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, locations)
     return locations
 
 
@@ -36,7 +47,7 @@ async def get_location(location_id: int, current_user: TokenData = Depends(allow
         Function: Get location detail
     """
     try:
-        location = LocationController.get_by_id(location_id)
+        location = await run_in_db(LocationController.get_by_id, location_id)
     except Exception as err:
         print(">> Error when get location")
         print(err)
@@ -53,7 +64,7 @@ async def create_location(detail: LocationIn, current_user: TokenData = Depends(
         Function: Create a location
     """
     try:
-        created_location = LocationController.create(detail.dict())
+        created_location = await run_write(LocationController.create, detail.dict())
     except Exception as err:
         print(">> Error when create location")
         print(err)
@@ -70,7 +81,7 @@ async def update_location(location_id: int, detail: LocationUpdate, current_user
     # to dict
     detail = detail.dict(exclude_unset=True)
     try:
-        updated_location = LocationController.update(location_id, detail)
+        updated_location = await run_write(LocationController.update, location_id, detail)
     except Exception as err:
         print("Error when update location")
         print(err)
@@ -87,7 +98,7 @@ async def delete_location(location_id: int, current_user: TokenData = Depends(al
         Function: Delete a location
     """
     try:
-        LocationController.delete(location_id)
+        await run_write(LocationController.delete, location_id)
     except Exception as err:
         print("Error when delete location")
         print(err)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, status, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, status, HTTPException, Depends, UploadFile, File, Response, Query
 from pydantics.Manager import ManagerIn, ManageOut, ManagerUpdate
 from typing import List, Optional
 from controllers.ManagerController import ManagerController
@@ -6,9 +6,13 @@ from utils import error_messages
 from utils.user_validator import validate_manager_before_update
 from pydantics.Password import Password, SinglePassword
 from pydantics.Image import ImageURLOut
-from utils.auth_util import allow_manager, allow_admin
+from utils.auth_util import change_account_password, allow_manager, allow_admin
 from pydantics.Token import TokenData
 from config import AVATAR_LIMIT_KB
+from utils.pagination import set_next_cursor
+from utils.db_executor import run_in_db, run_write
+from utils.storage import avatar_storage, new_image_key, stored_upload
+from utils.password_hasher import hash_password_async
 
 
 manager_router = APIRouter(prefix="/managers", tags=["managers"])
@@ -16,25 +20,34 @@ manager_router = APIRouter(prefix="/managers", tags=["managers"])
 
 @manager_router.get("/", response_model=List[ManageOut], status_code=status.HTTP_200_OK)
 async def read_managers(
+        response: Response,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
     current_user: TokenData = Depends(allow_admin),
     fullname: Optional[str] = "",
     phone: Optional[str] = "",
     username: Optional[str] = "",
-    page: Optional[int] = "",
+    page: Optional[int] = Query(None, ge=1),
 ):
     """
         Role:  Admin.
         Function: Get all managers
     """
     try:
-        users = ManagerController.search(
+        users = await run_in_db(
+            ManagerController.search,
             fullname=fullname,
             phone=phone,
             username=username,
-            page=page)
+            page=page,
+            after=after,
+            limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get managers:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, users)
     return users
 
 
@@ -45,7 +58,7 @@ async def read_profile(current_user: TokenData = Depends(allow_manager)):
         Function: Get profile of current user
     """
     try:
-        user = ManagerController.get_by_id(current_user.ID)
+        user = await run_in_db(ManagerController.get_by_id, current_user.ID)
     except Exception as err:
         print(">> Error when get profile")
         print(err)
@@ -62,7 +75,7 @@ async def read_manager(user_id: int, current_user: TokenData = Depends(allow_adm
         Function: Get detail of special manager
     """
     try:
-        user = ManagerController.get_by_id(user_id)
+        user = await run_in_db(ManagerController.get_by_id, user_id)
     except Exception as err:
         print(">> Error when get manager")
         print(err)
@@ -79,7 +92,9 @@ async def create_manager(user: ManagerIn, current_user: TokenData = Depends(allo
         Function: Create a manager
     """
     try:
-        created_user = ManagerController.create(user.dict())
+        detail = user.dict()
+        detail["password"] = await hash_password_async(detail["password"])
+        created_user = await run_write(ManagerController.create, detail)
     except Exception as err:
         print(">> Error when create manager")
         print(err)
@@ -97,7 +112,7 @@ async def update_profile(user_id: int, detail: ManagerUpdate, current_user: Toke
     # to dict
     origin_dict = detail.dict(exclude_unset=True)
     # validate in db
-    errors = validate_manager_before_update(user_id, origin_dict)
+    errors = await run_in_db(validate_manager_before_update, user_id, origin_dict)
     if errors:
         detail = []
         for loc, error in errors.items():
@@ -108,7 +123,7 @@ async def update_profile(user_id: int, detail: ManagerUpdate, current_user: Toke
             })
         raise HTTPException(status_code=422, detail=detail)
     try:
-        user = ManagerController.update(user_id, origin_dict)
+        user = await run_write(ManagerController.update, user_id, origin_dict)
     except Exception as err:
         print("Error when update user")
         print(err)
@@ -124,24 +139,39 @@ async def update_avatar(file: UploadFile = File(...), current_user: TokenData =
         Role:  Manager.
         Function: Update avatar of current user
     """
-    data = await file.read()
-    # limit size
-    if len(data) / 1000 > AVATAR_LIMIT_KB:
-        raise HTTPException(status_code=422, detail="Vui lòng chọn ảnh < " + AVATAR_LIMIT_KB + "KB")
-    # upload
+    image_key = new_image_key(f"manager_{current_user.ID}")
+    uploaded_url = avatar_storage.url(image_key)
+    # upload, limit size
     try:
-        uploaded_url = ManagerController.update_avatar(user_id=current_user.ID, image_data=data)
+        async with stored_upload(avatar_storage, image_key, file, AVATAR_LIMIT_KB):
+            old_avatar = await run_write(
+                ManagerController.update_avatar, user_id=current_user.ID, avatar_url=uploaded_url)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when update avatar manager")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
-    if not uploaded_url:
-        raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    await avatar_storage.discard(avatar_storage.key_from_url(old_avatar))
     return ImageURLOut(url=uploaded_url)
 
 
+@manager_router.put("/change-password", status_code=status.HTTP_200_OK)
+async def change_password(password: Password, current_user: TokenData = Depends(allow_manager)):
+    """
+        Role:  Manager.
+        Function: Change password of current user
+    """
+    user_id = current_user.ID
+    try:
+        await change_account_password(ManagerController, user_id, password.old_password, password.new_password)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    return {"success": True}
+
+
 @manager_router.put("/{user_id}", response_model=ManageOut, status_code=status.HTTP_200_OK)
 async def update_manager(user_id: int, detail: ManagerUpdate, current_user: TokenData = Depends(allow_admin)):
     """
@@ -151,7 +181,7 @@ async def update_manager(user_id: int, detail: ManagerUpdate, current_user: Toke
     # to dict
     origin_dict = detail.dict(exclude_unset=True)
     # validate in db
-    errors = validate_manager_before_update(user_id, origin_dict)
+    errors = await run_in_db(validate_manager_before_update, user_id, origin_dict)
     if errors:
         detail = []
         for loc, error in errors.items():
@@ -162,7 +192,7 @@ async def update_manager(user_id: int, detail: ManagerUpdate, current_user: Toke
             })
         raise HTTPException(status_code=422, detail=detail)
     try:
-        user = ManagerController.update(user_id, origin_dict)
+        user = await run_write(ManagerController.update, user_id, origin_dict)
     except Exception as err:
         print("Error when update user")
         print(err)
@@ -179,23 +209,8 @@ async def change_password(user_id: int, password: SinglePassword, current_user:
         Function: Change password of special manager
     """
     try:
-        ManagerController.force_change_password(user_id, password)
-    except ValueError as err:
-        raise HTTPException(status_code=422, detail=str(err))
-    except Exception as err:
-        raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
-    return {"success": True}
-
-
-@manager_router.put("/change-password", status_code=status.HTTP_200_OK)
-async def change_password(password: Password, current_user: TokenData = Depends(allow_manager)):
-    """
-        Role:  Manager.
-        Function: Change password of current user
-    """
-    user_id = current_user.ID
-    try:
-        ManagerController.change_password(user_id, password.old_password, password.new_password)
+        password_hash = await hash_password_async(password.new_password)
+        await run_write(ManagerController.force_change_password, user_id, password_hash)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, status, Depends
+from utils.auth_util import allow_admin, token_cache
+from utils.db_executor import db_executor, db_writer, run_in_db
+from utils import password_hasher, image_processor
+from utils.face_match import face_matcher
+from utils.job_queue import job_queue
+from controllers.JobController import JobController
+from utils.embedding_store import identity_embeddings, checkin_embeddings
+from utils.duplicate_faces import duplicate_detector
+from utils.revocation import revocation_list
+from utils.event_capacity import event_capacity
+from pydantics.Token import TokenData
+
+system_router = APIRouter(prefix="/system", tags=["system"])
+
+
+@system_router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_stats(current_user: TokenData = Depends(allow_admin)):
+    """
+        Role:  Admin.
+        Function: Get runtime statistics of the database, password hashing, image processing, face matching, jobs and token cache
+    """
+    return {
+        "db_executor": db_executor.stats(),
+        "db_writer": db_writer.stats(),
+        "password_hasher": password_hasher.stats(),
+        "image_processor": image_processor.stats(),
+        "face_match": face_matcher.stats(),
+        "identity_embeddings": identity_embeddings.stats(),
+        "checkin_embeddings": checkin_embeddings.stats(),
+        "duplicate_faces": duplicate_detector.stats(),
+        "job_queue": {**job_queue.stats(), "jobs": await run_in_db(JobController.count_by_status)},
+        "token_cache": token_cache.stats(),
+        "revocation_list": revocation_list.stats(),
+        "event_capacity": event_capacity.stats(),
+    }
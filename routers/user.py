@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Response, Query
 from typing import List, Optional
 
 from controllers.GroupController import GroupController
@@ -8,21 +8,30 @@ from pydantics.Password import Password
 from controllers.UserController import UserController
 from utils import error_messages
 from utils.user_validator import validate_user_before_update
-from utils.auth_util import allow_student, allow_manager, allow_admin
+from utils.auth_util import change_account_password, allow_student, allow_manager, allow_admin
 from pydantics.Token import TokenData
 from pydantics.Image import ImageURLOut
 from config import AVATAR_LIMIT_KB
+from utils.pagination import set_next_cursor
+from utils.db_executor import run_in_db, run_write
+from utils.storage import avatar_storage, new_image_key, stored_upload
+from utils.embedding_store import identity_embeddings, checkin_embeddings
+from utils.password_hasher import hash_password_async
+from utils.revocation import revocation_list
 
 user_router = APIRouter(prefix="/users", tags=["users"])
 
 
 @user_router.get("/", response_model=List[UserOut], status_code=status.HTTP_200_OK)
 async def get_users(
+        response: Response,
         fullname: Optional[str] = "",
         student_id: Optional[str] = "",
         phone: Optional[str] = "",
         username: Optional[str] = "",
-        page: Optional[int] = "",
+        page: Optional[int] = Query(None, ge=1),
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
         current_user: TokenData = Depends(allow_manager)
 ):
     """
@@ -30,15 +39,21 @@ async def get_users(
         Function: Get all students
     """
     try:
-        users = UserController.search(
+        users = await run_in_db(
+            UserController.search,
             fullname=fullname,
             student_id=student_id,
             phone=phone,
             username=username,
-            page=page)
+            page=page,
+            after=after,
+            limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get users:" + str(err))
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    set_next_cursor(response, users)
     return users
 
 
@@ -49,7 +64,7 @@ async def get_my_user(current_user: TokenData = Depends(allow_student)):
         Function: Get profile of current user
     """
     try:
-        user = UserController.get_by_id(current_user.ID)
+        user = await run_in_db(UserController.get_by_id, current_user.ID)
     except Exception as err:
         print(">> Error when get profile")
         print(err)
@@ -60,19 +75,27 @@ async def get_my_user(current_user: TokenData = Depends(allow_student)):
 
 
 @user_router.get("/joined-groups", response_model=List[GroupOfMember], status_code=status.HTTP_200_OK)
-async def get_group_of_user(current_user: TokenData = Depends(allow_student)):
+async def get_group_of_user(
+        response: Response,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        current_user: TokenData = Depends(allow_student)
+):
     """
         Role:  Student.
         Function: Get all group which joined
     """
     try:
-        group = GroupController.get_group_of_user(current_user.ID)
+        group = await run_in_db(GroupController.get_group_of_user, current_user.ID, after=after, limit=limit)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when get group")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
     if group is None:
         raise HTTPException(status_code=404, detail=error_messages.USER_NOT_FOUND)
+    set_next_cursor(response, group)
     return group
 
 
@@ -83,7 +106,7 @@ async def get_user(user_id: int, current_user: TokenData = Depends(allow_manager
         Function: Get profile of special user
     """
     try:
-        user = UserController.get_by_id(user_id)
+        user = await run_in_db(UserController.get_by_id, user_id)
     except Exception as err:
         print(">> Error when get user")
         print(err)
@@ -100,7 +123,9 @@ async def create_user(user: UserIn):
         Function: Create a student account
     """
     try:
-        created_user = UserController.create(user.dict())
+        detail = user.dict()
+        detail["password"] = await hash_password_async(detail["password"])
+        created_user = await run_write(UserController.create, detail)
     except Exception as err:
         print(">> Error when create user")
         print(err)
@@ -115,7 +140,7 @@ async def join_group(group_id: int, current_user: TokenData = Depends(allow_stud
         Function: Join a group
     """
     try:
-        UserController.join_group(current_user.ID, group_id)
+        await run_write(UserController.join_group, current_user.ID, group_id)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
@@ -131,7 +156,7 @@ async def join_group(group_id: int, current_user: TokenData = Depends(allow_stud
         Function: Leave a group for current user
     """
     try:
-        GroupController.remove_member(group_id, current_user.ID)
+        await run_write(GroupController.remove_member, group_id, current_user.ID)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
@@ -150,7 +175,7 @@ async def update_my_user(detail: UserUpdate, current_user: TokenData = Depends(a
     # to dict
     origin_dict = detail.dict(exclude_unset=True)
     # validate in db
-    errors = validate_user_before_update(user_id, origin_dict)
+    errors = await run_in_db(validate_user_before_update, user_id, origin_dict)
     if errors:
         detail = []
         for loc, error in errors.items():
@@ -161,13 +186,16 @@ async def update_my_user(detail: UserUpdate, current_user: TokenData = Depends(a
             })
         raise HTTPException(status_code=422, detail=detail)
     try:
-        user = UserController.update(user_id, origin_dict)
+        user = await run_write(UserController.update, user_id, origin_dict)
     except Exception as err:
         print("Error when update user")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
     if user is None:
         raise HTTPException(status_code=404, detail=error_messages.USER_NOT_FOUND)
+    if "block" in origin_dict:
+        # only once committed, so a failed write never blocks or unblocks anyone
+        revocation_list.set_blocked(user.ID, user.block)
     return user
 
 
@@ -178,7 +206,7 @@ async def change_my_password(password: Password, current_user: TokenData = Depen
         Function: Change password of current account
     """
     try:
-        UserController.change_password(current_user.ID, password.old_password, password.new_password)
+        await change_account_password(UserController, current_user.ID, password.old_password, password.new_password)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
@@ -192,21 +220,19 @@ async def update_avatar(file: UploadFile = File(...), current_user: TokenData =
         Role:  Student.
         Function: Update avatar of current user
     """
-    data = await file.read()
-    # limit size
-    if len(data) / 1000 > AVATAR_LIMIT_KB:
-        raise HTTPException(status_code=422, detail="Vui lòng chọn ảnh < " + str(AVATAR_LIMIT_KB) + "KB")
-    # upload
+    image_key = new_image_key(f"student_{current_user.ID}")
+    uploaded_url = avatar_storage.url(image_key)
+    # upload, limit size
     try:
-        uploaded_url = UserController.update_avatar(user_id=current_user.ID, image_data=data)
+        async with stored_upload(avatar_storage, image_key, file, AVATAR_LIMIT_KB):
+            old_avatar = await run_write(UserController.update_avatar, user_id=current_user.ID, avatar_url=uploaded_url)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
         print(">> Error when update avatar user")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
-    if not uploaded_url:
-        raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    await avatar_storage.discard(avatar_storage.key_from_url(old_avatar))
     return ImageURLOut(url=uploaded_url)
 
 
@@ -219,7 +245,7 @@ async def update_user(user_id: int, detail: UserUpdate, current_user: TokenData
     # to dict
     origin_dict = detail.dict(exclude_unset=True)
     # validate in db
-    errors = validate_user_before_update(user_id, origin_dict)
+    errors = await run_in_db(validate_user_before_update, user_id, origin_dict)
     if errors:
         detail = []
         for loc, error in errors.items():
@@ -230,13 +256,16 @@ async def update_user(user_id: int, detail: UserUpdate, current_user: TokenData
             })
         raise HTTPException(status_code=422, detail=detail)
     try:
-        user = UserController.update(user_id, origin_dict)
+        user = await run_write(UserController.update, user_id, origin_dict)
     except Exception as err:
         print("Error when update user")
         print(err)
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
     if user is None:
         raise HTTPException(status_code=404, detail=error_messages.USER_NOT_FOUND)
+    if "block" in origin_dict:
+        # only once committed, so a failed write never blocks or unblocks anyone
+        revocation_list.set_blocked(user.ID, user.block)
     return user
 
 
@@ -247,7 +276,7 @@ async def change_password(user_id: int, password: Password, current_user: TokenD
         Function: Change password of special user
     """
     try:
-        UserController.change_password(user_id, password.old_password, password.new_password)
+        await change_account_password(UserController, user_id, password.old_password, password.new_password)
     except ValueError as err:
         raise HTTPException(status_code=422, detail=str(err))
     except Exception as err:
@@ -262,9 +291,13 @@ async def delete_user(user_id: int, current_user: TokenData = Depends(allow_admi
         Function: Delete a user
     """
     try:
-        UserController.delete(user_id)
+        avatar = await run_write(UserController.delete, user_id)
     except Exception as err:
         raise HTTPException(status_code=500, detail=error_messages.DATABASE_ERROR)
+    revocation_list.set_blocked(user_id, False)
+    await avatar_storage.discard(avatar_storage.key_from_url(avatar))
+    identity_embeddings.remove_user(user_id)
+    checkin_embeddings.remove_user(user_id)
     return {"success": True}
 
 
@@ -0,0 +1,25 @@
+# Settings for the test suite, every file the app writes goes under TEST_DIR
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="checkin-tests-")
+
+SECRET_KEY = "test-secret-key-" + "x" * 32
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60
+USER_IN_PAGE = 10
+LIMIT_CHECKIN = 3
+CHECKIN_IMAGE_DIR = os.path.join(TEST_DIR, "checkin")
+IDENTITY_IMAGE_DIR = os.path.join(TEST_DIR, "identity")
+AVATAR_DIR = os.path.join(TEST_DIR, "static", "avatar")
+AVATAR_BASE_URL = "/static/avatar"
+AVATAR_LIMIT_KB = 2000
+SPECIAL_CHAR = "!@#$%^&*()"
+UPLOAD_TEMP_DIR = TEST_DIR
+EMBEDDING_STORE_DIR = os.path.join(TEST_DIR, "embeddings")
+
+# no process pools or background loops in tests
+PASSWORD_HASH_WORKERS = 0
+IMAGE_PROCESS_WORKERS = 0
+FACE_MATCH_WORKERS = 0
+FACE_MATCH_ENABLED = False
@@ -0,0 +1,88 @@
+import os
+import sys
+from contextlib import contextmanager
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# tests/config.py stands in for the config.py of a deployment
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, TESTS_DIR)
+
+import config  # noqa: E402
+
+# database.db and the static directory the app serves are relative to the working directory
+os.chdir(config.TEST_DIR)
+os.makedirs(config.AVATAR_DIR, exist_ok=True)
+
+import pytest  # noqa: E402
+from database_connection import db  # noqa: E402
+from utils.db_executor import db_executor, db_writer  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    """An empty database with every table, index and trigger of the app"""
+    import database_script
+    # threads of the executors keep connections to the previous file
+    db_writer.shutdown()
+    db_executor.shutdown()
+    db.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists("database.db" + suffix):
+            os.remove("database.db" + suffix)
+    db.connect()
+    # nothing to recover after a test, skip the fsync of every commit
+    db.execute_sql("PRAGMA synchronous = OFF")
+    database_script.init_table(db)
+    yield db
+    db_writer.shutdown()
+    db_executor.shutdown()
+    db.close()
+
+
+class QueryCounter:
+    def __init__(self):
+        # (sql, params) of every statement
+        self.statements = []
+
+    @property
+    def sql(self) -> list:
+        return [sql for sql, _ in self.statements]
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(database=db):
+    """Record every statement sent to the database inside the block"""
+    counter = QueryCounter()
+    execute_sql = database.execute_sql
+
+    def counting(sql, params=None, *args, **kwargs):
+        counter.statements.append((sql, params))
+        return execute_sql(sql, params, *args, **kwargs)
+
+    database.execute_sql = counting
+    try:
+        yield counter
+    finally:
+        del database.execute_sql
+
+
+def call_app(method: str, url: str, account=None, **kwargs):
+    """Send one request to the app in process, authenticated as account (a User or Manager) if given"""
+    import asyncio
+    import httpx
+    import app
+    from utils.auth_util import create_access_token
+
+    headers = kwargs.pop("headers", {})
+    if account is not None:
+        headers["Authorization"] = "Bearer " + create_access_token(account)
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as client:
+            return await client.request(method, url, headers=headers, **kwargs)
+
+    return asyncio.run(send())
@@ -0,0 +1,42 @@
+-- Tables and indexes of a database created by the app as of the embedding store (user-022),
+-- before check-ins had suspect, geofence columns and before the job table existed.
+CREATE TABLE "checkinimage" ("ID" INTEGER NOT NULL PRIMARY KEY, "path" VARCHAR(255) NOT NULL, "uploaded_at" DATETIME NOT NULL, "accept" INTEGER, "accepted_at" DATETIME, "score" REAL CHECK (score IS NULL OR (score >= 0 AND score <= 1)), "user_id" INTEGER NOT NULL, "event_id" INTEGER NOT NULL, FOREIGN KEY ("user_id") REFERENCES "user" ("ID") ON DELETE CASCADE, FOREIGN KEY ("event_id") REFERENCES "event" ("ID") ON DELETE CASCADE);
+CREATE TABLE "event" ("ID" INTEGER NOT NULL PRIMARY KEY, "title" VARCHAR(255) NOT NULL, "title_normalized" VARCHAR(255), "place" TEXT NOT NULL, "place_normalized" TEXT, "maximum_participant" INTEGER UNSIGNED, "location_id" INTEGER, "created_at" DATETIME NOT NULL, "updated_at" DATETIME, "start_at" DATETIME NOT NULL, "stop_at" DATETIME NOT NULL, "start_register_at" DATETIME NOT NULL, "stop_register_at" DATETIME, "soon_checkin_time" INTEGER UNSIGNED, "late_checkin_time" INTEGER UNSIGNED, "soon_checkout_time" INTEGER UNSIGNED, "late_checkout_time" INTEGER UNSIGNED, FOREIGN KEY ("location_id") REFERENCES "location" ("ID") ON DELETE SET NULL);
+CREATE TABLE "eventdetail" ("event_id" INTEGER NOT NULL PRIMARY KEY, "description" TEXT, "created_by_id" INTEGER, "leader_id" INTEGER, FOREIGN KEY ("event_id") REFERENCES "event" ("ID") ON DELETE SET NULL, FOREIGN KEY ("created_by_id") REFERENCES "manager" ("ID") ON DELETE SET NULL, FOREIGN KEY ("leader_id") REFERENCES "manager" ("ID") ON DELETE SET NULL);
+CREATE TABLE "group" ("ID" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(255) NOT NULL, "name_normalized" VARCHAR(255), "description" TEXT, "code" VARCHAR(255), "require_approve" INTEGER NOT NULL);
+CREATE TABLE "identityimages" ("ID" INTEGER NOT NULL PRIMARY KEY, "path" VARCHAR(255) NOT NULL, "uploaded_at" DATETIME NOT NULL, "approve" INTEGER NOT NULL, "user_id" INTEGER NOT NULL, FOREIGN KEY ("user_id") REFERENCES "user" ("ID") ON DELETE CASCADE);
+CREATE TABLE "joingroup" ("group_id" INTEGER NOT NULL, "user_id" INTEGER NOT NULL, "joined_at" DATETIME NOT NULL, "approved_at" DATETIME, "approve" INTEGER, "added_by_id" INTEGER, PRIMARY KEY ("group_id", "user_id"), FOREIGN KEY ("group_id") REFERENCES "group" ("ID") ON DELETE CASCADE, FOREIGN KEY ("user_id") REFERENCES "user" ("ID") ON DELETE CASCADE, FOREIGN KEY ("added_by_id") REFERENCES "manager" ("ID") ON DELETE SET NULL);
+CREATE TABLE "limitgroup" ("group_id" INTEGER NOT NULL, "event_id" INTEGER NOT NULL, PRIMARY KEY ("group_id", "event_id"), FOREIGN KEY ("group_id") REFERENCES "group" ("ID") ON DELETE CASCADE, FOREIGN KEY ("event_id") REFERENCES "event" ("ID") ON DELETE CASCADE);
+CREATE TABLE "location" ("ID" INTEGER NOT NULL PRIMARY KEY, "name" TEXT NOT NULL, "longitude" REAL NOT NULL, "latitude" REAL NOT NULL, "radius" REAL NOT NULL);
+CREATE TABLE "manager" ("ID" INTEGER NOT NULL PRIMARY KEY, "fullname" VARCHAR(255) NOT NULL, "fullname_normalized" VARCHAR(255), "email" VARCHAR(255), "phone" VARCHAR(15), "is_admin" INTEGER NOT NULL, "avatar_image" VARCHAR(255), "created_at" DATETIME NOT NULL, "updated_at" DATETIME, "username" VARCHAR(255) NOT NULL, "password" VARCHAR(255) NOT NULL);
+CREATE TABLE "registerevent" ("user_id" INTEGER NOT NULL, "event_id" INTEGER NOT NULL, "added_by_id" INTEGER, "block" INTEGER NOT NULL, "note" TEXT, "feedback" TEXT, "created_at" DATETIME NOT NULL, "checkin_at" DATETIME, "checkout_at" DATETIME, PRIMARY KEY ("user_id", "event_id"), FOREIGN KEY ("user_id") REFERENCES "user" ("ID") ON DELETE CASCADE, FOREIGN KEY ("event_id") REFERENCES "event" ("ID") ON DELETE CASCADE, FOREIGN KEY ("added_by_id") REFERENCES "manager" ("ID") ON DELETE SET NULL);
+CREATE TABLE "revokedtoken" ("digest" VARCHAR(64) NOT NULL PRIMARY KEY, "revoked_at" DATETIME NOT NULL, "expired_at" DATETIME NOT NULL);
+CREATE TABLE "user" ("ID" INTEGER NOT NULL PRIMARY KEY, "fullname" VARCHAR(255) NOT NULL, "fullname_normalized" VARCHAR(255), "date_of_birth" DATE NOT NULL, "student_id" VARCHAR(9) NOT NULL, "email" VARCHAR(255), "phone" VARCHAR(15) NOT NULL, "phone_verify" INTEGER NOT NULL, "email_verify" INTEGER NOT NULL, "avatar_image" VARCHAR(255), "block" INTEGER NOT NULL, "note" TEXT, "created_at" DATETIME NOT NULL, "updated_at" DATETIME, "username" VARCHAR(255) NOT NULL, "password" VARCHAR(255) NOT NULL);
+CREATE INDEX "checkinimage_event_id" ON "checkinimage" ("event_id");
+CREATE INDEX "checkinimage_event_id_user_id_accept" ON "checkinimage" ("event_id", "user_id", "accept");
+CREATE INDEX "checkinimage_user_id" ON "checkinimage" ("user_id");
+CREATE INDEX "event_location_id" ON "event" ("location_id");
+CREATE INDEX "eventdetail_created_by_id" ON "eventdetail" ("created_by_id");
+CREATE INDEX "eventdetail_leader_id" ON "eventdetail" ("leader_id");
+CREATE INDEX "group_code" ON "group" ("code");
+CREATE INDEX "identityimages_user_id" ON "identityimages" ("user_id");
+CREATE INDEX "identityimages_user_id_uploaded_at" ON "identityimages" ("user_id", "uploaded_at");
+CREATE INDEX "joingroup_added_by_id" ON "joingroup" ("added_by_id");
+CREATE INDEX "joingroup_group_id" ON "joingroup" ("group_id");
+CREATE INDEX "joingroup_user_id" ON "joingroup" ("user_id");
+CREATE INDEX "limitgroup_event_id" ON "limitgroup" ("event_id");
+CREATE INDEX "limitgroup_group_id" ON "limitgroup" ("group_id");
+CREATE UNIQUE INDEX "manager_username" ON "manager" ("username");
+CREATE INDEX "registerevent_added_by_id" ON "registerevent" ("added_by_id");
+CREATE INDEX "registerevent_event_id" ON "registerevent" ("event_id");
+CREATE INDEX "registerevent_event_id_block" ON "registerevent" ("event_id", "block");
+CREATE INDEX "registerevent_user_id" ON "registerevent" ("user_id");
+CREATE INDEX "revokedtoken_expired_at" ON "revokedtoken" ("expired_at");
+CREATE UNIQUE INDEX "user_phone" ON "user" ("phone");
+CREATE UNIQUE INDEX "user_student_id" ON "user" ("student_id");
+CREATE UNIQUE INDEX "user_username" ON "user" ("username");
+INSERT INTO "user" VALUES (1, 'Nguyễn Văn A', 'nguyen van a', '2001-01-01', '102190001', NULL, '0123456789', 0, 0, NULL, 0, NULL, '2021-09-01 08:00:00', NULL, '102190001', 'not-a-real-hash');
+INSERT INTO "location" VALUES (1, 'Toa nha khu H', 108.15, 16.07, 50);
+INSERT INTO "event" VALUES (1, 'Khai giảng khóa 2021-2022', 'khai giang khoa 2021-2022', 'Tòa nhà H', 'toa nha h', NULL, 1, '2021-09-01 08:00:00', NULL, '2021-09-05 08:00:00', '2021-09-05 10:00:00', '2021-09-01 08:00:00', NULL, NULL, NULL, NULL, NULL);
+INSERT INTO "registerevent" VALUES (1, 1, NULL, 0, NULL, NULL, '2021-09-02 08:00:00', NULL, NULL);
+INSERT INTO "checkinimage" VALUES (1, 'ab/cd/student_1.event_1.jpg', '2021-09-05 08:01:00', NULL, NULL, 0.5, 1, 1);
@@ -0,0 +1,84 @@
+import threading
+from datetime import datetime
+import pytest
+from conftest import call_app
+from models.Manager import Manager
+from models.User import User
+from utils import password_hasher
+from utils.db_executor import db_writer
+
+
+@pytest.fixture
+def bcrypt_threads(monkeypatch):
+    """Names of the threads bcrypt ran on"""
+    names = []
+    hash_password, verify_password = password_hasher.hash_password, password_hasher.verify_password
+
+    def hashing(*args):
+        names.append(threading.current_thread().name)
+        return hash_password(*args)
+
+    def verifying(*args):
+        names.append(threading.current_thread().name)
+        return verify_password(*args)
+
+    monkeypatch.setattr(password_hasher, "hash_password", hashing)
+    monkeypatch.setattr(password_hasher, "verify_password", verifying)
+    return names
+
+
+@pytest.fixture
+def student(database):
+    return User.create(fullname="A", date_of_birth=datetime(2001, 1, 1), student_id="102190001", phone="0123456789",
+                       username="102190001", password=password_hasher.hash_password("old-password"))
+
+
+@pytest.fixture
+def manager(database):
+    return Manager.create(fullname="M", is_admin=False, username="manager",
+                          password=password_hasher.hash_password("old-password"))
+
+
+def test_student_changes_password_on_the_hashing_pool(student, bcrypt_threads):
+    hashes = password_hasher.hash_time.count
+    verifies = password_hasher.verify_time.count
+    writes = db_writer.stats()["writes"]
+    response = call_app("PUT", "/users/change-password", student,
+                        json={"old_password": "old-password", "new_password": "new-password"})
+    assert response.status_code == 200
+    # one verify and one hash, both off the database threads and counted in the stats
+    assert [name.split("_")[0] for name in bcrypt_threads] == ["password-hasher", "password-hasher"]
+    assert password_hasher.hash_time.count == hashes + 1
+    assert password_hasher.verify_time.count == verifies + 1
+    assert db_writer.stats()["writes"] == writes + 1
+    assert password_hasher.verify_password("new-password", User.get_by_id(student.ID).password)
+
+
+def test_wrong_old_password_is_refused(student, bcrypt_threads):
+    old_hash = student.password
+    response = call_app("PUT", "/users/change-password", student,
+                        json={"old_password": "wrong-password", "new_password": "new-password"})
+    assert response.status_code == 422
+    assert User.get_by_id(student.ID).password == old_hash
+    assert [name.split("_")[0] for name in bcrypt_threads] == ["password-hasher"]
+
+
+def test_manager_changes_student_password(student, manager):
+    response = call_app("PUT", f"/users/{student.ID}/change-password", manager,
+                        json={"old_password": "old-password", "new_password": "new-password"})
+    assert response.status_code == 200
+    assert password_hasher.verify_password("new-password", User.get_by_id(student.ID).password)
+
+
+def test_manager_changes_own_password(manager, bcrypt_threads):
+    response = call_app("PUT", "/managers/change-password", manager,
+                        json={"old_password": "old-password", "new_password": "new-password"})
+    assert response.status_code == 200
+    assert [name.split("_")[0] for name in bcrypt_threads] == ["password-hasher", "password-hasher"]
+    assert password_hasher.verify_password("new-password", Manager.get_by_id(manager.ID).password)
+
+
+def test_unknown_account_is_refused(student, manager):
+    response = call_app("PUT", "/users/9999/change-password", manager,
+                        json={"old_password": "old-password", "new_password": "new-password"})
+    assert response.status_code == 422
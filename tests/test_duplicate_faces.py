@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime
+import numpy as np
+import pytest
+import routers.checkin
+from conftest import call_app
+from models.Event import CheckinImage, Event
+from models.Manager import Manager
+from models.User import User
+from utils import duplicate_faces
+from utils.embedding_store import EmbeddingStore
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    identity = EmbeddingStore(str(tmp_path / "identity"), dim=4)
+    checkins = EmbeddingStore(str(tmp_path / "checkins"), dim=4)
+    monkeypatch.setattr(duplicate_faces, "identity_embeddings", identity)
+    monkeypatch.setattr(duplicate_faces, "checkin_embeddings", checkins)
+    # user 1 and user 2 have clearly different faces
+    identity.put(10, 1, np.array([1, 0, 0, 0], dtype=np.float32), True)
+    identity.put(20, 2, np.array([0, 1, 0, 0], dtype=np.float32), True)
+    yield identity, checkins
+    identity.close()
+    checkins.close()
+
+
+def find(detector, probe, owner, checkin_id):
+    asyncio.run(detector.refresh())
+    return detector.find_suspects(np.array([probe], dtype=np.float32), np.array([owner]), np.array([checkin_id]))
+
+
+def test_flagging_is_off_by_default(stores, monkeypatch):
+    assert not duplicate_faces.FACE_DUPLICATE_ENABLED
+    monkeypatch.setattr(duplicate_faces, "FACE_DUPLICATE_MIN_SCORE", 0.9)
+    detector = duplicate_faces.DuplicateFaceDetector()
+    # user 1 checking in with the face of user 2
+    assert find(detector, [0, 1, 0, 0], 1, 100) == {}
+    assert detector.stats()["enabled"] is False
+    assert detector.stats()["size"] == 0
+
+
+def test_flags_the_face_of_another_user_when_enabled(stores, monkeypatch):
+    monkeypatch.setattr(duplicate_faces, "FACE_DUPLICATE_ENABLED", True)
+    monkeypatch.setattr(duplicate_faces, "FACE_DUPLICATE_MIN_SCORE", 0.9)
+    detector = duplicate_faces.DuplicateFaceDetector()
+    assert find(detector, [0, 1, 0, 0], 1, 100) == {100: (2, 1.0)}
+    assert find(detector, [1, 0, 0, 0], 1, 101) == {}
+
+
+def test_suspicious_endpoint_is_off_with_the_detector(database, monkeypatch):
+    manager = Manager.create(fullname="M", is_admin=False, username="manager", password="x")
+    owner, other = [
+        User.create(fullname="Student", date_of_birth=datetime(2001, 1, 1), student_id=f"10219000{index}",
+                    phone=f"012345670{index}", username=f"10219000{index}", password="x")
+        for index in range(2)
+    ]
+    event = Event.create(title="Event", place="H", start_at=datetime.now(), stop_at=datetime.now())
+    checkin = CheckinImage.create(path="c.jpg", user=owner, event=event, suspect_user=other, suspect_score=0.95)
+
+    response = call_app("GET", f"/checkin/of-event/{event.ID}/suspicious", manager)
+    assert response.status_code == 404
+
+    monkeypatch.setattr(routers.checkin, "FACE_DUPLICATE_ENABLED", True)
+    response = call_app("GET", f"/checkin/of-event/{event.ID}/suspicious", manager)
+    assert response.status_code == 200
+    assert [(row["ID"], row["suspect_user"]["ID"]) for row in response.json()] == [(checkin.ID, other.ID)]
@@ -0,0 +1,37 @@
+from datetime import datetime
+from models.Event import Event
+from utils.event_capacity import EventCapacity
+
+
+def test_release_from_before_a_reload_is_ignored(database):
+    now = datetime.now()
+    event = Event.create(title="Event", place="H", start_at=now, stop_at=now, maximum_participant=2)
+    # every entry has expired, each load reads the counters again
+    capacity = EventCapacity(ttl=0)
+    capacity.load(event.ID)
+    stale = capacity.reserve(event.ID)
+    capacity.load(event.ID)
+    first = capacity.reserve(event.ID)
+    assert stale is not None and first is not None and first != stale
+
+    # the registration reserved before the reload fails: the new entry never counted its seat
+    capacity.release(event.ID, stale)
+    second = capacity.reserve(event.ID)
+    assert second == first
+    assert capacity.reserve(event.ID) is None
+
+    capacity.release(event.ID, first)
+    assert capacity.reserve(event.ID) == first
+    # an unregistration frees a seat whatever the generation
+    capacity.release(event.ID)
+    assert capacity.reserve(event.ID) == first
+
+
+def test_uncapped_event_is_not_counted(database):
+    now = datetime.now()
+    event = Event.create(title="Event", place="H", start_at=now, stop_at=now)
+    capacity = EventCapacity()
+    capacity.load(event.ID)
+    assert capacity.reserve(event.ID) == 0
+    capacity.release(event.ID, 0)
+    assert capacity.reserve(event.ID) == 0
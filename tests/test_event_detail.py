@@ -0,0 +1,53 @@
+from datetime import datetime
+from conftest import count_queries
+from controllers.EventController import EventController
+from models.Event import Event, EventDetail, LimitGroup
+from models.Group import Group
+from models.Location import Location
+from models.Manager import Manager
+from pydantics.Event import EventOutDetail
+
+
+def load_detail(event_id: int) -> tuple:
+    """(statements, response) of GET /events/{event_id}"""
+    with count_queries() as queries:
+        event = EventController.get_detail(event_id)
+        detail = EventOutDetail.from_orm_load(event)
+    return queries.count, detail
+
+
+def test_event_with_detail_location_and_limit_groups(database):
+    now = datetime.now()
+    creator = Manager.create(fullname="Creator", is_admin=False, username="creator", password="x")
+    leader = Manager.create(fullname="Leader", is_admin=False, username="leader", password="x")
+    location = Location.create(name="H", longitude=108.15, latitude=16.07, radius=50)
+    event = Event.create(title="Event", place="H", location=location, start_at=now, stop_at=now)
+    EventDetail.create(event=event, description="Mô tả", created_by=creator, leader=leader)
+    groups = [Group.create(name=f"Group {index}", require_approve=False) for index in range(3)]
+    for group in groups:
+        LimitGroup.create(group=group, event=event)
+
+    count, detail = load_detail(event.ID)
+
+    # the event with everything joined, then its limit groups
+    assert count == 2
+    assert detail.location.ID == location.ID
+    assert detail.event_detail.description == "Mô tả"
+    assert detail.event_detail.created_by.ID == creator.ID
+    assert detail.event_detail.leader.ID == leader.ID
+    assert sorted(group.ID for group in detail.limit_group) == [group.ID for group in groups]
+    assert detail.counters.registered == detail.num_participant == 0
+
+
+def test_event_without_detail_or_location(database):
+    now = datetime.now()
+    event = Event.create(title="Event", place="H", start_at=now, stop_at=now)
+
+    count, detail = load_detail(event.ID)
+
+    assert count == 2
+    assert detail.location is None
+    assert detail.event_detail.description is None
+    assert detail.event_detail.created_by is None
+    assert detail.event_detail.leader is None
+    assert detail.limit_group == []
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+import numpy as np
+from PIL import Image
+import pydantics.Checkin
+from controllers.CheckinController import CheckinController
+from models.Event import CheckinImage, Event
+from models.User import User
+from pydantics.Checkin import CheckinNoUserNoEvent
+from utils import embedding_store, face_embedding, face_match
+
+
+def make_checkins(count: int) -> list:
+    user = User.create(fullname="A", date_of_birth=datetime(2001, 1, 1), student_id="102190001",
+                       phone="0123456789", username="102190001", password="x")
+    event = Event.create(title="E", place="P", start_at=datetime.now(), stop_at=datetime.now())
+    return [CheckinImage.create(path=f"c{index}.jpg", user=user, event=event).ID for index in range(count)]
+
+
+def test_scores_are_not_decisions_by_default(database):
+    assert face_match.FACE_MATCH_ACCEPT_SCORE is None
+    assert face_match.FACE_MATCH_REJECT_SCORE is None
+    high, low = make_checkins(2)
+    result = CheckinController.apply_scores(
+        {high: 0.99, low: 0.01}, face_match.FACE_MATCH_ACCEPT_SCORE, face_match.FACE_MATCH_REJECT_SCORE)
+    assert result == {"approved": 0, "rejected": 0, "scored": 2}
+    assert [(checkin.accept, checkin.score) for checkin in CheckinImage.select().order_by(CheckinImage.ID)] \
+        == [(None, 0.99), (None, 0.01)]
+
+
+def test_configured_thresholds_decide(database):
+    high, middle, low, suspect = make_checkins(4)
+    result = CheckinController.apply_scores(
+        {high: 0.95, middle: 0.6, low: 0.1, suspect: 0.97}, 0.9, 0.4, {suspect: (CheckinImage.get_by_id(suspect).user_id, 0.9)})
+    assert result == {"approved": 1, "rejected": 1, "scored": 2}
+    decisions = {checkin.ID: checkin.accept for checkin in CheckinImage.select()}
+    assert decisions == {high: True, middle: None, low: False, suspect: None}
+
+
+class FakeModel:
+    """Stands for the onnxruntime session: the mean of every colour channel"""
+
+    class Input:
+        name = "input"
+
+    def __init__(self):
+        self.inputs = []
+
+    def get_inputs(self):
+        return [self.Input()]
+
+    def run(self, outputs, feed):
+        self.inputs.append(feed["input"])
+        return [feed["input"].mean(axis=(2, 3))]
+
+
+def test_photos_are_embedded_by_the_model(tmp_path, monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(face_embedding, "_session", model)
+    path = str(tmp_path / "face.jpg")
+    Image.new("RGB", (300, 400), (255, 0, 0)).save(path)
+    vector = face_embedding.embed_image(path)
+    side = face_embedding.EMBEDDING_SIDE
+    assert model.inputs[0].shape == (1, 3, side, side)
+    assert np.allclose(vector, [1, -1, -1] / np.sqrt(3), atol=0.02)
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    assert face_embedding.embed_image(str(tmp_path / "broken.jpg")) is None
+    assert len(model.inputs) == 1
+
+
+def test_nothing_is_embedded_without_a_model(database, monkeypatch):
+    assert face_embedding.FACE_EMBEDDING_MODEL is None
+    assert not face_match.FACE_MATCH_ENABLED
+    face_match.face_matcher.start()
+    assert face_match.face_matcher._task is None
+    embedded = []
+
+    async def embed_stored(items):
+        embedded.extend(items)
+        return np.zeros((len(items), face_embedding.EMBEDDING_DIM), dtype=np.float32), np.zeros(len(items), dtype=bool)
+
+    monkeypatch.setattr(embedding_store, "embed_stored", embed_stored)
+    asyncio.run(embedding_store.update_identity_embedding(1, 1, "identity.jpg", True, recompute=True))
+    assert embedded == []
+
+
+def test_scores_are_hidden_without_a_model(database, monkeypatch):
+    checkin_id, = make_checkins(1)
+    CheckinImage.update(score=0.7).where(CheckinImage.ID == checkin_id).execute()
+    checkin = CheckinImage.get_by_id(checkin_id)
+    assert CheckinNoUserNoEvent.from_orm(checkin).score is None
+    monkeypatch.setattr(pydantics.Checkin, "FACE_EMBEDDING_ENABLED", True)
+    assert CheckinNoUserNoEvent.from_orm(checkin).score == 0.7
+
+
+def test_scores_of_another_model_are_reset(database):
+    pending, decided = make_checkins(2)
+    CheckinController.apply_scores({pending: 0.5, decided: 0.95}, 0.9, None, {pending: (CheckinImage.get_by_id(pending).user_id, 0.8)})
+    assert CheckinController.reset_scores() == 2
+    assert [(checkin.accept, checkin.score, checkin.suspect_user_id, checkin.suspect_score)
+            for checkin in CheckinImage.select().order_by(CheckinImage.ID)] == [(None, None, None, None), (True, None, None, None)]
+    assert CheckinController.get_unscored(10) == []
@@ -0,0 +1,38 @@
+import pytest
+from utils import geofence
+from utils.geofence import check_fence
+
+# 50 m around a point, a device about 111 m north of it is outside
+FENCE = (16.07, 108.15, 50)
+OUTSIDE = (16.071, 108.15)
+
+
+@pytest.mark.parametrize("mode", ["reject", "flag"])
+def test_missing_coordinates_are_flagged_when_the_event_has_a_location(monkeypatch, mode):
+    monkeypatch.setattr(geofence, "GEOFENCE_MODE", mode)
+    assert check_fence(FENCE, None, None) == (None, True)
+    assert check_fence(None, None, None) == (None, False)
+    assert check_fence((None, None, None), None, None) == (None, False)
+
+
+def test_missing_coordinates_can_be_refused(monkeypatch):
+    monkeypatch.setattr(geofence, "GEOFENCE_REQUIRE_COORDINATES", True)
+    with pytest.raises(ValueError):
+        check_fence(FENCE, None, None)
+
+
+def test_position_outside_the_fence(monkeypatch):
+    monkeypatch.setattr(geofence, "GEOFENCE_MODE", "reject")
+    with pytest.raises(ValueError):
+        check_fence(FENCE, *OUTSIDE)
+    monkeypatch.setattr(geofence, "GEOFENCE_MODE", "flag")
+    distance, outside = check_fence(FENCE, *OUTSIDE)
+    assert outside and 100 < distance < 120
+    distance, outside = check_fence(FENCE, 16.07, 108.15)
+    assert not outside and distance == 0
+
+
+def test_off_skips_the_check(monkeypatch):
+    monkeypatch.setattr(geofence, "GEOFENCE_MODE", "off")
+    assert check_fence(FENCE, None, None) == (None, False)
+    assert check_fence(FENCE, *OUTSIDE) == (None, False)
@@ -0,0 +1,48 @@
+import os
+from datetime import datetime
+import pytest
+from PIL import Image
+from conftest import call_app, count_queries
+from controllers.IdentityImageController import IdentityImageController
+from controllers.JobController import JobController, CHECKIN_IMAGE_JOB
+from models.Event import CheckinImage, Event
+from models.Manager import Manager
+from models.User import User, IdentityImages
+from utils.storage import checkin_storage
+
+
+def test_image_is_not_cached_until_normalized(database):
+    now = datetime.now()
+    manager = Manager.create(fullname="M", is_admin=False, username="manager", password="x")
+    user = User.create(fullname="Student", date_of_birth=datetime(2001, 1, 1), student_id="102190001",
+                       phone="0123456701", username="102190001", password="x")
+    event = Event.create(title="Event", place="H", start_at=now, stop_at=now)
+    path = checkin_storage.local_path("cache.jpg")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", (64, 48)).save(path)
+    checkin = CheckinImage.create(path="cache.jpg", user=user, event=event)
+    job = JobController.enqueue(CHECKIN_IMAGE_JOB, {"checkin_id": checkin.ID})
+
+    response = call_app("GET", f"/checkin/{checkin.ID}/image", manager)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    # the job never rewrites a thumbnail
+    response = call_app("GET", f"/checkin/{checkin.ID}/image?size=small", manager)
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("private, max-age=")
+
+    JobController.finish(job.ID)
+    response = call_app("GET", f"/checkin/{checkin.ID}/image", manager)
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("private, max-age=")
+
+
+def test_owner_check_does_not_load_the_owner(database):
+    user = User.create(fullname="Student", date_of_birth=datetime(2001, 1, 1), student_id="102190001",
+                       phone="0123456701", username="102190001", password="x")
+    image = IdentityImages.create(path="identity.jpg", user=user)
+    with count_queries() as queries:
+        assert IdentityImageController.get_image_path(image.ID, user.ID) == "identity.jpg"
+    assert queries.count == 1
+    with pytest.raises(ValueError):
+        IdentityImageController.get_image_path(image.ID, user.ID + 1)
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import pytest
+from database_connection import db
+from utils.db_executor import db_executor, db_writer
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "data", "user022_schema.sql")
+
+
+@pytest.fixture
+def old_database():
+    """database.db as the app left it at user-022, opened through the app's connection"""
+    db_writer.shutdown()
+    db_executor.shutdown()
+    db.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists("database.db" + suffix):
+            os.remove("database.db" + suffix)
+    with open(SCHEMA, encoding="utf-8") as file:
+        connection = sqlite3.connect("database.db")
+        connection.executescript(file.read())
+        connection.close()
+    db.connect()
+    yield db
+    db.close()
+
+
+def test_init_table_upgrades_user022_database(old_database):
+    import database_script
+    from models.Event import CheckinImage, EventCounter
+    from models.Job import Job
+    from controllers.LocationController import LocationController
+    from models.Search import EventSearch
+
+    database_script.init_table(old_database)
+
+    columns = {column.name for column in old_database.get_columns("checkinimage")}
+    assert {"suspect_user_id", "suspect_score", "distance", "outside_fence"} <= columns
+    indexes = {index.name for index in old_database.get_indexes("checkinimage")}
+    assert {"checkinimage_suspect_user_id", "checkinimage_event_id_suspect_user_id"} <= indexes
+    assert Job.table_exists()
+
+    checkin = CheckinImage.get_by_id(1)
+    assert checkin.score == 0.5
+    assert checkin.suspect_user is None
+    assert checkin.outside_fence is False
+    # derived tables are filled from the existing rows
+    assert EventCounter.get_by_id(1).pending_review == 1
+    assert EventSearch.select().where(EventSearch.match("khai*")).count() == 1
+    assert [location.ID for location in LocationController.search("toà nhà")] == [1]
+
+
+def test_init_table_twice_is_a_no_op(old_database):
+    import database_script
+
+    database_script.init_table(old_database)
+    schema = old_database.execute_sql("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+    database_script.init_table(old_database)
+    assert old_database.execute_sql("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall() == schema
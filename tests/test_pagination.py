@@ -0,0 +1,62 @@
+import pytest
+from conftest import call_app
+from models.Location import Location
+from models.Manager import Manager
+from utils import pagination
+
+ROWS = 32
+
+
+@pytest.fixture
+def locations(database):
+    for index in range(ROWS):
+        Location.create(name=f"Location {index}", longitude=108.0, latitude=16.0, radius=50)
+    return Location.select()
+
+
+@pytest.mark.parametrize("page, limit, expected", [
+    (None, -5, 1),
+    (None, -1, 1),
+    (None, 0, ROWS),
+    (1, -1, 1),
+    (-3, 5, 5),
+    (None, 10 ** 6, ROWS),
+])
+def test_paginate_clamps_limit(locations, monkeypatch, page, limit, expected):
+    monkeypatch.setattr(pagination, "MAX_PAGE_SIZE", 100)
+    rows = pagination.paginate(locations, Location.ID, page=page, limit=limit)
+    assert len(rows) == expected
+
+
+def test_paginate_never_exceeds_max_page_size(locations, monkeypatch):
+    monkeypatch.setattr(pagination, "MAX_PAGE_SIZE", 10)
+    assert len(pagination.paginate(locations, Location.ID, limit=-5)) == 1
+    assert len(pagination.paginate(locations, Location.ID, limit=50)) == 10
+    assert len(pagination.paginate(locations, Location.ID, page=1, limit=50)) == 10
+
+
+def test_cursor_walks_every_row_once(locations):
+    seen = []
+    after = None
+    while True:
+        rows = pagination.paginate(locations, Location.ID, after=after, limit=7)
+        seen += [row.ID for row in rows]
+        if rows.next_cursor is None:
+            break
+        after = rows.next_cursor
+    assert seen == sorted(location.ID for location in locations)
+
+
+@pytest.mark.parametrize("query", ["limit=-5", "limit=0", "page=0", "page=1&limit=-1", "page=-2"])
+def test_routes_reject_page_size_below_one(locations, query):
+    manager = Manager.create(fullname="M", is_admin=False, username="manager", password="x")
+    response = call_app("GET", "/locations/?" + query, manager)
+    assert response.status_code == 422
+
+
+def test_routes_accept_valid_page_size(locations):
+    manager = Manager.create(fullname="M", is_admin=False, username="manager", password="x")
+    response = call_app("GET", "/locations/?limit=5", manager)
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert response.headers[pagination.NEXT_CURSOR_HEADER]
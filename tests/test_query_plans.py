@@ -0,0 +1,90 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from conftest import count_queries
+from controllers.CheckinController import CheckinController
+from controllers.EventController import EventController
+from controllers.IdentityImageController import IdentityImageController
+from controllers.JobController import JobController, CHECKIN_IMAGE_JOB
+from models.Event import CheckinImage, Event, RegisterEvent, LimitGroup
+from models.Group import Group, JoinGroup
+from models.Location import Location
+from models.User import User, IdentityImages
+
+# "SCAN <table>" reads every row; virtual tables (full-text search) and constant rows are not tables
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)(?!.*VIRTUAL TABLE)")
+
+
+@pytest.fixture
+def rows(database):
+    """A few rows in every table the lookups touch, so each plan has something to choose from"""
+    now = datetime.now()
+    location = Location.create(name="H", longitude=108.15, latitude=16.07, radius=50)
+    users = [
+        User.create(fullname=f"Student {index}", date_of_birth=datetime(2001, 1, 1), student_id=f"1021900{index:02d}",
+                    phone=f"01234567{index:02d}", username=f"1021900{index:02d}", password="x")
+        for index in range(5)
+    ]
+    groups = [Group.create(name=f"Group {index}", require_approve=False, code="KHOA") for index in range(3)]
+    events = [
+        Event.create(title=f"Event {index}", place="H", location=location, start_at=now, stop_at=now)
+        for index in range(3)
+    ]
+    for user in users:
+        JoinGroup.create(group=groups[0], user=user, approve=True)
+        for event in events:
+            RegisterEvent.create(user=user, event=event)
+            CheckinImage.create(path="c.jpg", user=user, event=event, accept=False)
+        IdentityImages.create(path="i.jpg", user=user, approve=True)
+    LimitGroup.create(group=groups[0], event=events[0])
+    return users, groups, events
+
+
+def full_scans(database, statements) -> list:
+    scans = []
+    for sql, params in statements:
+        if not sql.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE")):
+            continue
+        for *_, detail in database.execute_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall():
+            if FULL_SCAN.match(detail):
+                scans.append(f"{detail} in {sql}")
+    return scans
+
+
+def lookups(users, groups, events):
+    user, event, group = users[0], events[0], groups[1]
+    yesterday = datetime.now() - timedelta(days=1)
+    return {
+        "valid_to_checkin": lambda: CheckinImage.valid_to_checkin(user.ID, event.ID),
+        "validate_checkin": lambda: CheckinController.validate_checkin(user.ID, event.ID),
+        "identity images of a user": lambda: IdentityImageController.get_identity_images(user_id=user.ID),
+        "identity images of a user since": lambda: IdentityImageController.get_identity_images(
+            user_id=user.ID, from_date=yesterday),
+        "approved identity images": lambda: IdentityImageController.get_approved_paths([user.ID]),
+        "check-ins of a user": lambda: CheckinController.get_checkins(user_id=user.ID),
+        "check-ins of an event": lambda: CheckinController.get_checkins(event_id=event.ID),
+        "check-ins of a user in an event": lambda: CheckinController.get_checkins(user_id=user.ID, event_id=event.ID),
+        "suspicious check-ins": lambda: CheckinController.get_suspicious(event.ID),
+        "participants": lambda: EventController.get_participants(event.ID),
+        "events of a user": lambda: EventController.get_event_of_user(user.ID),
+        "event of a user": lambda: EventController.get_event_of_user(user.ID, event.ID),
+        "valid_to_register": lambda: event.valid_to_register(user),
+        "valid_to_join": lambda: group.valid_to_join(user.ID),
+        "pending upload job": lambda: JobController.is_pending(CHECKIN_IMAGE_JOB, {"checkin_id": 1}),
+    }
+
+
+def test_lookups_use_indexes(database, rows):
+    scans = {}
+    for name, lookup in lookups(*rows).items():
+        try:
+            with count_queries() as queries:
+                lookup()
+        except ValueError:
+            # validations may refuse, the queries they ran are what matters
+            pass
+        assert queries.count > 0, name
+        found = full_scans(database, queries.statements)
+        if found:
+            scans[name] = found
+    assert scans == {}
@@ -0,0 +1,64 @@
+from datetime import datetime
+import routers.authentication
+from conftest import call_app
+from controllers.UserController import UserController
+from models.Manager import Manager
+from models.RevokedToken import RevokedToken
+from models.User import User
+from utils.auth_util import create_access_token, revoke_token
+from utils.revocation import revocation_list
+
+
+def make_accounts() -> tuple:
+    revocation_list.load()
+    admin = Manager.create(fullname="A", is_admin=True, username="admin", password="x")
+    user = User.create(fullname="Student", date_of_birth=datetime(2001, 1, 1), student_id="102190001",
+                       phone="0123456701", username="102190001", password="x")
+    return admin, user
+
+
+def test_block_applies_once_committed(database, monkeypatch):
+    admin, user = make_accounts()
+    assert call_app("PUT", f"/users/{user.ID}", admin, json={"block": True}).status_code == 200
+    assert revocation_list.is_blocked(user.ID)
+    assert call_app("GET", "/users/profile", user).status_code == 403
+    assert call_app("PUT", f"/users/{user.ID}", admin, json={"block": False}).status_code == 200
+    assert call_app("GET", "/users/profile", user).status_code == 200
+
+    update = UserController.update
+
+    def failing_update(user_id: int, detail: dict):
+        update(user_id, detail)
+        raise RuntimeError("disk full")
+
+    # the write is rolled back, the student must not be blocked either
+    monkeypatch.setattr(UserController, "update", failing_update)
+    assert call_app("PUT", f"/users/{user.ID}", admin, json={"block": True}).status_code == 500
+    assert not User.get_by_id(user.ID).block
+    assert not revocation_list.is_blocked(user.ID)
+
+
+def test_deleted_user_is_no_longer_blocked(database):
+    admin, user = make_accounts()
+    assert call_app("PUT", f"/users/{user.ID}", admin, json={"block": True}).status_code == 200
+    assert call_app("DELETE", f"/users/{user.ID}", admin).status_code == 200
+    assert not revocation_list.is_blocked(user.ID)
+    assert revocation_list.stats()["blocked_users"] == 0
+
+
+def test_logout_applies_once_committed(database, monkeypatch):
+    _, user = make_accounts()
+    headers = {"Authorization": "Bearer " + create_access_token(user)}
+
+    def failing_revoke(token: str):
+        revoke_token(token)
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(routers.authentication, "revoke_token", failing_revoke)
+    assert call_app("POST", "/auth/logout", headers=dict(headers)).status_code == 500
+    assert RevokedToken.select().count() == 0
+    assert call_app("GET", "/users/profile", headers=dict(headers)).status_code == 200
+
+    monkeypatch.setattr(routers.authentication, "revoke_token", revoke_token)
+    assert call_app("POST", "/auth/logout", headers=dict(headers)).status_code == 200
+    assert call_app("GET", "/users/profile", headers=dict(headers)).status_code == 401
@@ -0,0 +1,17 @@
+import pytest
+from controllers.LocationController import LocationController
+from models.Location import Location
+
+
+@pytest.mark.parametrize("keyword", ["Đà", "đà nẵng", "da nang", "Đ", "nẵng"])
+def test_location_search_folds_d_with_stroke(database, keyword):
+    location = Location.create(name="Đà Nẵng", longitude=108.2, latitude=16.05, radius=50)
+    Location.create(name="Huế", longitude=107.6, latitude=16.46, radius=50)
+    assert [found.ID for found in LocationController.search(keyword)] == [location.ID]
+
+
+def test_location_search_follows_renames(database):
+    location = Location.create(name="Huế", longitude=107.6, latitude=16.46, radius=50)
+    LocationController.update(location.ID, {"name": "Đà Nẵng"})
+    assert [found.ID for found in LocationController.search("Đà")] == [location.ID]
+    assert list(LocationController.search("hue")) == []
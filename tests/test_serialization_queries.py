@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import List
+import pytest
+from pydantic import parse_obj_as
+from conftest import count_queries
+from controllers.CheckinController import CheckinController
+from controllers.EventController import EventController
+from controllers.GroupController import GroupController
+from models.Event import CheckinImage, Event, RegisterEvent
+from models.Group import Group, JoinGroup
+from models.Manager import Manager
+from models.User import User
+from pydantics.Checkin import CheckIn, CheckInNoUser, SuspiciousCheckIn
+from pydantics.Event import EventOfUser, EventParticipant
+from pydantics.Group import GroupOfMember, MemberInGroup
+
+
+@pytest.fixture
+def school(database):
+    """An event, a group and a manager whose lists grow with add_rows"""
+    now = datetime.now()
+    manager = Manager.create(fullname="M", is_admin=False, username="manager", password="x")
+    event = Event.create(title="Event", place="H", start_at=now, stop_at=now)
+    group = Group.create(name="Group", require_approve=False)
+    suspect = User.create(fullname="Suspect", date_of_birth=datetime(2001, 1, 1), student_id="102190999",
+                          phone="0123456999", username="102190999", password="x")
+    students = []
+
+    def add_rows(count: int):
+        """count more rows in every list: students of the event and group, events, groups and check-ins of the first"""
+        for _ in range(count):
+            index = len(students)
+            user = User.create(fullname=f"Student {index}", date_of_birth=datetime(2001, 1, 1),
+                               student_id=f"1021900{index:02d}", phone=f"01234567{index:02d}",
+                               username=f"1021900{index:02d}", password="x")
+            students.append(user)
+            RegisterEvent.create(user=user, event=event, added_by=manager)
+            JoinGroup.create(group=group, user=user, approve=True, added_by=manager)
+            other_event = Event.create(title=f"Event {index}", place="H", start_at=now, stop_at=now)
+            other_group = Group.create(name=f"Group {index}", require_approve=False)
+            RegisterEvent.create(user=students[0], event=other_event, added_by=manager)
+            JoinGroup.create(group=other_group, user=students[0], approve=True, added_by=manager)
+            CheckinImage.create(path="c.jpg", user=students[0], event=event, suspect_user=suspect, suspect_score=0.9)
+
+    return event, group, students, add_rows
+
+
+def endpoints(event, group, students):
+    """(response model, controller call) of every list endpoint whose rows hold related rows"""
+    user, event_id, group_id = students[0].ID, event.ID, group.ID
+    return {
+        "/checkin/": (List[CheckIn], lambda: CheckinController.get_checkins(event_id=event_id)),
+        "/checkin/of-user": (List[CheckInNoUser], lambda: CheckinController.get_checkins(user_id=user)),
+        "/checkin/of-event/{id}/suspicious": (List[SuspiciousCheckIn],
+                                              lambda: CheckinController.get_suspicious(event_id)),
+        "/events/{id}/participants": (List[EventParticipant], lambda: EventController.get_participants(event_id)),
+        "/events/of-user": (List[EventOfUser], lambda: EventController.get_event_of_user(user)),
+        "/groups/of-user/{id}": (List[GroupOfMember], lambda: GroupController.get_group_of_user(user)),
+        "/groups/{id}/members": (List[MemberInGroup], lambda: GroupController.get_member_in_group(group_id)),
+    }
+
+
+def serialize_queries(model, lookup) -> tuple:
+    """(statements, rows) to load a page and serialize it the way the route does"""
+    with count_queries() as queries:
+        rows = parse_obj_as(model, lookup())
+    return queries.count, len(rows)
+
+
+@pytest.mark.parametrize("endpoint", list(endpoints(Event(), Group(), [User()])))
+def test_serialization_query_count_does_not_grow_with_rows(school, endpoint):
+    event, group, students, add_rows = school
+    add_rows(2)
+    few = serialize_queries(*endpoints(event, group, students)[endpoint])
+    add_rows(8)
+    many = serialize_queries(*endpoints(event, group, students)[endpoint])
+    assert many[1] > few[1], "the page did not grow"
+    # related rows come with the page, nothing is loaded lazily per row
+    assert many[0] == few[0] == 1
@@ -0,0 +1,49 @@
+import asyncio
+import io
+import pytest
+from fastapi import UploadFile
+from utils.storage import S3Storage
+
+moto = pytest.importorskip("moto")
+
+
+@pytest.fixture
+def storage():
+    with moto.mock_aws():
+        storage = S3Storage("images", "checkin", region_name="us-east-1", access_key="test", secret_key="test")
+        storage._client.create_bucket(Bucket="images")
+        yield storage
+
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile("photo.jpg", io.BytesIO(data))
+
+
+def test_objects_are_stored_under_the_prefix(storage, tmp_path):
+    assert asyncio.run(storage.put("aa/bb/photo.jpg", upload(b"x" * 3000), limit_kb=10)) == 3000
+    source = tmp_path / "normalized.jpg"
+    source.write_bytes(b"y" * 100)
+    asyncio.run(storage.put_file("aa/bb/normalized.jpg", str(source)))
+    listed = storage._client.list_objects_v2(Bucket="images")["Contents"]
+    assert sorted(item["Key"] for item in listed) == ["checkin/aa/bb/normalized.jpg", "checkin/aa/bb/photo.jpg"]
+
+    assert asyncio.run(storage.get("aa/bb/photo.jpg")) == b"x" * 3000
+    stored = asyncio.run(storage.stat("aa/bb/normalized.jpg"))
+    assert (stored.key, stored.size) == ("aa/bb/normalized.jpg", 100)
+    assert stored.modified_at is not None
+
+    asyncio.run(storage.delete("aa/bb/photo.jpg"))
+    assert asyncio.run(storage.get("aa/bb/photo.jpg")) is None
+    assert asyncio.run(storage.stat("aa/bb/photo.jpg")) is None
+    # deleting what is already gone is not an error
+    asyncio.run(storage.delete("aa/bb/photo.jpg"))
+
+
+# a single request, and a multipart upload (parts of 8 MB) aborted after its first part
+@pytest.mark.parametrize("size, limit_kb", [(20000, 10), (12 * 2 ** 20, 10000)])
+def test_upload_past_the_limit_is_aborted(storage, size, limit_kb):
+    with pytest.raises(ValueError):
+        asyncio.run(storage.put("aa/bb/large.jpg", upload(b"x" * size), limit_kb=limit_kb))
+    assert asyncio.run(storage.stat("aa/bb/large.jpg")) is None
+    assert storage._client.list_objects_v2(Bucket="images")["KeyCount"] == 0
+    assert "Uploads" not in storage._client.list_multipart_uploads(Bucket="images")
@@ -0,0 +1,58 @@
+import asyncio
+import io
+import os
+from datetime import datetime
+from PIL import Image
+from conftest import call_app
+from controllers.JobController import JobController, CHECKIN_IMAGE_JOB
+from models.Event import CheckinImage, Event
+from models.Job import Job
+from models.Manager import Manager
+from models.User import User
+from utils import upload_jobs
+from utils.job_queue import JobQueue, job_queue
+from utils.storage import checkin_storage
+
+
+def test_unreadable_checkin_photo_is_deleted(database):
+    manager = Manager.create(fullname="M", is_admin=False, username="manager", password="x")
+    user = User.create(fullname="Student", date_of_birth=datetime(2001, 1, 1), student_id="102190001",
+                       phone="0123456701", username="102190001", password="x")
+    event = Event.create(title="Event", place="H", start_at=datetime.now(), stop_at=datetime.now())
+    # the header passed the check of the upload, the rest of the photo is missing
+    data = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 10, 10)).save(data, "JPEG")
+    path = checkin_storage.local_path("broken.jpg")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data.getvalue()[:200])
+    checkin = CheckinImage.create(path="broken.jpg", user=user, event=event)
+    JobController.enqueue(CHECKIN_IMAGE_JOB, {"checkin_id": checkin.ID})
+
+    assert upload_jobs.discard_checkin_image in job_queue._failure_handlers.values()
+    asyncio.run(job_queue._execute(JobController.claim()))
+    assert Job.get().status == "failed"
+    assert not os.path.exists(path)
+    assert CheckinImage.get_by_id(checkin.ID).image_failed
+    assert call_app("GET", f"/checkin/{checkin.ID}/image", manager).status_code == 404
+    response = call_app("GET", f"/checkin/?event_id={event.ID}", manager)
+    assert [row["image_failed"] for row in response.json()] == [True]
+
+
+def test_cleanup_waits_for_the_last_attempt(database):
+    queue = JobQueue()
+    failed = []
+
+    async def handler(value: int):
+        raise OSError("storage unreachable")
+
+    async def on_failure(value: int):
+        failed.append(value)
+
+    queue.register("flaky", handler, on_failure)
+    JobController.enqueue("flaky", {"value": 1}, max_attempts=2)
+    asyncio.run(queue._execute(JobController.claim()))
+    assert Job.get().status == "queued" and failed == []
+    Job.update(run_after=datetime.now()).execute()
+    asyncio.run(queue._execute(JobController.claim()))
+    assert Job.get().status == "failed" and failed == [1]
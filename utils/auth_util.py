@@ -1,5 +1,4 @@
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import config
 from datetime import datetime, timedelta
 from typing import Optional, Union
@@ -8,9 +7,14 @@ from fastapi import Depends, HTTPException, status
 from pydantics.Token import TokenData, Token
 from models.User import User
 from models.Manager import Manager
+from models.RevokedToken import RevokedToken
+from utils.db_executor import run_in_db, run_write
+from utils.password_hasher import verify_password_async, hash_password_async
+from utils.token_cache import TokenCache
+from utils.revocation import revocation_list
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth")
+token_cache = TokenCache(getattr(config, "TOKEN_CACHE_SIZE", 10000))
 credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -21,32 +25,41 @@ not_permission_exception = HTTPException(
         detail="Not allow with your role",
         headers={"WWW-Authenticate": "Bearer"},
 )
+blocked_exception = HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Tài khoản đã bị khóa",
+        headers={"WWW-Authenticate": "Bearer"},
+)
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def find_account(username: str) -> Union[User, Manager]:
+    # manager accounts take precedence, as they always have at login
+    manager = Manager.get_or_none(username=username)
+    if manager:
+        return manager
+    return User.get_or_none(username=username)
 
 
-def authenticate_user(username: str, password: str) -> User:
-    user = User.get_or_none(username=username)
+async def authenticate(username: str, password: str) -> Union[User, Manager]:
+    user = await run_in_db(find_account, username)
     if not user:
         return None
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         return None
     return user
 
 
-def authenticate_manager(username: str, password: str) -> Manager:
-    user = Manager.get_or_none(username=username)
-    if not user:
-        return None
-    if not verify_password(password, user.password):
-        return None
-    return user
+async def change_account_password(controller, user_id: int, old_password: str, new_password: str):
+    """
+    Check old_password and store the hash of new_password for an account of controller (UserController or
+    ManagerController): bcrypt runs on the hashing pool, the hash is stored by the db writer
+    """
+    old_hash = await run_in_db(controller.get_password_hash, user_id)
+    if not await verify_password_async(old_password, old_hash):
+        raise ValueError("Mật khẩu cũ không chính xác")
+    new_hash = await hash_password_async(new_password)
+    if not await run_write(controller.replace_password, user_id, old_hash, new_hash):
+        raise ValueError("Mật khẩu vừa được thay đổi, vui lòng thử lại")
 
 
 def create_access_token(user: Union[User, Manager]):
@@ -64,30 +77,52 @@ def create_access_token(user: Union[User, Manager]):
     return encoded_jwt
 
 
-async def allow_student(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
+def decode_token(token: str) -> TokenData:
+    # a token is only verified once, until it expires or falls out of the cache
+    digest = TokenCache.digest(token)
+    if revocation_list.is_revoked(digest):
+        raise credentials_exception
+    token_data = token_cache.get(digest)
+    if token_data is None:
+        try:
+            payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
+        except JWTError:
+            raise credentials_exception
         if payload.get("ID") is None:
             raise credentials_exception
-        if payload.get("role") != "student":
-            raise not_permission_exception
         token_data = TokenData(**payload)
-    except JWTError:
-        raise credentials_exception
+        if payload.get("exp") is not None:
+            token_cache.put(digest, token_data, payload["exp"])
+    if token_data.role == "student" and revocation_list.is_blocked(token_data.ID):
+        raise blocked_exception
+    return token_data
+
+
+def revoke_token(token: str) -> tuple:
+    """Store the revocation of a token, returns (digest, expire_at) for forget_token once it is committed"""
+    digest = TokenCache.digest(token)
+    expire_at = jwt.get_unverified_claims(token)["exp"]
+    RevokedToken.revoke(digest.hex(), datetime.fromtimestamp(expire_at))
+    return digest, expire_at
+
+
+def forget_token(digest: bytes, expire_at: float):
+    """Reject a revoked token from now on, only after the revocation is committed"""
+    revocation_list.revoke(digest, expire_at)
+    token_cache.discard(digest)
+
+
+async def allow_student(token: str = Depends(oauth2_scheme)):
+    token_data = decode_token(token)
+    if token_data.role != "student":
+        raise not_permission_exception
     return token_data
 
 
 async def allow_manager(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
-        if payload.get("ID") is None:
-            raise credentials_exception
-        role = payload.get("role")
-        if role != "manager" and role != "admin":
-            raise not_permission_exception
-        token_data = TokenData(**payload)
-    except JWTError:
-        raise credentials_exception
+    token_data = decode_token(token)
+    if token_data.role != "manager" and token_data.role != "admin":
+        raise not_permission_exception
     return token_data
 
 
@@ -98,12 +133,4 @@ async def allow_admin(user: TokenData = Depends(allow_manager)):
 
 
 async def allow_any_role(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
-        if payload.get("ID") is None:
-            raise credentials_exception
-        token_data = TokenData(**payload)
-    except JWTError:
-        raise credentials_exception
-    return token_data
-
+    return decode_token(token)
@@ -0,0 +1,203 @@
+import asyncio
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from peewee import Database
+from database_connection import db
+from utils.metrics import LatencyRecorder
+import config
+
+DB_POOL_SIZE = getattr(config, "DB_POOL_SIZE", 8)
+DB_WRITER_BATCH_SIZE = getattr(config, "DB_WRITER_BATCH_SIZE", 64)
+DB_WRITER_BATCH_WAIT_MS = getattr(config, "DB_WRITER_BATCH_WAIT_MS", 2)
+
+
+class DatabaseExecutor:
+    """
+    Run blocking peewee work on a bounded thread pool so the event loop never waits for SQLite.
+    Every worker thread keeps its own connection to the database.
+    """
+
+    def __init__(self, database: Database, max_workers: int):
+        self._database = database
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.wait_time = LatencyRecorder()
+        self.run_time = LatencyRecorder()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="db-worker",
+                    initializer=self._open_connection
+                )
+            return self._executor
+
+    def _open_connection(self):
+        self._database.connect(reuse_if_open=True)
+
+    def _call(self, submitted_at: float, func, args: tuple, kwargs: dict):
+        started_at = time.perf_counter()
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+        self.wait_time.record(started_at - submitted_at)
+        try:
+            self._open_connection()
+            return func(*args, **kwargs)
+        finally:
+            self.run_time.record(time.perf_counter() - started_at)
+            with self._lock:
+                self._running -= 1
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        with self._lock:
+            self._pending += 1
+        call = functools.partial(self._call, time.perf_counter(), func, args, kwargs)
+        return await loop.run_in_executor(executor, call)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+            running = self._running
+        return {
+            "workers": self._max_workers,
+            "queue_depth": pending,
+            "running": running,
+            "wait_time": self.wait_time.summary(),
+            "run_time": self.run_time.summary(),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class DatabaseWriter:
+    """
+    Run every write on one thread with its own connection.
+    Writes that arrive together share a single transaction and a single commit,
+    each one inside its own savepoint so a failing write does not affect the others.
+    """
+
+    def __init__(self, database: Database, max_batch: int, batch_wait: float):
+        self._database = database
+        self._max_batch = max_batch
+        self._batch_wait = batch_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._writes = 0
+        self.wait_time = LatencyRecorder()
+        self.commit_time = LatencyRecorder()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        self._database.connect(reuse_if_open=True)
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self._batch_wait
+            while len(batch) < self._max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+        self._database.close()
+
+    def _commit(self, batch: list):
+        started_at = time.perf_counter()
+        results = []
+        try:
+            with self._database.atomic():
+                for submitted_at, _, _, func, args, kwargs in batch:
+                    self.wait_time.record(started_at - submitted_at)
+                    try:
+                        with self._database.atomic():
+                            results.append((True, func(*args, **kwargs)))
+                    except Exception as err:
+                        results.append((False, err))
+        except Exception as err:
+            # the commit itself failed, none of the writes in this batch were stored
+            results = [(False, err)] * len(batch)
+        self.commit_time.record(time.perf_counter() - started_at)
+        with self._lock:
+            self._batches += 1
+            self._writes += len(batch)
+        for (_, loop, future, _, _, _), (success, value) in zip(batch, results):
+            loop.call_soon_threadsafe(_resolve_future, future, success, value)
+
+    async def run(self, func, *args, **kwargs):
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((time.perf_counter(), loop, future, func, args, kwargs))
+        return await future
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches = self._batches
+            writes = self._writes
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": batches,
+            "writes": writes,
+            "avg_batch_size": round(writes / batches, 2) if batches else 0.0,
+            "wait_time": self.wait_time.summary(),
+            "commit_time": self.commit_time.summary(),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+def _resolve_future(future: asyncio.Future, success: bool, value):
+    if future.cancelled():
+        return
+    if success:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+db_executor = DatabaseExecutor(db, DB_POOL_SIZE)
+db_writer = DatabaseWriter(db, DB_WRITER_BATCH_SIZE, DB_WRITER_BATCH_WAIT_MS / 1000)
+
+
+async def run_in_db(func, *args, **kwargs):
+    return await db_executor.run(func, *args, **kwargs)
+
+
+async def run_write(func, *args, **kwargs):
+    return await db_writer.run(func, *args, **kwargs)
@@ -0,0 +1,112 @@
+import asyncio
+import time
+import numpy as np
+from utils.embedding_store import identity_embeddings, checkin_embeddings
+from utils.face_embedding import FACE_EMBEDDING_ENABLED
+from utils.face_index import FaceIndex
+from utils.metrics import LatencyRecorder
+import config
+
+# flag check-ins showing the face of another user and list them at /checkin/of-event/{id}/suspicious.
+# Off by default: it needs a face embedding model and FACE_DUPLICATE_MIN_SCORE.
+FACE_DUPLICATE_ENABLED = getattr(config, "FACE_DUPLICATE_ENABLED", False)
+# a check-in whose nearest face belongs to another user at least this similar is flagged.
+# Like the face match thresholds it has to be measured on the scores of the embedding model in use.
+FACE_DUPLICATE_MIN_SCORE = getattr(config, "FACE_DUPLICATE_MIN_SCORE", None)
+if FACE_DUPLICATE_ENABLED and (not FACE_EMBEDDING_ENABLED or FACE_DUPLICATE_MIN_SCORE is None):
+    raise ValueError("FACE_DUPLICATE_ENABLED needs FACE_EMBEDDING_MODEL and FACE_DUPLICATE_MIN_SCORE")
+# "exact", "ivf", or "auto": ivf once the index holds FACE_INDEX_IVF_MIN embeddings
+FACE_INDEX_MODE = getattr(config, "FACE_INDEX_MODE", "auto")
+FACE_INDEX_IVF_MIN = getattr(config, "FACE_INDEX_IVF_MIN", 50000)
+FACE_INDEX_NPROBE = getattr(config, "FACE_INDEX_NPROBE", 8)
+# seconds an index is used before it is rebuilt with the embeddings stored since
+FACE_INDEX_REFRESH = getattr(config, "FACE_INDEX_REFRESH", 60)
+
+# neighbours fetched per query, the check-in itself may be one of them
+_NEIGHBOURS = 4
+
+
+class DuplicateFaceDetector:
+    """
+    Nearest-neighbour index over identity and check-in embeddings, flagging check-ins whose
+    best match is a face of another user. Labels are identity image IDs, negated check-in IDs.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._versions = None
+        self._built_at = 0
+        self.build_time = LatencyRecorder()
+        self.search_time = LatencyRecorder()
+        self.flagged = 0
+
+    def _build(self) -> FaceIndex:
+        identity_vectors, identity_ids, identity_users, _ = identity_embeddings.snapshot()
+        checkin_vectors, checkin_ids, checkin_users, _ = checkin_embeddings.snapshot()
+        vectors = np.concatenate([identity_vectors, checkin_vectors])
+        mode = FACE_INDEX_MODE
+        if mode == "auto":
+            mode = "ivf" if len(vectors) >= FACE_INDEX_IVF_MIN else "exact"
+        # centroids stay representative until the data has doubled, reusing them skips the k-means
+        previous = self._index
+        centroids = None
+        if mode == "ivf" and previous is not None and previous.centroids is not None \
+                and len(vectors) < 2 * previous.trained_size:
+            centroids = previous.centroids
+        index = FaceIndex(
+            vectors,
+            np.concatenate([identity_users, checkin_users]),
+            np.concatenate([identity_ids, -checkin_ids]),
+            mode=mode,
+            nprobe=FACE_INDEX_NPROBE,
+            centroids=centroids
+        )
+        if centroids is not None:
+            index.trained_size = previous.trained_size
+        return index
+
+    async def refresh(self):
+        """Rebuild the index off the event loop when the stores changed and it is old enough"""
+        if not FACE_DUPLICATE_ENABLED:
+            return
+        versions = (identity_embeddings.version, checkin_embeddings.version)
+        if self._index is not None and (
+                versions == self._versions or time.monotonic() - self._built_at < FACE_INDEX_REFRESH):
+            return
+        started_at = time.perf_counter()
+        self._index = await asyncio.get_running_loop().run_in_executor(None, self._build)
+        self.build_time.record(time.perf_counter() - started_at)
+        self._versions = versions
+        self._built_at = time.monotonic()
+
+    def find_suspects(self, probes: np.ndarray, owners: np.ndarray, checkin_ids: np.ndarray) -> dict:
+        """{checkin_id: (user_id, similarity)} of the probes whose best match is another user's face"""
+        if not FACE_DUPLICATE_ENABLED or self._index is None or not len(self._index) or not len(probes):
+            return {}
+        started_at = time.perf_counter()
+        scores, positions = self._index.search(probes, _NEIGHBOURS)
+        suspects = {}
+        for checkin_id, owner, row_scores, row_positions in zip(checkin_ids, owners, scores, positions):
+            for score, position in zip(row_scores, row_positions):
+                if position < 0 or self._index.labels[position] == -checkin_id:
+                    continue
+                user_id = int(self._index.user_ids[position])
+                if user_id != owner and score >= FACE_DUPLICATE_MIN_SCORE:
+                    suspects[int(checkin_id)] = (user_id, float(min(score, 1)))
+                break
+        self.search_time.record(time.perf_counter() - started_at)
+        self.flagged += len(suspects)
+        return suspects
+
+    def stats(self) -> dict:
+        return {
+            "enabled": FACE_DUPLICATE_ENABLED,
+            "mode": None if self._index is None else self._index.mode,
+            "size": 0 if self._index is None else len(self._index),
+            "flagged": self.flagged,
+            "build_time": self.build_time.summary(),
+            "search_time": self.search_time.summary(),
+        }
+
+
+duplicate_detector = DuplicateFaceDetector()
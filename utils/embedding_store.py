@@ -0,0 +1,239 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from numpy.lib.format import open_memmap
+from utils.face_embedding import EMBEDDING_DIM, FACE_EMBEDDING_ENABLED, embed_stored
+from utils.metrics import LatencyRecorder
+from utils.storage import Storage, identity_storage
+import config
+
+EMBEDDING_STORE_DIR = getattr(config, "EMBEDDING_STORE_DIR", "embeddings")
+
+ROW = np.dtype([("image_id", "<i8"), ("user_id", "<i8"), ("approved", "?")])
+_INITIAL_CAPACITY = 1024
+
+
+def _create(directory: str, capacity: int, dim: int) -> tuple:
+    os.makedirs(directory, exist_ok=True)
+    vectors = open_memmap(os.path.join(directory, "vectors.npy"), mode="w+", dtype="<f4", shape=(capacity, dim))
+    rows = open_memmap(os.path.join(directory, "rows.npy"), mode="w+", dtype=ROW, shape=(capacity,))
+    return vectors, rows
+
+
+class EmbeddingStore:
+    """
+    Identity image embeddings in two memory-mapped .npy files: a float32 matrix with one row per
+    image, and a record array of whose image each row is (image_id 0 marks a free row).
+    Only the pages touched are read, freed rows are reused and the files double when full.
+    """
+
+    def __init__(self, directory: str, dim: int = EMBEDDING_DIM):
+        self.directory = directory
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._vectors = None
+        self._rows = None
+        self._row_of_image = {}
+        self._rows_of_user = {}
+        self._free = []
+        # bumped on every change, so readers can tell their snapshot is stale
+        self.version = 0
+        self.lookup_time = LatencyRecorder()
+
+    def _open(self):
+        if self._vectors is not None:
+            return
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        rows_path = os.path.join(self.directory, "rows.npy")
+        if os.path.exists(vectors_path) and os.path.exists(rows_path):
+            vectors = open_memmap(vectors_path, mode="r+")
+            rows = open_memmap(rows_path, mode="r+")
+            if vectors.shape[1:] == (self.dim,) and rows.dtype == ROW and len(rows) == len(vectors):
+                self._attach(vectors, rows)
+                return
+            # written by another embedding version: start empty, entries are recomputed when missing
+            print(">> Embedding store at " + self.directory + " has another layout, starting an empty one")
+            del vectors, rows
+        self._attach(*_create(self.directory, _INITIAL_CAPACITY, self.dim))
+
+    def _attach(self, vectors: np.memmap, rows: np.memmap):
+        self._vectors = vectors
+        self._rows = rows
+        self._row_of_image = {}
+        self._rows_of_user = {}
+        used = np.flatnonzero(rows["image_id"])
+        for row, image_id, user_id in zip(used.tolist(), rows["image_id"][used].tolist(),
+                                          rows["user_id"][used].tolist()):
+            self._row_of_image[image_id] = row
+            self._rows_of_user.setdefault(user_id, []).append(row)
+        # popped from the end, so the lowest free rows are used first
+        self._free = np.flatnonzero(rows["image_id"] == 0)[::-1].tolist()
+
+    def _grow(self):
+        capacity = len(self._rows) * 2
+        temp_dir = self.directory + ".grow"
+        vectors, rows = _create(temp_dir, capacity, self.dim)
+        vectors[:len(self._vectors)] = self._vectors
+        rows[:len(self._rows)] = self._rows
+        vectors.flush()
+        rows.flush()
+        del vectors, rows
+        self._vectors = self._rows = None
+        for name in ("vectors.npy", "rows.npy"):
+            os.replace(os.path.join(temp_dir, name), os.path.join(self.directory, name))
+        os.rmdir(temp_dir)
+        self._open()
+
+    def put(self, image_id: int, user_id: int, vector: np.ndarray, approved: bool):
+        with self._lock:
+            self._open()
+            row = self._row_of_image.get(image_id)
+            if row is not None and self._rows[row]["user_id"] != user_id:
+                self.remove(image_id)
+                row = None
+            if row is None:
+                if not self._free:
+                    self._grow()
+                row = self._free.pop()
+                self._row_of_image[image_id] = row
+                self._rows_of_user.setdefault(user_id, []).append(row)
+            self._vectors[row] = vector
+            self._rows[row] = (image_id, user_id, approved)
+            self.version += 1
+
+    def set_approved(self, image_id: int, approved: bool) -> bool:
+        """False if the image has no embedding yet"""
+        with self._lock:
+            self._open()
+            row = self._row_of_image.get(image_id)
+            if row is None:
+                return False
+            self._rows["approved"][row] = approved
+            self.version += 1
+            return True
+
+    def remove(self, image_id: int):
+        with self._lock:
+            self._open()
+            row = self._row_of_image.pop(image_id, None)
+            if row is None:
+                return
+            user_rows = self._rows_of_user.get(int(self._rows["user_id"][row]), [])
+            if row in user_rows:
+                user_rows.remove(row)
+            self._rows[row] = (0, 0, False)
+            self._free.append(row)
+            self.version += 1
+
+    def remove_user(self, user_id: int):
+        with self._lock:
+            self._open()
+            for row in list(self._rows_of_user.get(user_id, [])):
+                self.remove(int(self._rows["image_id"][row]))
+            self._rows_of_user.pop(user_id, None)
+
+    def lookup(self, user_id: int) -> np.ndarray:
+        """Embeddings of the approved identity images of a user, one per row"""
+        started_at = time.perf_counter()
+        with self._lock:
+            self._open()
+            rows = [row for row in self._rows_of_user.get(user_id, ()) if self._rows["approved"][row]]
+            vectors = self._vectors[rows]
+        self.lookup_time.record(time.perf_counter() - started_at)
+        return vectors
+
+    def get(self, image_ids: list, user_ids: list) -> tuple:
+        """(embeddings of the images as rows, which were found); an entry of another user counts as missing"""
+        vectors = np.zeros((len(image_ids), self.dim), dtype=np.float32)
+        found = np.zeros(len(image_ids), dtype=bool)
+        with self._lock:
+            self._open()
+            for index, (image_id, user_id) in enumerate(zip(image_ids, user_ids)):
+                row = self._row_of_image.get(image_id)
+                if row is not None and self._rows["user_id"][row] == user_id:
+                    vectors[index] = self._vectors[row]
+                    found[index] = True
+        return vectors, found
+
+    def snapshot(self) -> tuple:
+        """(vectors, image_ids, user_ids, approved) of every stored image"""
+        with self._lock:
+            self._open()
+            used = np.flatnonzero(self._rows["image_id"])
+            rows = self._rows[used]
+            return np.asarray(self._vectors[used]), rows["image_id"], rows["user_id"], rows["approved"]
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._rows.flush()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._vectors = self._rows = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._open()
+            return {
+                "images": len(self._row_of_image),
+                "users": sum(1 for rows in self._rows_of_user.values() if rows),
+                "capacity": len(self._rows),
+                "file_bytes": self._vectors.nbytes + self._rows.nbytes,
+                "lookup_time": self.lookup_time.summary(),
+            }
+
+
+identity_embeddings = EmbeddingStore(EMBEDDING_STORE_DIR)
+# check-in photos, for finding the same face under two accounts; "approved" is unused there
+checkin_embeddings = EmbeddingStore(os.path.join(EMBEDDING_STORE_DIR, "checkins"))
+
+
+async def index_identity_image(image_id: int, user_id: int, key: str, approved: bool) -> bool:
+    """Compute and store the embedding of an identity image, False if it is not a readable image"""
+    vectors, valid = await embed_stored([(identity_storage, key)])
+    if not valid[0]:
+        return False
+    identity_embeddings.put(image_id, user_id, vectors[0], approved)
+    return True
+
+
+async def update_identity_embedding(image_id: int, user_id: int, key: str, approved: bool, recompute: bool = False):
+    """
+    Keep the store in step with an identity image, computing its embedding when missing or asked to.
+    A failure is only logged, a missing embedding is computed again when it is needed.
+    Without a face embedding model there is nothing to keep.
+    """
+    if not FACE_EMBEDDING_ENABLED:
+        return
+    try:
+        if recompute or not identity_embeddings.set_approved(image_id, approved):
+            await index_identity_image(image_id, user_id, key, approved)
+    except Exception as err:
+        print(">> Error when index identity image " + str(image_id))
+        print(err)
+
+
+def rebuild_embeddings(storage: Storage, images: list, directory: str) -> int:
+    """
+    Recompute a store from [(image_id, user_id, path, approved)] of every image in storage,
+    returns how many were stored. Run it while the app is stopped, it replaces the files.
+    """
+    vectors, valid = asyncio.run(embed_stored([(storage, path) for _, _, path, _ in images]))
+    temp_dir = directory + ".rebuild"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    store = EmbeddingStore(temp_dir, vectors.shape[1])
+    for (image_id, user_id, _, approved), vector, ok in zip(images, vectors, valid):
+        if ok:
+            store.put(image_id, user_id, vector, approved)
+    store.close()
+    os.makedirs(directory, exist_ok=True)
+    for name in ("vectors.npy", "rows.npy"):
+        os.replace(os.path.join(temp_dir, name), os.path.join(directory, name))
+    os.rmdir(temp_dir)
+    return int(valid.sum())
@@ -1,2 +1,4 @@
 DATABASE_ERROR = "Lỗi truy vấn cơ sở dữ liệu"
 USER_NOT_FOUND = "Tài khoản không tồn tại"
+EVENT_FULL = "Đã vượt quá số người cho phép"
+DUPLICATE_FACES_DISABLED = "Chức năng phát hiện check in trùng khuôn mặt chưa được bật"
@@ -0,0 +1,90 @@
+import itertools
+import threading
+import time
+from typing import Optional
+import config
+from models.Event import Event, EventCounter
+from utils.db_executor import run_in_db
+
+EVENT_CAPACITY_TTL = getattr(config, "EVENT_CAPACITY_TTL", 30)
+
+
+class EventCapacity:
+    """
+    In-memory seat counter per capped event.
+    A registration reserves a seat here before it is queued for writing, so once an
+    event is full the rest of a burst is rejected without touching the database.
+    The conditional insert in EventController.register_event stays the source of truth;
+    entries expire after EVENT_CAPACITY_TTL seconds to pick up changes from other processes.
+    Every load starts a new generation: a seat reserved before the reload is already counted by it
+    (or was never written), so giving it back must not free a seat of the new entry.
+    """
+
+    def __init__(self, ttl: float = EVENT_CAPACITY_TTL):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # event_id -> [maximum_participant, reserved seats, loaded at, generation]
+        self._seats = {}
+        self._generations = itertools.count(1)
+        self._rejected = 0
+
+    def is_loaded(self, event_id: int) -> bool:
+        entry = self._seats.get(event_id)
+        return entry is not None and time.monotonic() - entry[2] < self._ttl
+
+    def load(self, event_id: int):
+        event = Event.get_or_none(ID=event_id)
+        if event is None:
+            return
+        taken = 0
+        if event.maximum_participant is not None:
+            counter = EventCounter.get_or_none(EventCounter.event == event_id)
+            taken = counter.registered if counter else 0
+        with self._lock:
+            # another request may have loaded it meanwhile and already reserved seats
+            if not self.is_loaded(event_id):
+                self._seats[event_id] = [event.maximum_participant, taken, time.monotonic(), next(self._generations)]
+
+    def reserve(self, event_id: int) -> Optional[int]:
+        """Generation the seat was reserved against, 0 when nothing is counted, None if the event is full"""
+        with self._lock:
+            entry = self._seats.get(event_id)
+            if entry is None or entry[0] is None:
+                return 0
+            if entry[1] >= entry[0]:
+                self._rejected += 1
+                return None
+            entry[1] += 1
+            return entry[3]
+
+    def release(self, event_id: int, generation: int = None):
+        """
+        Give a seat back: the seat of a reservation of the given generation which was not written,
+        or with no generation a registration removed from the database.
+        """
+        with self._lock:
+            entry = self._seats.get(event_id)
+            if entry is None or (generation is not None and generation != entry[3]):
+                return
+            if entry[1] > 0:
+                entry[1] -= 1
+
+    def invalidate(self, event_id: int):
+        with self._lock:
+            self._seats.pop(event_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "events": len(self._seats),
+            "rejected": self._rejected,
+        }
+
+
+event_capacity = EventCapacity()
+
+
+async def reserve_seat(event_id: int) -> Optional[int]:
+    """See EventCapacity.reserve, the returned generation is given back to release if the registration fails"""
+    if not event_capacity.is_loaded(event_id):
+        await run_in_db(event_capacity.load, event_id)
+    return event_capacity.reserve(event_id)
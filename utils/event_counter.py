@@ -0,0 +1,100 @@
+from peewee import Database, fn, Case
+from models.Event import Event, EventCounter, RegisterEvent, CheckinImage
+
+COUNTER = EventCounter._meta.table_name
+REGISTER = RegisterEvent._meta.table_name
+CHECKIN = CheckinImage._meta.table_name
+
+# SQL expressions of how much one row adds to each counter, per source table
+REGISTER_COUNTERS = {
+    "registered": '({row}."block" = 0)',
+    "blocked": '({row}."block" = 1)',
+}
+CHECKIN_COUNTERS = {
+    "checked_in": '({row}."accept" IS 1)',
+    "pending_review": '({row}."accept" IS NULL)',
+}
+
+
+def _ensure_row(event_id: str) -> str:
+    # the columns have no SQL default, every counter has to be given
+    columns = ", ".join(f'"{column}"' for column in [*REGISTER_COUNTERS, *CHECKIN_COUNTERS])
+    zeros = ", ".join("0" for _ in [*REGISTER_COUNTERS, *CHECKIN_COUNTERS])
+    return f'INSERT OR IGNORE INTO "{COUNTER}"("event_id", {columns}) VALUES ({event_id}, {zeros});'
+
+
+def _change(counters: dict, row: str, sign: str) -> str:
+    assignments = ", ".join(
+        f'"{column}" = "{column}" {sign} {expression.format(row=row)}' for column, expression in counters.items()
+    )
+    return f'UPDATE "{COUNTER}" SET {assignments} WHERE "event_id" = {row}."event_id";'
+
+
+def _triggers(table: str, counters: dict, columns: str) -> dict:
+    ensure_row = _ensure_row('new."event_id"')
+    return {
+        f"{COUNTER}_{table}_after_insert":
+            f'AFTER INSERT ON "{table}" BEGIN {ensure_row} {_change(counters, "new", "+")} END',
+        # no ensure_row here: a cascade from a deleted event must not re-create its counter
+        f"{COUNTER}_{table}_after_delete":
+            f'AFTER DELETE ON "{table}" BEGIN {_change(counters, "old", "-")} END',
+        f"{COUNTER}_{table}_after_update":
+            f'AFTER UPDATE OF {columns} ON "{table}" '
+            f'BEGIN {_change(counters, "old", "-")} {ensure_row} {_change(counters, "new", "+")} END',
+    }
+
+
+def counter_triggers() -> dict:
+    event_row = _ensure_row('new."ID"')
+    triggers = {
+        f"{COUNTER}_event_after_insert": f'AFTER INSERT ON "{Event._meta.table_name}" BEGIN {event_row} END',
+    }
+    triggers.update(_triggers(REGISTER, REGISTER_COUNTERS, '"block", "event_id"'))
+    triggers.update(_triggers(CHECKIN, CHECKIN_COUNTERS, '"accept", "event_id"'))
+    return triggers
+
+
+def create_counter_triggers(database: Database):
+    """Create the counter table and the triggers keeping it in sync, counting existing rows once"""
+    created = not EventCounter.table_exists()
+    EventCounter.create_table(safe=True)
+    for name, body in counter_triggers().items():
+        database.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{name}" {body}')
+    if created:
+        repair_counters(database)
+
+
+def repair_counters(database: Database) -> int:
+    """Recompute every event counter from its source rows, returns how many rows were wrong"""
+    registers = RegisterEvent\
+        .select(RegisterEvent.event,
+                fn.SUM(Case(None, [(RegisterEvent.block == False, 1)], 0)).alias("registered"),
+                fn.SUM(Case(None, [(RegisterEvent.block == True, 1)], 0)).alias("blocked"))\
+        .group_by(RegisterEvent.event)
+    checkins = CheckinImage\
+        .select(CheckinImage.event,
+                fn.SUM(Case(None, [(CheckinImage.accept == True, 1)], 0)).alias("checked_in"),
+                fn.SUM(Case(None, [(CheckinImage.accept.is_null(), 1)], 0)).alias("pending_review"))\
+        .group_by(CheckinImage.event)
+    with database.atomic():
+        expected = {event_id: [0, 0, 0, 0] for event_id, in Event.select(Event.ID).tuples()}
+        for event_id, registered, blocked in registers.tuples():
+            expected[event_id][0:2] = [registered, blocked]
+        for event_id, checked_in, pending_review in checkins.tuples():
+            expected[event_id][2:4] = [checked_in, pending_review]
+        current = {
+            row[0]: list(row[1:])
+            for row in EventCounter.select(EventCounter.event, EventCounter.registered, EventCounter.blocked,
+                                           EventCounter.checked_in, EventCounter.pending_review).tuples()
+        }
+        wrong = [event_id for event_id, values in expected.items() if current.get(event_id) != values]
+        for event_id in wrong:
+            registered, blocked, checked_in, pending_review = expected[event_id]
+            EventCounter.insert(event=event_id, registered=registered, blocked=blocked,
+                                checked_in=checked_in, pending_review=pending_review)\
+                .on_conflict_replace()\
+                .execute()
+        stale = [event_id for event_id in current if event_id not in expected]
+        if stale:
+            EventCounter.delete().where(EventCounter.event.in_(stale)).execute()
+    return len(wrong) + len(stale)
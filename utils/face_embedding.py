@@ -0,0 +1,132 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+import aiofiles
+import numpy as np
+from utils.image_processor import temp_path
+from utils.storage import Storage
+import config
+
+# 0 computes embeddings on a single background thread instead of separate processes
+FACE_MATCH_WORKERS = getattr(config, "FACE_MATCH_WORKERS", 2)
+
+# ONNX face recognition model run with onnxruntime on the CPU: an ArcFace style network taking one
+# EMBEDDING_SIDE square RGB face scaled to [-1, 1] and giving an EMBEDDING_DIM vector. None turns face
+# matching off, scores are neither computed nor shown. After changing the model run
+# "python database_script.py reset-face-scores" then "rebuild-embeddings", old scores belong to the old model.
+FACE_EMBEDDING_MODEL = getattr(config, "FACE_EMBEDDING_MODEL", None)
+FACE_EMBEDDING_ENABLED = FACE_EMBEDDING_MODEL is not None
+EMBEDDING_SIDE = getattr(config, "FACE_EMBEDDING_SIDE", 112)
+EMBEDDING_DIM = getattr(config, "FACE_EMBEDDING_DIM", 512)
+
+# images embedded by one worker call, so the pickling overhead is shared by several images
+_CHUNK_SIZE = 8
+
+_executor = None
+# the model, loaded once in every process which embeds
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        # every worker of the pool runs its own model, one thread each keeps them from competing for cores
+        options.intra_op_num_threads = 1
+        _session = onnxruntime.InferenceSession(FACE_EMBEDDING_MODEL, options, providers=["CPUExecutionProvider"])
+    return _session
+
+
+def load_face(path: str) -> Optional[np.ndarray]:
+    """
+    The face of a check-in or identity photo as the model input, 3 x EMBEDDING_SIDE x EMBEDDING_SIDE.
+    The app frames the selfie, so the centre crop stands in for a face detector. None if it is not an image.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    try:
+        with Image.open(path) as image:
+            image.draft("RGB", (EMBEDDING_SIDE * 2, EMBEDDING_SIDE * 2))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            # faces in selfies sit slightly above the centre
+            image = ImageOps.fit(image, (EMBEDDING_SIDE, EMBEDDING_SIDE), Image.BILINEAR, centering=(0.5, 0.4))
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, OSError):
+        return None
+    pixels = (np.asarray(image, dtype=np.float32) - 127.5) / 127.5
+    return pixels.transpose(2, 0, 1)
+
+
+def embed_image(path: str) -> Optional[np.ndarray]:
+    """L2-normalized embedding of the face in a photo, None if it is not an image"""
+    face = load_face(path)
+    if face is None:
+        return None
+    session = _get_session()
+    vector = session.run(None, {session.get_inputs()[0].name: face[None]})[0][0].astype(np.float32)
+    return vector / (np.linalg.norm(vector) + 1e-6)
+
+
+def embed_images(paths: list) -> tuple:
+    """Runs in a worker process: (embeddings as rows, which rows are valid)"""
+    vectors = np.zeros((len(paths), EMBEDDING_DIM), dtype=np.float32)
+    valid = np.zeros(len(paths), dtype=bool)
+    for row, path in enumerate(paths):
+        vector = embed_image(path)
+        if vector is not None:
+            vectors[row] = vector
+            valid[row] = True
+    return vectors, valid
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if FACE_MATCH_WORKERS > 0:
+            # spawn so the workers never inherit locks held by the database threads
+            _executor = ProcessPoolExecutor(
+                max_workers=FACE_MATCH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-match")
+    return _executor
+
+
+async def _local_copy(storage: Storage, key: str, downloaded: list) -> str:
+    path = storage.local_path(key)
+    if path is not None:
+        return path
+    path = temp_path(".jpg")
+    downloaded.append(path)
+    data = await storage.get(key)
+    async with aiofiles.open(path, "wb") as file:
+        await file.write(data or b"")
+    return path
+
+
+async def embed_stored(items: list) -> tuple:
+    """Embed [(storage, key)] on the worker pool, chunked so every worker gets a share"""
+    downloaded = []
+    try:
+        paths = [await _local_copy(storage, key, downloaded) for storage, key in items]
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(_get_executor(), embed_images, paths[start:start + _CHUNK_SIZE])
+            for start in range(0, len(paths), _CHUNK_SIZE)
+        ])
+    finally:
+        for path in downloaded:
+            if os.path.exists(path):
+                os.remove(path)
+    if not chunks:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32), np.zeros(0, dtype=bool)
+    return np.concatenate([vectors for vectors, _ in chunks]), np.concatenate([valid for _, valid in chunks])
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,103 @@
+import numpy as np
+
+# queries scored against the whole matrix at once, bounds the similarity matrix held in memory
+_QUERY_CHUNK = 256
+
+
+def _top_k(similarity: np.ndarray, k: int) -> tuple:
+    """(similarities, columns) of the k best columns of every row, best first"""
+    k = min(k, similarity.shape[1])
+    if k == 0:
+        return np.zeros((len(similarity), 0), dtype=np.float32), np.zeros((len(similarity), 0), dtype=np.int64)
+    columns = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(similarity, columns, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(columns, order, axis=1)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-6)
+
+
+class FaceIndex:
+    """
+    Nearest-neighbour search by cosine similarity over L2-normalized embeddings.
+
+    "exact" compares a query with every vector, one matrix product per chunk of queries.
+    "ivf" clusters the vectors with spherical k-means into nlist lists stored contiguously and only
+    searches the nprobe lists whose centroids are closest to the query: approximate, but the work
+    per query drops from N to about N * nprobe / nlist. Training is the expensive part, so the
+    centroids of a previous index can be given to only assign the vectors to them.
+    """
+
+    def __init__(self, vectors: np.ndarray, user_ids: np.ndarray, labels: np.ndarray,
+                 mode: str = "exact", nlist: int = None, nprobe: int = 8, centroids: np.ndarray = None):
+        self.mode = mode
+        self.nprobe = nprobe
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        # what each vector is, opaque to the index
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.centroids = None
+        self.offsets = None
+        # how many vectors the centroids were trained on
+        self.trained_size = 0
+        if mode == "ivf" and len(self.vectors):
+            if centroids is None:
+                centroids = self._train(nlist or max(1, int(4 * np.sqrt(len(self.vectors)))))
+                self.trained_size = len(self.vectors)
+            self._assign(centroids)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _train(self, nlist: int, iterations: int = 10) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        count = len(self.vectors)
+        nlist = min(nlist, count)
+        # k-means on a sample, enough points per list for stable centroids
+        sample = self.vectors[rng.choice(count, min(count, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(iterations):
+            assigned = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assigned, sample)
+            filled = np.bincount(assigned, minlength=nlist) > 0
+            # an empty list keeps its centroid
+            centroids[filled] = _normalize(sums[filled])
+        return centroids
+
+    def _assign(self, centroids: np.ndarray):
+        count = len(self.vectors)
+        assigned = np.concatenate([
+            np.argmax(self.vectors[start:start + 4096] @ centroids.T, axis=1) for start in range(0, count, 4096)
+        ])
+        # reorder everything so each list is one contiguous slice
+        order = np.argsort(assigned, kind="stable")
+        self.vectors = self.vectors[order]
+        self.user_ids = self.user_ids[order]
+        self.labels = self.labels[order]
+        self.centroids = centroids
+        self.offsets = np.searchsorted(assigned[order], np.arange(len(centroids) + 1))
+
+    def search(self, queries: np.ndarray, k: int) -> tuple:
+        """(similarities, positions) of the k nearest vectors of every query, best first; positions index user_ids/labels"""
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.centroids is None:
+            results = [_top_k(queries[start:start + _QUERY_CHUNK] @ self.vectors.T, k)
+                       for start in range(0, len(queries), _QUERY_CHUNK)]
+            if not results:
+                return np.zeros((0, 0), dtype=np.float32), np.zeros((0, 0), dtype=np.int64)
+            return np.concatenate([scores for scores, _ in results]), np.concatenate([rows for _, rows in results])
+        k = min(k, len(self.vectors))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        _, probes = _top_k(queries @ self.centroids.T, self.nprobe)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+            if not len(candidates):
+                continue
+            best, columns = _top_k((self.vectors[candidates] @ query)[None, :], k)
+            scores[row, :best.shape[1]] = best[0]
+            positions[row, :best.shape[1]] = candidates[columns[0]]
+        return scores, positions
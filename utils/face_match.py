@@ -0,0 +1,162 @@
+import asyncio
+import time
+import numpy as np
+from controllers.CheckinController import CheckinController
+from controllers.IdentityImageController import IdentityImageController
+from utils import face_embedding
+from utils.db_executor import run_in_db, run_write
+from utils.duplicate_faces import duplicate_detector
+from utils.embedding_store import identity_embeddings, checkin_embeddings
+from utils.face_embedding import FACE_EMBEDDING_ENABLED, FACE_MATCH_WORKERS, embed_stored
+from utils.metrics import LatencyRecorder
+from utils.storage import checkin_storage, identity_storage
+import config
+
+# nothing is scored without a face embedding model
+FACE_MATCH_ENABLED = getattr(config, "FACE_MATCH_ENABLED", True) and FACE_EMBEDDING_ENABLED
+FACE_MATCH_BATCH_SIZE = getattr(config, "FACE_MATCH_BATCH_SIZE", 64)
+# seconds between two looks for check-ins which were not notified
+FACE_MATCH_INTERVAL = getattr(config, "FACE_MATCH_INTERVAL", 30)
+# score >= accept approves, score < reject rejects, in between waits for a manager; None disables the decision.
+# Scores only mean something for the embedding model they were tuned on, so by default check-ins are scored
+# but left for a manager. Set both after measuring genuine and impostor scores of the model in use.
+FACE_MATCH_ACCEPT_SCORE = getattr(config, "FACE_MATCH_ACCEPT_SCORE", None)
+FACE_MATCH_REJECT_SCORE = getattr(config, "FACE_MATCH_REJECT_SCORE", None)
+
+
+def match_scores(probe: np.ndarray, probe_owner: np.ndarray, reference: np.ndarray,
+                 reference_owner: np.ndarray) -> np.ndarray:
+    """
+    Best cosine similarity of every probe row against the reference rows of the same owner,
+    all pairs in one matrix product. -1 where an owner has no reference.
+    """
+    similarity = probe @ reference.T
+    similarity[probe_owner[:, None] != reference_owner[None, :]] = -1
+    return similarity.max(axis=1, initial=-1)
+
+
+class FaceMatcher:
+    """
+    Background task scoring pending check-ins against the approved identity images of their user.
+    Check-ins are taken in batches, their photos embedded on a process pool and scored with one
+    matrix product per batch against the identity embeddings kept in the embedding store;
+    scores past the thresholds approve or reject the check-in. A photo whose nearest face belongs
+    to another user is flagged as suspect and never approved automatically.
+    """
+
+    def __init__(self):
+        self._task = None
+        self._wakeup = None
+        self.batches = 0
+        self.results = {"approved": 0, "rejected": 0, "scored": 0, "unreadable": 0}
+        self.embed_time = LatencyRecorder()
+        self.batch_time = LatencyRecorder()
+        self.last_batch_size = 0
+        # identity embeddings which were not in the store yet
+        self.computed_references = 0
+
+    def start(self):
+        if not FACE_MATCH_ENABLED or self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._loop())
+
+    def notify(self):
+        """A check-in was created, score it without waiting for the interval"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                while await self.run_once() == FACE_MATCH_BATCH_SIZE:
+                    pass
+            except Exception as err:
+                print(">> Error when score check in images")
+                print(err)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), FACE_MATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> int:
+        """Score one batch of pending check-ins, returns its size"""
+        pending = await run_in_db(CheckinController.get_unscored, FACE_MATCH_BATCH_SIZE)
+        self.last_batch_size = len(pending)
+        if not pending:
+            return 0
+        started_at = time.perf_counter()
+        checkin_ids = np.array([checkin_id for checkin_id, _, _ in pending])
+        probe_owner = np.array([user_id for _, _, user_id in pending])
+        references = await run_in_db(IdentityImageController.get_approved_paths, sorted(set(probe_owner.tolist())))
+        reference_ids = [image_id for image_id, _, _ in references]
+        reference_owner = np.array([user_id for _, user_id, _ in references])
+        # identity embeddings come from the store, only those missing from it are computed
+        reference, reference_valid = identity_embeddings.get(reference_ids, reference_owner.tolist())
+        missing = np.flatnonzero(~reference_valid)
+
+        embed_started_at = time.perf_counter()
+        vectors, valid = await embed_stored(
+            [(checkin_storage, path) for _, path, _ in pending]
+            + [(identity_storage, references[index][2]) for index in missing]
+        )
+        self.embed_time.record(time.perf_counter() - embed_started_at)
+        probe, probe_valid = vectors[:len(pending)], valid[:len(pending)]
+        for index, vector, ok in zip(missing, vectors[len(pending):], valid[len(pending):]):
+            if ok:
+                reference[index] = vector
+                reference_valid[index] = True
+                identity_embeddings.put(reference_ids[index], int(reference_owner[index]), vector, True)
+        self.computed_references += len(missing)
+
+        await duplicate_detector.refresh()
+        suspects = duplicate_detector.find_suspects(
+            probe[probe_valid], probe_owner[probe_valid], checkin_ids[probe_valid])
+        for checkin_id, user_id, vector in zip(checkin_ids[probe_valid], probe_owner[probe_valid], probe[probe_valid]):
+            checkin_embeddings.put(int(checkin_id), int(user_id), vector, True)
+
+        scores = match_scores(probe, probe_owner, reference[reference_valid], reference_owner[reference_valid])
+        # no readable photo on either side: nothing was compared, a manager has to decide
+        comparable = probe_valid & (scores >= 0)
+        self.results["unreadable"] += int((~comparable).sum())
+        written = await run_write(
+            CheckinController.apply_scores,
+            {
+                int(checkin_id): float(np.clip(score, 0, 1)) if ok else None
+                for checkin_id, score, ok in zip(checkin_ids, scores, comparable)
+            },
+            FACE_MATCH_ACCEPT_SCORE,
+            FACE_MATCH_REJECT_SCORE,
+            suspects
+        )
+        for name, count in written.items():
+            self.results[name] += count
+        self.batches += 1
+        self.batch_time.record(time.perf_counter() - started_at)
+        return len(pending)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": FACE_MATCH_ENABLED,
+            "workers": FACE_MATCH_WORKERS,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "computed_references": self.computed_references,
+            **self.results,
+            "embed_time": self.embed_time.summary(),
+            "batch_time": self.batch_time.summary(),
+        }
+
+
+face_matcher = FaceMatcher()
+
+
+def shutdown():
+    face_matcher.stop()
+    face_embedding.shutdown()
@@ -0,0 +1,53 @@
+import math
+from typing import Optional
+import config
+
+# "reject" refuses check-ins outside the location of the event, "flag" records them for a manager, "off" skips the check.
+# Only a client which sends its position can be refused: a check-in without coordinates is flagged in either mode,
+# unless GEOFENCE_REQUIRE_COORDINATES refuses it
+GEOFENCE_MODE = getattr(config, "GEOFENCE_MODE", "reject")
+# metres added to the radius of every location, for the inaccuracy of phone positioning
+GEOFENCE_TOLERANCE_M = getattr(config, "GEOFENCE_TOLERANCE_M", 0)
+# refuse check-ins without coordinates for events which have a location
+GEOFENCE_REQUIRE_COORDINATES = getattr(config, "GEOFENCE_REQUIRE_COORDINATES", False)
+
+EARTH_RADIUS_M = 6371008.8
+
+OUTSIDE_FENCE = "Bạn đang ở ngoài khu vực điểm danh của sự kiện (cách {distance:.0f}m)"
+MISSING_COORDINATES = "Vui lòng bật định vị để điểm danh"
+INVALID_COORDINATES = "Tọa độ không hợp lệ"
+
+
+def haversine_m(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    """Great-circle distance in metres between two points given in degrees"""
+    phi1 = math.radians(latitude1)
+    phi2 = math.radians(latitude2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(longitude2 - longitude1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def check_fence(fence: Optional[tuple], latitude: Optional[float], longitude: Optional[float]) -> tuple:
+    """
+    (distance in metres, outside) of a device from fence (latitude, longitude, radius in metres).
+    distance is None when there is nothing to compare, outside is then True if the event has a location
+    but the device sent no position; raises ValueError when the check-in has to be refused.
+    """
+    if (latitude is None) != (longitude is None):
+        raise ValueError(INVALID_COORDINATES)
+    if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(INVALID_COORDINATES)
+    if GEOFENCE_MODE == "off" or fence is None or None in fence:
+        return None, False
+    if latitude is None:
+        if GEOFENCE_REQUIRE_COORDINATES:
+            raise ValueError(MISSING_COORDINATES)
+        # nothing proves the device was there, leave it to a manager
+        return None, True
+    fence_latitude, fence_longitude, radius = fence
+    distance = haversine_m(latitude, longitude, fence_latitude, fence_longitude)
+    outside = distance > radius + GEOFENCE_TOLERANCE_M
+    if outside and GEOFENCE_MODE == "reject":
+        raise ValueError(OUTSIDE_FENCE.format(distance=distance))
+    return distance, outside
@@ -0,0 +1,74 @@
+import hashlib
+import os
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+import config
+
+# a stored image is rewritten under its key once, when its normalization job runs; until then it is
+# served with no-cache (see image_response), afterwards a client only revalidates to recheck its permission
+IMAGE_CACHE_MAX_AGE = getattr(config, "IMAGE_CACHE_MAX_AGE", 86400)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def make_etag(key: str, size: int, modified_at: datetime) -> str:
+    digest = hashlib.sha1(f"{key}:{size}:{modified_at.timestamp()}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def cache_headers(etag: str, modified_at: datetime, cache_control: str) -> dict:
+    return {
+        "etag": etag,
+        "last-modified": formatdate(modified_at.timestamp(), usegmt=True),
+        "cache-control": cache_control,
+    }
+
+
+def is_not_modified(request_headers: Headers, etag: str, modified_at: datetime) -> bool:
+    """Whether a conditional request can be answered with 304, If-None-Match taking precedence"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # weak comparison, as GET allows
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # the header only has a precision of seconds
+    return int(modified_at.timestamp()) <= since.timestamp()
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with quoted strong etags and If-None-Match lists understood.
+    Files under immutable_dirs are named uniquely and never rewritten, so clients may keep them for good.
+    """
+
+    def __init__(self, *args, immutable_dirs: tuple = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable_dirs = [os.path.realpath(directory) + os.sep for directory in immutable_dirs]
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        modified_at = datetime.fromtimestamp(stat_result.st_mtime)
+        real_path = os.path.realpath(full_path)
+        immutable = any(real_path.startswith(directory) for directory in self.immutable_dirs)
+        headers = cache_headers(
+            make_etag(real_path, stat_result.st_size, modified_at),
+            modified_at,
+            IMMUTABLE_CACHE_CONTROL if immutable else "no-cache"
+        )
+        response = FileResponse(
+            full_path, status_code=status_code, headers=headers, stat_result=stat_result, method=scope["method"])
+        if is_not_modified(Headers(scope=scope), headers["etag"], modified_at):
+            return NotModifiedResponse(response.headers)
+        return response
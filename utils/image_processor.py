@@ -0,0 +1,212 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import aiofiles
+from fastapi import UploadFile
+from utils.metrics import LatencyRecorder
+from utils.storage import Storage, spool_upload
+import config
+
+# 0 processes images on a single background thread instead of separate processes
+IMAGE_PROCESS_WORKERS = getattr(config, "IMAGE_PROCESS_WORKERS", 2)
+IMAGE_MAX_SIDE = getattr(config, "IMAGE_MAX_SIDE", 1280)
+IMAGE_JPEG_QUALITY = getattr(config, "IMAGE_JPEG_QUALITY", 85)
+# where uploads wait while they are processed, None for the system temp dir
+UPLOAD_TEMP_DIR = getattr(config, "UPLOAD_TEMP_DIR", None)
+
+INVALID_IMAGE = "File tải lên không phải là ảnh hợp lệ"
+
+_executor = None
+
+
+def normalize_image(source_path: str, target_path: str, max_side: int, quality: int) -> tuple:
+    """
+    Runs in a worker process: check source_path is an image, apply its EXIF orientation,
+    downscale it to fit max_side and write it to target_path as a JPEG without metadata.
+    Returns (width, height) of the result.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    try:
+        with Image.open(source_path) as image:
+            image.verify()
+        # verify() leaves the image unusable, it has to be opened again
+        with Image.open(source_path) as image:
+            # let the JPEG decoder skip the resolution it would throw away anyway
+            image.draft("RGB", (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGB")
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            # no exif/icc given, so no metadata is written
+            image.save(target_path, "JPEG", quality=quality, optimize=True, progressive=True)
+            return image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, OSError):
+        raise ValueError(INVALID_IMAGE)
+
+
+def check_image(path: str):
+    """Quick check that path starts like an image: only the header is read, nothing is decoded"""
+    from PIL import Image, UnidentifiedImageError
+    try:
+        with Image.open(path):
+            pass
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, OSError):
+        raise ValueError(INVALID_IMAGE)
+
+
+class ImageProcessorStats:
+    """Queue depth and throughput of the image pipeline"""
+
+    def __init__(self, window: float = 60):
+        self._window = window
+        self._lock = threading.Lock()
+        self._finished_at = deque()
+        self.process_time = LatencyRecorder()
+        self.queued = 0
+        self.max_queued = 0
+        self.processed = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def submitted(self):
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def finished(self, seconds: float, bytes_in: int = 0, bytes_out: int = None):
+        now = time.monotonic()
+        self.process_time.record(seconds)
+        with self._lock:
+            self.queued -= 1
+            if bytes_out is None:
+                self.rejected += 1
+                return
+            self.processed += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self._finished_at.append(now)
+            while self._finished_at and now - self._finished_at[0] > self._window:
+                self._finished_at.popleft()
+
+    def summary(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            recent = sum(1 for finished_at in self._finished_at if now - finished_at <= self._window)
+            result = {
+                "workers": IMAGE_PROCESS_WORKERS,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "images_per_second": round(recent / self._window, 3),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+            }
+        result["process_time"] = self.process_time.summary()
+        return result
+
+
+image_stats = ImageProcessorStats()
+thumbnail_stats = ImageProcessorStats()
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if IMAGE_PROCESS_WORKERS > 0:
+            # spawn so the workers never inherit locks held by the database threads
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-processor")
+    return _executor
+
+
+async def _run(recorder: ImageProcessorStats, source_path: str, target_path: str, max_side: int, quality: int):
+    loop = asyncio.get_running_loop()
+    recorder.submitted()
+    started_at = time.perf_counter()
+    try:
+        size = await loop.run_in_executor(
+            _get_executor(), normalize_image, source_path, target_path, max_side, quality)
+    except BaseException:
+        recorder.finished(time.perf_counter() - started_at)
+        raise
+    recorder.finished(time.perf_counter() - started_at, os.path.getsize(source_path), os.path.getsize(target_path))
+    return size
+
+
+def temp_path(suffix: str) -> str:
+    handle, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_TEMP_DIR)
+    os.close(handle)
+    return path
+
+
+async def process_stored(storage: Storage, key: str, target_key: str, max_side: int = IMAGE_MAX_SIDE,
+                         quality: int = IMAGE_JPEG_QUALITY, recorder: ImageProcessorStats = image_stats) -> bool:
+    """
+    Normalize the stored image key into target_key, which may be key itself to replace it.
+    False if the image does not exist.
+    """
+    source_path = storage.local_path(key)
+    downloaded = None
+    target_path = temp_path(".jpg")
+    try:
+        if source_path is None:
+            data = await storage.get(key)
+            if data is None:
+                return False
+            source_path = downloaded = temp_path(".jpg")
+            async with aiofiles.open(downloaded, "wb") as file:
+                await file.write(data)
+        elif not os.path.exists(source_path):
+            return False
+        await _run(recorder, source_path, target_path, max_side, quality)
+        await storage.put_file(target_key, target_path)
+        return True
+    finally:
+        for path in (downloaded, target_path):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+
+@asynccontextmanager
+async def received_image(storage: Storage, key: str, upload: UploadFile, limit_kb: float = None):
+    """
+    Store an upload under key as it is for the duration of the block, once its header shows it is
+    an image, deleting it again if the block fails. process_stored normalizes it later, off the request.
+    """
+    source_path = temp_path(".upload")
+    try:
+        await spool_upload(upload, source_path, limit_kb)
+        await asyncio.get_running_loop().run_in_executor(None, check_image, source_path)
+        await storage.put_file(key, source_path)
+    finally:
+        if os.path.exists(source_path):
+            os.remove(source_path)
+    try:
+        yield key
+    except BaseException:
+        await storage.delete(key)
+        raise
+
+
+def stats() -> dict:
+    result = image_stats.summary()
+    result["thumbnails"] = thumbnail_stats.summary()
+    return result
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from controllers.JobController import JobController
+from utils.db_executor import run_write
+from utils.metrics import LatencyRecorder
+import config
+
+JOB_WORKERS = getattr(config, "JOB_WORKERS", 4)
+# seconds between two looks for due jobs when nothing was notified, retries are picked up this way
+JOB_POLL_INTERVAL = getattr(config, "JOB_POLL_INTERVAL", 5)
+# seconds before the first retry of a failed job, doubled for every further attempt
+JOB_RETRY_DELAY = getattr(config, "JOB_RETRY_DELAY", 5)
+# done jobs are deleted after this many days
+JOB_RETENTION_DAYS = getattr(config, "JOB_RETENTION_DAYS", 7)
+
+
+class JobKindStats:
+    """Outcomes and timings of the jobs of one kind"""
+
+    def __init__(self):
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.wait_time = LatencyRecorder()
+        self.run_time = LatencyRecorder()
+
+    def summary(self) -> dict:
+        return {
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "wait_time": self.wait_time.summary(),
+            "run_time": self.run_time.summary(),
+        }
+
+
+class JobQueue:
+    """
+    Durable queue of background work, kept in the Job table and run by a pool of worker tasks.
+    Jobs are committed together with the rows they work on, so none is lost by a restart;
+    those a stopped process left running are queued again, handlers must tolerate running twice.
+    A failing job is retried with exponential backoff, a ValueError means it can never succeed.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._failure_handlers = {}
+        self._tasks = []
+        self._wakeup = None
+        self._kinds = {}
+        self.running = 0
+        self.requeued = 0
+        self.purged = 0
+
+    def register(self, kind: str, handler, on_failure=None):
+        """
+        handler is a coroutine function called with the payload of the job as keyword arguments,
+        on_failure one called the same way once the job has failed for good
+        """
+        self._handlers[kind] = handler
+        if on_failure is not None:
+            self._failure_handlers[kind] = on_failure
+        self._kinds.setdefault(kind, JobKindStats())
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._run())]
+
+    def notify(self):
+        """A job was enqueued, run it without waiting for the poll interval"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stop(self):
+        # jobs interrupted here are still marked running, the next start queues them again
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _run(self):
+        try:
+            self.requeued = await run_write(JobController.requeue_running)
+            self.purged = await run_write(
+                JobController.purge, datetime.now() - timedelta(days=JOB_RETENTION_DAYS))
+        except Exception as err:
+            print(">> Error when recover jobs")
+            print(err)
+        workers = [asyncio.ensure_future(self._work()) for _ in range(max(JOB_WORKERS, 1))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _work(self):
+        while True:
+            # cleared before looking, so a job enqueued while this worker looks is not missed
+            self._wakeup.clear()
+            try:
+                job = await run_write(JobController.claim)
+            except Exception as err:
+                print(">> Error when claim job")
+                print(err)
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._execute(job)
+            except Exception as err:
+                # the outcome could not be written, the job stays running until the next start
+                print(f">> Error when store result of job {job.ID}")
+                print(err)
+
+    async def _execute(self, job):
+        kind_stats = self._kinds.setdefault(job.kind, JobKindStats())
+        kind_stats.wait_time.record(max((job.started_at - max(job.created_at, job.run_after)).total_seconds(), 0))
+        handler = self._handlers.get(job.kind)
+        self.running += 1
+        started_at = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError("No handler for job kind " + job.kind)
+            await handler(**json.loads(job.payload))
+        except Exception as err:
+            kind_stats.run_time.record(time.perf_counter() - started_at)
+            retry_in = None
+            if not isinstance(err, ValueError) and job.attempts < job.max_attempts:
+                retry_in = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            if retry_in is None:
+                kind_stats.failed += 1
+                print(f">> Error when run job {job.ID} {job.kind}, giving up")
+            else:
+                kind_stats.retried += 1
+                print(f">> Error when run job {job.ID} {job.kind}, retry in {retry_in}s")
+            print(err)
+            await run_write(JobController.fail, job.ID, f"{type(err).__name__}: {err}", retry_in)
+            on_failure = self._failure_handlers.get(job.kind)
+            if retry_in is None and on_failure is not None:
+                try:
+                    await on_failure(**json.loads(job.payload))
+                except Exception as err:
+                    print(f">> Error when clean up after job {job.ID} {job.kind}")
+                    print(err)
+        else:
+            kind_stats.run_time.record(time.perf_counter() - started_at)
+            kind_stats.succeeded += 1
+            await run_write(JobController.finish, job.ID)
+        finally:
+            self.running -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": JOB_WORKERS,
+            "running": self.running,
+            "requeued_at_start": self.requeued,
+            "purged_at_start": self.purged,
+            "kinds": {kind: kind_stats.summary() for kind, kind_stats in self._kinds.items()},
+        }
+
+
+job_queue = JobQueue()
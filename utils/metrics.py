@@ -0,0 +1,38 @@
+import threading
+from collections import deque
+
+
+class LatencyRecorder:
+    """Keep the most recent durations of an operation and summarize them in milliseconds"""
+
+    def __init__(self, max_samples: int = 1000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+            total = self.total
+        if not samples:
+            return {"count": count, "avg_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": count,
+            "avg_ms": round(total / count * 1000, 3),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+            "p99_ms": round(_percentile(samples, 99) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+
+
+def _percentile(sorted_samples: list, percent: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(percent / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
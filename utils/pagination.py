@@ -0,0 +1,63 @@
+import base64
+import json
+from fastapi import Response
+from peewee import Field, ModelSelect
+from config import USER_IN_PAGE
+import config
+
+# no list endpoint returns more rows than this in one response
+MAX_PAGE_SIZE = getattr(config, "MAX_PAGE_SIZE", 100)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(list):
+    """Rows of one page, next_cursor is None on the last page"""
+
+    def __init__(self, rows: list, next_cursor: str = None):
+        super().__init__(rows)
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(values: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Con trỏ phân trang không hợp lệ")
+    if not isinstance(values, dict):
+        raise ValueError("Con trỏ phân trang không hợp lệ")
+    return values
+
+
+def paginate(query: ModelSelect, key: Field, page: int = None, after: str = None, limit: int = None) -> Page:
+    """
+    Cut one page out of query.
+    By default rows are ordered by key, which must be unique within the query, and the cursor
+    holds the last key seen so the next page is an index seek instead of an OFFSET.
+    A query which is already ordered (e.g. by search rank) keeps its order and the cursor holds an offset.
+    page keeps the old OFFSET paging working for existing clients.
+    Routes reject a page or limit below 1; here they are clamped too, as SQLite reads a negative LIMIT as no limit.
+    """
+    if page:
+        limit = max(1, min(limit or USER_IN_PAGE, MAX_PAGE_SIZE))
+        return Page(query.paginate(max(1, page), limit))
+    limit = max(1, min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE))
+    cursor = decode_cursor(after) if after else {}
+    if query._order_by:
+        offset = int(cursor.get("offset", 0))
+        rows = list(query.offset(offset).limit(limit + 1))
+        next_cursor = encode_cursor({"offset": offset + limit}) if len(rows) > limit else None
+    else:
+        if "key" in cursor:
+            query = query.where(key > cursor["key"])
+        rows = list(query.order_by(key).limit(limit + 1))
+        next_cursor = encode_cursor({"key": rows[limit - 1].__data__[key.name]}) if len(rows) > limit else None
+    return Page(rows[:limit], next_cursor)
+
+
+def set_next_cursor(response: Response, page: Page):
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
@@ -0,0 +1,69 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+from utils.metrics import LatencyRecorder
+import config
+
+# 0 hashes on a single background thread instead of separate processes
+PASSWORD_HASH_WORKERS = getattr(config, "PASSWORD_HASH_WORKERS", 2)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+hash_time = LatencyRecorder()
+verify_time = LatencyRecorder()
+_executor = None
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_WORKERS > 0:
+            # spawn so the workers never inherit locks held by the database threads
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-hasher")
+    return _executor
+
+
+async def _run(recorder: LatencyRecorder, func, *args):
+    loop = asyncio.get_running_loop()
+    started_at = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    finally:
+        recorder.record(time.perf_counter() - started_at)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_time, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_time, verify_password, plain_password, hashed_password)
+
+
+def stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "hash": hash_time.summary(),
+        "verify": verify_time.summary(),
+    }
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,60 @@
+import threading
+import time
+from datetime import datetime
+from models.User import User
+from models.RevokedToken import RevokedToken
+
+
+class RevocationList:
+    """
+    In-memory view of revoked tokens and blocked students.
+    It is loaded once at startup and kept current by the routes once the writes that change it
+    are committed, so the allow_* dependencies never need a query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._blocked_users = set()
+
+    def load(self):
+        RevokedToken.delete().where(RevokedToken.expired_at <= datetime.now()).execute()
+        revoked = {
+            bytes.fromhex(token.digest): token.expired_at.timestamp()
+            for token in RevokedToken.select()
+        }
+        blocked_users = {user.ID for user in User.select(User.ID).where(User.block == True)}
+        with self._lock:
+            self._revoked = revoked
+            self._blocked_users = blocked_users
+
+    def revoke(self, digest: bytes, expire_at: float):
+        now = time.time()
+        with self._lock:
+            self._revoked[digest] = expire_at
+            # expired tokens are rejected by the signature check anyway
+            expired = [key for key, value in self._revoked.items() if value <= now]
+            for key in expired:
+                del self._revoked[key]
+
+    def is_revoked(self, digest: bytes) -> bool:
+        return digest in self._revoked
+
+    def set_blocked(self, user_id: int, blocked: bool):
+        with self._lock:
+            if blocked:
+                self._blocked_users.add(user_id)
+            else:
+                self._blocked_users.discard(user_id)
+
+    def is_blocked(self, user_id: int) -> bool:
+        return user_id in self._blocked_users
+
+    def stats(self) -> dict:
+        return {
+            "revoked_tokens": len(self._revoked),
+            "blocked_users": len(self._blocked_users),
+        }
+
+
+revocation_list = RevocationList()
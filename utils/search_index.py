@@ -0,0 +1,68 @@
+import re
+from typing import List, Optional
+from peewee import Database, ModelSelect
+from playhouse.sqlite_ext import FTS5Model, SearchField
+from utils.text_normalizer import fold_text
+
+
+def create_search_index(database: Database, search_model: FTS5Model):
+    """Create the full-text table of a content model and the triggers keeping it in sync"""
+    content = search_model._meta.options["content"]
+    table = content._meta.table_name
+    pk = content._meta.primary_key.column_name
+    index = search_model._meta.table_name
+    columns = [field.column_name for field in search_model._meta.sorted_fields if isinstance(field, SearchField)]
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    new_values = ", ".join(f'new."{column}"' for column in columns)
+    old_values = ", ".join(f'old."{column}"' for column in columns)
+    insert_new = f'INSERT INTO "{index}"(rowid, {column_list}) VALUES (new."{pk}", {new_values});'
+    delete_old = f'INSERT INTO "{index}"("{index}", rowid, {column_list}) VALUES (\'delete\', old."{pk}", {old_values});'
+
+    if search_model.table_exists():
+        indexed = [column.name for column in database.get_columns(index)]
+        if indexed == columns:
+            created = False
+        else:
+            # the indexed columns changed, start over
+            for trigger in ("after_insert", "after_delete", "after_update"):
+                database.execute_sql(f'DROP TRIGGER IF EXISTS "{index}_{trigger}"')
+            search_model.drop_table()
+            created = True
+    else:
+        created = True
+    search_model.create_table(safe=True)
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "{index}_after_insert" AFTER INSERT ON "{table}" BEGIN {insert_new} END'
+    )
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "{index}_after_delete" AFTER DELETE ON "{table}" BEGIN {delete_old} END'
+    )
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "{index}_after_update" AFTER UPDATE OF {column_list} ON "{table}" '
+        f'BEGIN {delete_old} {insert_new} END'
+    )
+    if created:
+        # index the rows which existed before the triggers
+        search_model._fts_cmd("rebuild")
+
+
+def prefix_query(keyword: Optional[str], columns: List[str]) -> Optional[str]:
+    """FTS5 expression matching rows where every word of keyword prefixes a word of one of columns"""
+    words = re.findall(r"\w+", fold_text(keyword or ""))
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"*' for word in words)
+    return "{" + " ".join(columns) + "} : (" + terms + ")"
+
+
+def apply_search(query: ModelSelect, search_model: FTS5Model, *expressions: Optional[str]) -> ModelSelect:
+    """Restrict query to rows matching all expressions, best ranked first"""
+    expressions = [expression for expression in expressions if expression]
+    if not expressions:
+        return query
+    content = search_model._meta.options["content"]
+    return query\
+        .switch(content)\
+        .join(search_model, on=(content._meta.primary_key == search_model.rowid))\
+        .where(search_model.match(" AND ".join(expressions)))\
+        .order_by(search_model.rank())
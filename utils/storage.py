@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Optional
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+import config
+
+STORAGE_BACKEND = getattr(config, "STORAGE_BACKEND", "local")
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    modified_at: datetime
+
+
+def new_image_key(*name_parts: str) -> str:
+    """Unique key for a new jpg, sharded into two levels of directories by the hash of its name"""
+    now = datetime.now().strftime("%Y-%m-%d.%H-%M-%S")
+    filename = ".".join([*name_parts, str(uuid.uuid4()), now]) + ".jpg"
+    digest = hashlib.sha1(filename.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{filename}"
+
+
+def _size_limit_error(limit_kb: float) -> ValueError:
+    return ValueError(f"Vui lòng chọn ảnh < {limit_kb}KB")
+
+
+async def spool_upload(upload: UploadFile, path: str, limit_kb: float = None) -> int:
+    """Write an upload to path in chunks, raising once it grows past limit_kb, returns its size"""
+    size = 0
+    async with aiofiles.open(path, "wb") as file:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if limit_kb is not None and size / 1000 > limit_kb:
+                raise _size_limit_error(limit_kb)
+            await file.write(chunk)
+    return size
+
+
+class Storage:
+    """Async object storage; put/put_file/get/delete/stat are implemented by the backends below"""
+
+    base_url = None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of the object on this machine, if the backend keeps one"""
+        return None
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        prefix = f"{self.base_url}/"
+        if not url or not url.startswith(prefix):
+            return None
+        return url[len(prefix):]
+
+    async def discard(self, key: Optional[str]):
+        """Delete an object which is no longer referenced, an error is only logged"""
+        if not key:
+            return
+        try:
+            await self.delete(key)
+        except Exception as err:
+            print(">> Error when delete stored object " + key)
+            print(err)
+
+
+class LocalStorage(Storage):
+    """Objects stored as files under root. Keys written before sharding may be absolute paths."""
+
+    def __init__(self, root: str, base_url: str = None):
+        self.root = root
+        self.base_url = base_url
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def put(self, key: str, upload: UploadFile, limit_kb: float = None) -> int:
+        # chunks go to a temp file renamed into place once complete, so readers never see a partial object
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".part"
+        try:
+            size = await spool_upload(upload, temp_path, limit_kb)
+            await aiofiles.os.rename(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                await aiofiles.os.remove(temp_path)
+            raise
+        return size
+
+    async def put_file(self, key: str, source_path: str):
+        """Move a finished local file into the storage under key"""
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".part"
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, shutil.move, source_path, temp_path)
+            await aiofiles.os.rename(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                await aiofiles.os.remove(temp_path)
+            raise
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            async with aiofiles.open(self.local_path(key), "rb") as file:
+                return await file.read()
+        except FileNotFoundError:
+            return None
+
+    async def delete(self, key: str):
+        try:
+            await aiofiles.os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            result = await aiofiles.os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(key=key, size=result.st_size, modified_at=datetime.fromtimestamp(result.st_mtime))
+
+
+class _LimitedReader:
+    """File-like view of an upload raising once more than limit_kb has been read"""
+
+    def __init__(self, file, limit_kb: float = None):
+        self._file = file
+        self._limit_kb = limit_kb
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file.read(size)
+        self.size += len(chunk)
+        if self._limit_kb is not None and self.size / 1000 > self._limit_kb:
+            raise _size_limit_error(self._limit_kb)
+        return chunk
+
+
+class S3Storage(Storage):
+    """
+    Objects stored in an S3 compatible bucket under prefix.
+    boto3 is only needed, and imported, when this backend is configured;
+    endpoint_url points it at any S3 compatible server (MinIO, a local stand-in...).
+    """
+
+    def __init__(self, bucket: str, prefix: str, base_url: str = None, endpoint_url: str = None,
+                 region_name: str = None, access_key: str = None, secret_key: str = None):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.base_url = base_url
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region_name,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}"
+
+    async def _run(self, func, *args, **kwargs):
+        # boto3 is blocking, keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+    async def put(self, key: str, upload: UploadFile, limit_kb: float = None) -> int:
+        # upload_fileobj streams in parts and the object only appears once the upload completes
+        reader = _LimitedReader(upload.file, limit_kb)
+        await self._run(self._client.upload_fileobj, reader, self.bucket, self._object_key(key))
+        return reader.size
+
+    async def put_file(self, key: str, source_path: str):
+        await self._run(self._client.upload_file, source_path, self.bucket, self._object_key(key))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            result = await self._run(self._client.get_object, Bucket=self.bucket, Key=self._object_key(key))
+        except self._client.exceptions.NoSuchKey:
+            return None
+        return await self._run(result["Body"].read)
+
+    async def delete(self, key: str):
+        await self._run(self._client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            result = await self._run(self._client.head_object, Bucket=self.bucket, Key=self._object_key(key))
+        except self._client.exceptions.ClientError as err:
+            if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return StoredObject(key=key, size=result["ContentLength"], modified_at=result["LastModified"])
+
+
+def create_storage(name: str, root: str, base_url: str = None) -> Storage:
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=config.S3_BUCKET,
+            prefix=name,
+            base_url=base_url,
+            endpoint_url=getattr(config, "S3_ENDPOINT_URL", None),
+            region_name=getattr(config, "S3_REGION", None),
+            access_key=getattr(config, "S3_ACCESS_KEY", None),
+            secret_key=getattr(config, "S3_SECRET_KEY", None)
+        )
+    return LocalStorage(root, base_url)
+
+
+@asynccontextmanager
+async def stored_upload(storage: Storage, key: str, upload: UploadFile, limit_kb: float = None):
+    """Store an upload under key for the duration of the block, deleting it again if the block fails"""
+    await storage.put(key, upload, limit_kb)
+    try:
+        yield key
+    except BaseException:
+        await storage.delete(key)
+        raise
+
+
+checkin_storage = create_storage("checkin", config.CHECKIN_IMAGE_DIR)
+identity_storage = create_storage("identity", config.IDENTITY_IMAGE_DIR)
+avatar_storage = create_storage("avatar", config.AVATAR_DIR, config.AVATAR_BASE_URL)
@@ -0,0 +1,13 @@
+import unicodedata
+
+# letters which are not a base letter plus combining marks in Unicode
+_SPECIAL_LETTERS = str.maketrans({"đ": "d", "Đ": "d"})
+
+
+def fold_text(text: str) -> str:
+    """Lower-case text and strip Vietnamese accents: "Nguyễn Văn Đức" -> "nguyen van duc" """
+    if text is None:
+        return None
+    decomposed = unicodedata.normalize("NFD", text.translate(_SPECIAL_LETTERS))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
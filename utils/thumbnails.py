@@ -0,0 +1,81 @@
+import asyncio
+from typing import Optional
+from fastapi import Response
+from fastapi.responses import FileResponse
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse
+from utils.http_cache import IMAGE_CACHE_MAX_AGE, cache_headers, is_not_modified, make_etag
+from utils.image_processor import process_stored, thumbnail_stats
+from utils.storage import Storage
+import config
+
+# size name accepted by ?size= -> longest side in pixels
+THUMBNAIL_SIZES = getattr(config, "THUMBNAIL_SIZES", {"small": 160, "medium": 480})
+THUMBNAIL_JPEG_QUALITY = getattr(config, "THUMBNAIL_JPEG_QUALITY", 80)
+
+# thumbnails being generated, so a grid of concurrent requests renders each one once
+_pending = {}
+
+
+def thumbnail_key(key: str, size: str) -> str:
+    # keys written before sharding are absolute paths
+    return f"thumbnails/{size}/{key.lstrip('/')}"
+
+
+async def get_thumbnail(storage: Storage, key: str, size: str) -> Optional[str]:
+    """Key of the thumbnail of an image, generated on first use; None if the image does not exist"""
+    max_side = THUMBNAIL_SIZES.get(size)
+    if max_side is None:
+        raise ValueError("Kích thước ảnh không hợp lệ, chọn một trong: " + ", ".join(THUMBNAIL_SIZES))
+    target_key = thumbnail_key(key, size)
+    if await storage.stat(target_key) is not None:
+        return target_key
+    pending_key = (id(storage), target_key)
+    task = _pending.get(pending_key)
+    if task is None:
+        task = asyncio.ensure_future(
+            process_stored(storage, key, target_key, max_side, THUMBNAIL_JPEG_QUALITY, thumbnail_stats))
+        _pending[pending_key] = task
+        task.add_done_callback(lambda _: _pending.pop(pending_key, None))
+    # shielded: a client going away must not cancel the thumbnail other requests wait for
+    generated = await asyncio.shield(task)
+    return target_key if generated else None
+
+
+async def image_response(storage: Storage, key: str, size: str = None,
+                         request_headers: Headers = None, pending: bool = False) -> Optional[Response]:
+    """
+    Response with a stored image, or its thumbnail when a size is given; None if it does not exist.
+    Answers 304 when request_headers show the client already has it.
+    pending: the image is still to be normalized in place, clients must revalidate it on every use.
+    """
+    if size is not None:
+        key = await get_thumbnail(storage, key, size)
+        if key is None:
+            return None
+    stored = await storage.stat(key)
+    if stored is None:
+        return None
+    headers = cache_headers(
+        make_etag(key, stored.size, stored.modified_at),
+        stored.modified_at,
+        "no-cache" if pending else f"private, max-age={IMAGE_CACHE_MAX_AGE}"
+    )
+    if request_headers is not None and is_not_modified(request_headers, headers["etag"], stored.modified_at):
+        return NotModifiedResponse(Headers(headers=headers))
+    path = storage.local_path(key)
+    if path is not None:
+        return FileResponse(path, headers=headers, media_type="image/jpeg")
+    data = await storage.get(key)
+    if data is None:
+        return None
+    return Response(content=data, headers=headers, media_type="image/jpeg")
+
+
+async def discard_image(storage: Storage, key: Optional[str]):
+    """Delete an image no longer referenced together with its thumbnails"""
+    if not key:
+        return
+    await storage.discard(key)
+    for size in THUMBNAIL_SIZES:
+        await storage.discard(thumbnail_key(key, size))
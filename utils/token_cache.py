@@ -0,0 +1,53 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pydantics.Token import TokenData
+
+
+class TokenCache:
+    """Bounded LRU of already verified tokens, an entry is dropped once its token expires"""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, digest: bytes) -> TokenData:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[digest]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, digest: bytes, token_data: TokenData, expire_at: float):
+        with self._lock:
+            self._entries[digest] = (token_data, expire_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest: bytes):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
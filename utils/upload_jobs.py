@@ -0,0 +1,60 @@
+from controllers.CheckinController import CheckinController
+from controllers.IdentityImageController import IdentityImageController
+from controllers.JobController import CHECKIN_IMAGE_JOB, IDENTITY_IMAGE_JOB
+from utils.db_executor import run_in_db, run_write
+from utils.embedding_store import update_identity_embedding
+from utils.face_match import face_matcher
+from utils.image_processor import process_stored
+from utils.job_queue import job_queue
+from utils.storage import checkin_storage, identity_storage
+from utils.thumbnails import discard_image, get_thumbnail
+import config
+
+# thumbnails rendered right after a check-in, so the review grid of managers does not wait for them
+CHECKIN_THUMBNAILS = getattr(config, "CHECKIN_THUMBNAILS", ("small",))
+
+
+async def process_checkin_image(checkin_id: int):
+    """Normalize the photo of a check-in, render its thumbnails and hand it to face matching"""
+    image_key = await run_in_db(CheckinController.get_image_path, checkin_id)
+    if image_key is None:
+        # deleted meanwhile
+        return
+    try:
+        await process_stored(checkin_storage, image_key, image_key)
+        for size in CHECKIN_THUMBNAILS:
+            await get_thumbnail(checkin_storage, image_key, size)
+    finally:
+        # an unreadable photo is scored too, it is left for a manager
+        face_matcher.notify()
+
+
+async def process_identity_image(image_id: int):
+    """Normalize an identity image and store its embedding"""
+    image_key = await run_in_db(IdentityImageController.get_image_path, image_id)
+    if image_key is None:
+        return
+    await process_stored(identity_storage, image_key, image_key)
+    # read after the slow part, a manager may have approved it meanwhile
+    image = await run_in_db(IdentityImageController.get_identity_image, image_id)
+    if image is not None:
+        await update_identity_embedding(image.ID, image.user_id, image.path, image.approve, recompute=True)
+
+
+async def discard_checkin_image(checkin_id: int):
+    """
+    The photo of a check-in could not be normalized for good: the upload is deleted rather than
+    served as it came, EXIF and position included, and the check-in is marked for managers
+    """
+    image_key = await run_write(CheckinController.mark_image_failed, checkin_id)
+    await discard_image(checkin_storage, image_key)
+
+
+async def discard_identity_image(image_id: int):
+    """Same for an identity image"""
+    image_key = await run_write(IdentityImageController.mark_image_failed, image_id)
+    await discard_image(identity_storage, image_key)
+
+
+job_queue.register(CHECKIN_IMAGE_JOB, process_checkin_image, discard_checkin_image)
+job_queue.register(IDENTITY_IMAGE_JOB, process_identity_image, discard_identity_image)